@@ -1,8 +1,8 @@
 import os
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
 from azure.ai.agents.models import MessageRole, ConnectedAgentTool
 from dotenv import load_dotenv
+from azure_clients import get_project_client
+from model_router import router
 
 load_dotenv()
 
@@ -11,11 +11,8 @@ load_dotenv()
 # You need to login to Azure subscription via Azure CLI and set the environment variables
 project_endpoint = os.getenv("AZURE_AI_AGENT_ENDPOINT")  # Ensure the PROJECT_ENDPOINT environment variable is set
 
-# Create an AIProjectClient instance
-project_client = AIProjectClient(
-    endpoint=project_endpoint,
-    credential=DefaultAzureCredential(),  # Use Azure Default Credential for authentication
-)
+# Get the shared AIProjectClient instance (credential, tokens and connections are reused)
+project_client = get_project_client(project_endpoint)
 
 def run_agent(user_input, thread_id, agent_id):
     # Add a message to the thread
@@ -40,12 +37,24 @@ def run_agent(user_input, thread_id, agent_id):
 
 
 #Setup the Connected Agent Tools
+# IDs of the specialist agents created by their scripts (see env.template)
+CONNECTED_AGENT_SETTINGS = (
+    "AZURE_AI_ARCHITECTURE_REVIEW_AGENT_ID",
+    "AZURE_AI_REFERENCE_ARCHITECTURE_AGENT_ID",
+    "AZURE_AI_BICEP_AGENT_ID",
+    "AZURE_AI_COSTS_AGENT_ID",
+    "AZURE_AI_SUCCESS_STORIES_AGENT_ID",
+)
+missing_settings = [setting for setting in CONNECTED_AGENT_SETTINGS if not os.getenv(setting)]
+if missing_settings:
+    raise ValueError(f"Set the IDs of the connected agents before creating the orchestrator: {', '.join(missing_settings)}")
+
 # Get the agent by its ID
-architecture_review_agent = project_client.agents.get_agent("asst_QpmjKNS10VsYWbOb0D8M1cbt")
-reference_architecture_agent = project_client.agents.get_agent("asst_lBTWM8vMKkwSsZ88it7iFTC8")
-bicep_agent = project_client.agents.get_agent("asst_T5qe1uAVveKDOhifF9zoGXKI")
-costs_agent = project_client.agents.get_agent("asst_row9gRIIQBpCbj5CRT9tXwD5")
-success_stories_agent = project_client.agents.get_agent("asst_OCAmFwPtvijf5HToarJWbli1")
+architecture_review_agent = project_client.agents.get_agent(os.environ["AZURE_AI_ARCHITECTURE_REVIEW_AGENT_ID"])
+reference_architecture_agent = project_client.agents.get_agent(os.environ["AZURE_AI_REFERENCE_ARCHITECTURE_AGENT_ID"])
+bicep_agent = project_client.agents.get_agent(os.environ["AZURE_AI_BICEP_AGENT_ID"])
+costs_agent = project_client.agents.get_agent(os.environ["AZURE_AI_COSTS_AGENT_ID"])
+success_stories_agent = project_client.agents.get_agent(os.environ["AZURE_AI_SUCCESS_STORIES_AGENT_ID"])
 
 
 architecture_review_connected_agent = ConnectedAgentTool(
@@ -67,7 +76,7 @@ success_stories_connected_agent = ConnectedAgentTool(
 
 # Create the Connected Agent
 agent = project_client.agents.create_agent(
-    model=os.getenv("AZURE_AI_AGENT_MODEL_DEPLOYMENT_NAME"),  # Model deployment name
+    model=router.deployment_for_agent("orchestrator"),  # Model deployment of the agent tier (model_router.py)
     name="Master Architecture Ai Agent",  # Name of the agent
     instructions="""
     # System — Azure AI Architecture Orchestrator (Persona‑Aware)
@@ -76,12 +85,12 @@ agent = project_client.agents.create_agent(
     1) classify the user into one of four personas,
     2) design a plan,
     3) invoke the right specialized agents,
-    4) merge their outputs, and
-    5) return one unified, structured response.
+    4) summarize their outputs, and
+    5) return the Executive Summary and the plan; the application merges the sections of the agents.
 
     ## Personas
     - **A. No architecture (business need/idea only)**
-    - **B. Existing architecture (image or description)**
+    - **B. Existing architecture (image, description or component graph JSON parsed from an uploaded diagram)**
     - **C. Cost-only** for a current architecture
     - **D. Bicep-only** for a current architecture
 
@@ -98,6 +107,10 @@ agent = project_client.agents.create_agent(
     - **Region:** eastus
     - **Storage defaults:** Hot + LRS, ops/egress=0 initial
 
+    ## Component graphs
+    When the message includes a component graph JSON (services with type/sku, groups, edges), treat it as the
+    authoritative description of the existing architecture and pass it unchanged to the Review, Bicep and Costs agents.
+
     ## Routing
     - **A (No architecture):** Reference → Bicep → Costs → Success (→ optional Review)
     - **B (Existing architecture):** Parallel Review + Bicep + Costs → then Reference → Success
@@ -111,14 +124,13 @@ agent = project_client.agents.create_agent(
     - **Bicep Agent** must output modular, parameterized templates; no secrets; what-if/lint guidance.
 
     ## Output Contract (always return)
+    Every agent answers with a JSON object holding its section of the contract (`architectureReview`,
+    `referenceArchitectures`, `bicep`, `costs`, `successStories`). The application validates and merges
+    those sections into the contract: **do not** copy or rewrite them. Return only:
     1) An **Executive Summary** (≤10 bullets).
     2) A **JSON** object with:
+    - `persona` (A, B, C or D)
     - `summary`, `assumptions`, `openQuestions`
-    - `architectureReview` (pillar, question, status, findings, references)
-    - `referenceArchitectures` (title, summary, URL)
-    - `bicep` (modules, parameters, notes)
-    - `costs` (market, region, lineItems with source IDs + apiQuery, totalMonthly, missingDetails)
-    - `successStories` (business goal, Key Products, technology solution, impact)
 
     If any agent yields insufficient data, report attempts (filters/queries/criteria) and return partial results with a note. If something cannot be determined, reply “I don’t know”.
     """,  # Instructions for the agent
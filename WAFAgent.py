@@ -1,10 +1,10 @@
 import asyncio
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
-from azure.ai.agents.models import BingCustomSearchTool
 
-from azure.identity.aio import AzureCliCredential
-from semantic_kernel.agents import AzureAIAgent, AzureAIAgentSettings, AzureAIAgentThread
+from azure_clients import get_async_credential, get_async_transport, close_async_clients
+from docs_index import docs_search_tool
+from model_router import router
+from output_contract import response_format
+from semantic_kernel.agents import AzureAIAgent, AzureAIAgentThread
 from semantic_kernel.contents import (
     AnnotationContent,
     ChatMessageContent,
@@ -26,33 +26,28 @@ async def handle_intermediate_steps(message: ChatMessageContent) -> None:
 
 async def main() -> None:
     async with (
-        AzureCliCredential() as creds,
-        AzureAIAgent.create_client(credential=creds) as client,
+        get_async_credential("cli") as creds,
+        AzureAIAgent.create_client(credential=creds, transport=get_async_transport()) as client,
     ):
 
-        bing_custom_connection = await client.connections.get(name="bingjgcustom")
-        conn_id = bing_custom_connection.id
-
-        print(conn_id)
-
-        configuration_name = "azureWAFAI"
-        # Initialize Bing Custom Search tool with connection id and configuration name
-        bing_custom_tool = BingCustomSearchTool(connection_id=conn_id, instance_name=configuration_name)
-
-
-        # 3. Crear agente en Azure AI Agent Service
+        # 1. Crear agente en Azure AI Agent Service. La documentación se consulta en el índice local
+        # (BM25 + embeddings) con la herramienta search_architecture_docs, que responde la Azure Function
+        # (pg_azurefunction), así el agente también tiene la herramienta cuando lo llama el orquestador
         agent_definition = await client.agents.create_agent(
             name="AzureWAFAgent",
             instructions="""You are an expert in Azure Well Architected Framework for AI, you are responsable for providing guidance, recommendations and best practices of Azure Architectures for 
-            Artificial Intelligence workloads.""",
-            model=AzureAIAgentSettings().model_deployment_name,
-            tools=bing_custom_tool.definitions,
+            Artificial Intelligence workloads. Ground every answer on the official documentation using the search_architecture_docs tool
+            with collection "waf" and cite the citation URL of the passages you use. Answer with the architectureReview JSON object: one item per
+            Well-Architected pillar and review question, with the citation URLs as references.""",
+            model=router.deployment_for_agent("architecture_review"),
+            response_format=response_format("architectureReview"),
+            tools=docs_search_tool().definitions,
         )
 
-        # 4. Crear agente Semantic Kernel
+        # 2. Crear agente Semantic Kernel
         agent = AzureAIAgent(client=client, definition=agent_definition)
 
-        # 5. Crear hilo de conversación
+        # 3. Crear hilo de conversación
         thread: AzureAIAgentThread | None = None
 
         try:
@@ -63,7 +58,7 @@ async def main() -> None:
                 print(f"# {response.name}: {response}")
                 thread = response.thread
 
-                # 6. Mostrar anotaciones de fuentes consultadas
+                # 4. Mostrar anotaciones de fuentes consultadas
                 if any(isinstance(item, AnnotationContent) for item in response.items):
                     for annotation in response.items:
                         if isinstance(annotation, AnnotationContent):
@@ -73,9 +68,12 @@ async def main() -> None:
                                 f"Índice: {annotation.start_index}-{annotation.end_index}\n"
                             )
         finally:
-            # 7. Limpieza
+            # 5. Limpieza
             await thread.delete() if thread else None
             #await client.agents.delete_agent(agent.id)
 
+    # Release the shared credential and HTTP session of this event loop
+    await close_async_clients()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,250 @@
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional
+from azure.ai.agents.models import AgentStreamEvent, MessageRole
+from tool_executor import create_and_process_run
+from deployment_scheduler import INTERACTIVE, RateLimited, estimate_tokens, raise_for_rate_limit, scheduler
+from thread_compaction import compactor
+from contract_stream import ContractEvent, ContractStreamParser
+from image_pipeline import ImageRef, image_content
+from model_router import ModelTier, Validator, confident, router
+from prefetch import prefetcher
+
+# Stream events that carry the run; the last one has its final status
+_RUN_EVENTS = (
+    AgentStreamEvent.THREAD_RUN_CREATED,
+    AgentStreamEvent.THREAD_RUN_QUEUED,
+    AgentStreamEvent.THREAD_RUN_IN_PROGRESS,
+    AgentStreamEvent.THREAD_RUN_REQUIRES_ACTION,
+    AgentStreamEvent.THREAD_RUN_COMPLETED,
+    AgentStreamEvent.THREAD_RUN_FAILED,
+    AgentStreamEvent.THREAD_RUN_CANCELLING,
+    AgentStreamEvent.THREAD_RUN_CANCELLED,
+    AgentStreamEvent.THREAD_RUN_EXPIRED,
+    AgentStreamEvent.THREAD_RUN_INCOMPLETE,
+)
+
+
+def _add_message(project_client, thread_id: str, content: str, images: Optional[List[ImageRef]] = None) -> None:
+    # Add a message to the thread
+    project_client.agents.messages.create(
+        thread_id=thread_id,
+        role="user",  # Role of the message sender
+        content=image_content(content, images or []),  # Message content, with the uploaded images
+    )
+    compactor.record_message(thread_id, content)
+
+
+def _schedule_run(tier: ModelTier, process_run: Callable, tokens: int, priority: int, on_run: Optional[Callable[[Any], None]]):
+    """
+    Calls process_run once the model deployment of the tier has budget for it and accounts for
+    the usage and the latency of the run.
+
+    :raises RateLimited: If the deployment stayed throttled after the retries.
+    """
+    start = time.perf_counter()
+    run = scheduler.submit(tier.deployment, process_run, tokens, priority)
+    print(f"Run finished with status: {run.status}")
+
+    usage = getattr(run, "usage", None)
+    if usage:
+        scheduler.report_usage(tier.deployment, tokens, usage.total_tokens)
+        compactor.record_usage(usage.prompt_tokens)
+    router.record(
+        tier, time.perf_counter() - start,
+        getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0,
+    )
+    if on_run is not None:
+        on_run(run)
+    return run
+
+
+def _submit_run(
+    project_client, thread_id: str, content: str, process_run: Callable, priority: int, on_run: Optional[Callable[[Any], None]],
+    images: Optional[List[ImageRef]] = None, tier: Optional[ModelTier] = None,
+):
+    """
+    Adds the user message to the thread, calls process_run once the model deployment has budget
+    for it and accounts for the usage of the run.
+
+    :param tier: Model tier of the agent (the largest tier if None).
+    :raises RateLimited: If the deployment stayed throttled after the retries.
+    """
+    _add_message(project_client, thread_id, content, images)
+    tokens = estimate_tokens(content) + sum(image.tokens for image in images or [])
+    return _schedule_run(tier or router.tiers[-1], process_run, tokens, priority, on_run)
+
+
+@contextmanager
+def _prefetching(content: str, tool_executor):
+    """
+    Prefetches the retrievals a message will likely need while the agent plans, when its tools
+    run in this process (with a tool_executor); the tools of connected agents run in the service.
+    """
+    if tool_executor is None:
+        yield
+        return
+    request_id = uuid.uuid4().hex
+    prefetcher.start(request_id, content)
+    try:
+        yield
+    finally:
+        # Prefetches the turn did not use are cancelled or counted, to tune the hit rate
+        prefetcher.finish(request_id)
+        print(f"Prefetch: {prefetcher.metrics()}")
+
+
+def _busy_message(error: RateLimited) -> str:
+    return f"The model deployment is busy, please try again in {error.retry_after:.0f} seconds."
+
+
+def run_turn(
+    project_client, thread_id: str, agent_id: str, content: str, tool_executor=None, priority: int = INTERACTIVE,
+    on_run: Optional[Callable[[Any], None]] = None, images: Optional[List[ImageRef]] = None, tier: Optional[ModelTier] = None,
+) -> str:
+    """
+    Sends one user message to a thread, runs the agent on it and returns the text to show
+    to the user. Call compactor.compact_if_needed first so the thread stays bounded.
+
+    :param project_client: AIProjectClient (or a compatible stand-in) used for the calls.
+    :param thread_id: ID of the thread that holds the conversation.
+    :param agent_id: ID of the agent to run.
+    :param content: User message content.
+    :param tool_executor: ConcurrentToolExecutor for agents with local function tools.
+    :param priority: Scheduling priority of the run on the model deployment.
+    :param on_run: Called with the finished run (e.g. to keep its metadata in the state store).
+    :param images: Images uploaded with ImageUploadCache to send with the message.
+    :param tier: Model tier the agent was created with (router.tier_for_agent), for the budget
+        of its deployment and the per-tier report; the largest tier if None.
+
+    :return: The last agent message, or the run error if the run did not complete.
+    :rtype: str
+    """
+    # Create and process agent run in thread with tools
+    # (the truncation strategy bounds the context if the thread was not compacted in time)
+    def process_run():
+        truncation_strategy = compactor.truncation_strategy()
+        if tool_executor is not None:
+            run = create_and_process_run(project_client, thread_id, agent_id, tool_executor, truncation_strategy=truncation_strategy)
+        else:
+            run = project_client.agents.runs.create_and_process(thread_id=thread_id, agent_id=agent_id, truncation_strategy=truncation_strategy)
+        raise_for_rate_limit(run)
+        return run
+
+    try:
+        with _prefetching(content, tool_executor):
+            run = _submit_run(project_client, thread_id, content, process_run, priority, on_run, images, tier)
+    except RateLimited as e:
+        return _busy_message(e)
+
+    # Check the status of the run and return the result
+    if run.status == "failed":
+        return str(run.last_error)
+    return _last_answer(project_client, thread_id, run) or f"Run finished with status: {run.status}"
+
+
+def _last_answer(project_client, thread_id: str, run) -> Optional[str]:
+    """Last agent message of a completed run, None if the run did not complete or did not answer."""
+    if run.status != "completed":
+        return None
+    last_msg = project_client.agents.messages.get_last_message_text_by_role(thread_id=thread_id, role=MessageRole.AGENT)
+    if not last_msg:
+        return None
+    compactor.record_message(thread_id, last_msg.text.value)
+    return last_msg.text.value
+
+
+def run_task(
+    project_client, thread_id: str, agent_id: str, content: str, task: str, validate: Validator = confident, tool_executor=None,
+    priority: int = INTERACTIVE, on_run: Optional[Callable[[Any], None]] = None, images: Optional[List[ImageRef]] = None,
+) -> str:
+    """
+    Like run_turn, for a task type with a model tier (see model_router.TASK_TIERS): the run uses
+    the deployment of that tier instead of the model of the agent, and if the answer fails the
+    validator (or the run fails) the message is answered again on the next larger tier.
+
+    :param task: Task type, e.g. "success_story_summary" or "price_table".
+    :param validate: Quick check of the answer, e.g. confident or json_with_keys(...).
+
+    :return: The accepted agent message, or the run error if the run on the largest tier did not complete.
+    :rtype: str
+    """
+    _add_message(project_client, thread_id, content, images)
+    tokens = estimate_tokens(content) + sum(image.tokens for image in images or [])
+
+    def attempt(tier, failure):
+        run_kwargs = {"model": tier.deployment, "truncation_strategy": compactor.truncation_strategy()}
+        if failure:
+            run_kwargs["additional_instructions"] = (
+                f"Your previous answer to the last user message did not pass a quality check ({failure}). Answer it again, completely."
+            )
+
+        def process_run():
+            if tool_executor is not None:
+                run = create_and_process_run(project_client, thread_id, agent_id, tool_executor, **run_kwargs)
+            else:
+                run = project_client.agents.runs.create_and_process(thread_id=thread_id, agent_id=agent_id, **run_kwargs)
+            raise_for_rate_limit(run)
+            return run
+
+        run = _schedule_run(tier, process_run, tokens, priority, on_run)
+        return run, _last_answer(project_client, thread_id, run) or ""
+
+    try:
+        with _prefetching(content, tool_executor):
+            outcome = router.cascade(task, attempt, validate)
+    except RateLimited as e:
+        return _busy_message(e)
+
+    run = outcome.result
+    if run.status == "failed":
+        return str(run.last_error)
+    return outcome.answer or f"Run finished with status: {run.status}"
+
+
+def stream_turn(
+    project_client, thread_id: str, agent_id: str, content: str, on_event: Callable[[ContractEvent], None], priority: int = INTERACTIVE,
+    on_run: Optional[Callable[[Any], None]] = None, images: Optional[List[ImageRef]] = None, tier: Optional[ModelTier] = None,
+) -> str:
+    """
+    Like run_turn, but streams the answer of the agent: the Executive Summary lines and every
+    top-level section of the JSON Output Contract are passed to on_event as soon as they are
+    complete, while the rest of the answer is still being generated. Only for agents without
+    local function tools (the orchestrator calls connected agents, which run in the service).
+
+    :param on_event: Called with every ContractEvent, from the calling thread.
+
+    :return: The whole answer, or the run error if the run did not complete.
+    :rtype: str
+    """
+    parser = ContractStreamParser()
+    chunks = []
+
+    def process_run():
+        run = None
+        with project_client.agents.runs.stream(
+            thread_id=thread_id, agent_id=agent_id, truncation_strategy=compactor.truncation_strategy()
+        ) as stream:
+            for event_type, event_data, _ in stream:
+                if event_type == AgentStreamEvent.THREAD_MESSAGE_DELTA:
+                    chunks.append(event_data.text)
+                    for event in parser.feed(event_data.text):
+                        on_event(event)
+                elif event_type in _RUN_EVENTS:
+                    run = event_data
+        raise_for_rate_limit(run)
+        return run
+
+    try:
+        run = _submit_run(project_client, thread_id, content, process_run, priority, on_run, images, tier)
+    except RateLimited as e:
+        return _busy_message(e)
+    for event in parser.close():
+        on_event(event)
+
+    if run.status == "failed":
+        return str(run.last_error)
+    answer = "".join(chunks)
+    compactor.record_message(thread_id, answer)
+    return answer or f"Run finished with status: {run.status}"
@@ -1,64 +1,183 @@
 import os
+import json
+import time
 import chainlit as cl
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
-from azure.ai.agents.models import MessageRole
 from dotenv import load_dotenv
+from agent_session import stream_turn
+from deployment_scheduler import scheduler
+from contract_stream import SECTION_TITLES, ContractEvent
+from thread_compaction import compactor
+from state_store import SessionKey, state_store
+from azure_clients import get_project_client
+from drawio_parser import DIAGRAM_EXTENSIONS, parse_diagram, summarize_graph
+from PIL import Image
+from image_pipeline import IMAGE_EXTENSIONS, ImageUploadCache
+from model_router import router
+from tool_telemetry import configure_tracing, overhead_stats
+from output_contract import assemble_contract, contract_answer
+from azure.core.exceptions import HttpResponseError
 # Load environment variables from the .env file (if present)
 load_dotenv()
 
+# Export the spans of the tool calls to Application Insights (APPLICATIONINSIGHTS_CONNECTION_STRING)
+print(f"Tracing configured: {configure_tracing()}")
+
 
 project_endpoint = os.environ["AZURE_AI_AGENT_ENDPOINT"]
 agent_id = os.environ["AZURE_AI_AGENT_ID"]
 print(f"Project Endpoint: {project_endpoint}")
 print(f"Agent ID: {agent_id}")
 
-# Create an AIProjectClient instance
-project_client = AIProjectClient(
-    endpoint=project_endpoint,
-    credential=DefaultAzureCredential(),  # Use Azure Default Credential for authentication
-)
+# Get the shared AIProjectClient instance (credential, tokens and connections are reused)
+project_client = get_project_client(project_endpoint)
+
+# Uploaded diagram images are downscaled once and their file IDs reused by every session
+image_cache = ImageUploadCache(state_store, project_endpoint)
+
+def session_key() -> SessionKey:
+    # Conversations are keyed by user and Chainlit thread, which the browser keeps across reconnects and server restarts
+    user = cl.user_session.get("user")
+    return (user.identifier if user else "anonymous", cl.context.session.thread_id)
+
+def start_session() -> None:
+    # Resume the agent thread of the conversation from the local state store, so a restart
+    # does not leave an orphan thread and the thread size is known without reading it back
+    key = session_key()
+    stored = state_store.get_session(key)
+    if stored:
+        compactor.track(stored.thread_id, stored.thread_tokens, stored.thread_messages)
+        cl.user_session.set("thread_id", stored.thread_id)
+        print(f"Resumed Thread ID: {stored.thread_id}")
+        return
+
+    # Create a new thread for the user
+    thread = project_client.agents.threads.create()
+    state_store.save_session(key, thread.id, agent_id)
+
+    # Set the thread ID in the user session
+    cl.user_session.set("thread_id", thread.id)
+    print(f"New Thread ID: {thread.id}")
 
 @cl.on_chat_start
 def on_chat_start():
     # Initialize the user session with the thread ID if it doesn't exist
     if not cl.user_session.get("thread_id"):
-        # Create a new thread for the user
-        thread = project_client.agents.threads.create()
+        start_session()
 
-        # Set the thread ID in the user session
-        cl.user_session.set("thread_id", thread.id)
-        print(f"New Thread ID: {thread.id}")
+@cl.on_chat_resume
+def on_chat_resume(thread):
+    start_session()
               
+def with_parsed_diagrams(message: cl.Message) -> str:
+    # Uploaded Draw.io / Visio diagrams (Persona B) are parsed locally into a component graph,
+    # so the agents get the services and connections without reading the diagram themselves
+    content = message.content
+    for element in message.elements or []:
+        if not element.path or not element.name.lower().endswith(DIAGRAM_EXTENSIONS):
+            continue
+        try:
+            with open(element.path, "r", encoding="utf-8") as f:
+                graph = parse_diagram(f.read())
+        except (ValueError, UnicodeDecodeError) as e:
+            print(f"Could not parse diagram {element.name}: {e}")
+            continue
+        content += f"\n\nExisting architecture parsed from {element.name} (component graph JSON): {summarize_graph(graph)}"
+    return content
+
+def upload_images(message: cl.Message) -> list:
+    # Architecture diagrams uploaded as images (Persona B) are sent to the agent downscaled to
+    # the vision token budget; a diagram uploaded before is not uploaded again
+    images = []
+    for element in message.elements or []:
+        if not element.path or not element.name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        try:
+            images.append(image_cache.upload(project_client, element.path, element.name))
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            # Unreadable images and images too large to decode safely are left out of the message
+            print(f"Could not process image {element.name}: {e}")
+    if images:
+        metrics = image_cache.metrics()
+        print(f"Images: {metrics['images']} ({metrics['uploads']} uploaded), saved {metrics['bytes_saved']} bytes and {metrics['tokens_saved']} vision tokens")
+    return images
+
+async def render_event(event: ContractEvent, summary: cl.Message) -> None:
+    # Executive Summary lines are streamed into one message; each JSON section of the
+    # Output Contract gets its own message as soon as it is complete
+    if event.kind == "bullet":
+        await summary.stream_token(f"- {event.value}\n")
+    elif event.kind == "text":
+        await summary.stream_token(f"{event.value}\n")
+    elif isinstance(event.value, str):
+        await cl.Message(content=f"**{SECTION_TITLES.get(event.key, event.key)}**\n\n{event.value}").send()
+    else:
+        await cl.Message(
+            content=f"**{SECTION_TITLES.get(event.key, event.key)}**",
+            elements=[cl.Text(name=event.key, content=json.dumps(event.value, indent=2, ensure_ascii=False), language="json", display="inline")],
+        ).send()
+
 @cl.on_message
 async def main(message: cl.Message):
     
     # Get the thread ID from the user session
     thread_id = cl.user_session.get("thread_id")
+    content = with_parsed_diagrams(message)
 
-    # Add a message to the thread
-    message = project_client.agents.messages.create(
-        thread_id=thread_id,
-        role="user",  # Role of the message sender
-        content=message.content,  # Message content
-    )
-    
-     # Create and process agent run in thread with tools
-    run = project_client.agents.runs.create_and_process(thread_id=thread_id, agent_id=agent_id)
-    print(f"Run finished with status: {run.status}")
-
-    # Check the status of the run and print the result
-    if run.status == "failed":
-        response = run.last_error
-    elif run.status == "completed":
-        last_msg = project_client.agents.messages.get_last_message_text_by_role(thread_id=thread_id, role=MessageRole.AGENT)
-        if last_msg:
-            response = last_msg.text.value
-
-    # Send a response back to the user
-    await cl.Message(
-        content=response,
-    ).send()
+    images = await cl.make_async(upload_images)(message)
+
+    # Long conversations are compacted into a new thread (summary of older turns plus the last ones)
+    thread_id = await cl.make_async(compactor.compact_if_needed)(project_client, thread_id, content)
+    cl.user_session.set("thread_id", thread_id)
+
+    # Add the message to the thread and stream the answer of the agent
+    # (in a worker thread, so a session waiting for the model does not block the others)
+    summary = cl.Message(content="")
+    rendered = []
+
+    def on_event(event: ContractEvent) -> None:
+        rendered.append(event)
+        cl.run_sync(render_event(event, summary))
+
+    runs = []
+    start = time.perf_counter()
+    try:
+        response = await cl.make_async(stream_turn)(
+            project_client, thread_id, agent_id, content, on_event, on_run=runs.append, images=images,
+            tier=router.tier_for_agent("orchestrator"),
+        )
+    finally:
+        print(f"Deployments: {scheduler.metrics()}")
+        print(f"Model tiers: {router.report()}")
+        print(f"Tool telemetry: {overhead_stats()}")
+
+    # The specialists answer in the JSON of their contract section: their sections are
+    # validated and merged here instead of being rewritten by the orchestrator
+    if runs and runs[-1].status == "completed":
+        try:
+            prose, contract = await cl.make_async(assemble_contract)(project_client, thread_id, runs[-1], response)
+        except HttpResponseError as e:
+            print(f"Could not read the outputs of the connected agents: {e}")
+        else:
+            shown = {event.key for event in rendered if event.kind == "section"}
+            for key, value in contract.items():
+                if key not in shown:
+                    event = ContractEvent("section", key, value)
+                    rendered.append(event)
+                    await render_event(event, summary)
+            response = contract_answer(prose, contract)
+
+    # Keep the thread, the run and the answer locally (written to disk in the background)
+    key = session_key()
+    state_store.save_session(key, thread_id, agent_id, *(compactor.thread_size(thread_id) or (0, 0)))
+    state_store.record_turn(key, thread_id, agent_id, content, response, runs[-1] if runs else None, time.perf_counter() - start)
+
+    if any(event.kind != "section" for event in rendered):
+        await summary.update()
+    if not rendered:
+        # Nothing could be streamed (e.g. the run failed): send the response as is
+        await cl.Message(
+            content=response,
+        ).send()
 
 @cl.set_starters
 async def set_starters():
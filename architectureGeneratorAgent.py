@@ -1,30 +1,51 @@
 import asyncio
-from azure.identity.aio import AzureCliCredential
-from semantic_kernel.agents import AzureAIAgent, AzureAIAgentSettings, AzureAIAgentThread
+from azure_clients import get_async_credential, get_async_transport, close_async_clients
+from semantic_kernel.agents import AzureAIAgent, AzureAIAgentThread
+from semantic_kernel.functions import kernel_function
+from typing import Annotated
+from drawio_renderer import render_architecture_diagram
+from azure_services import AZURE_SERVICES
+from model_router import router
 
 # Business requirement input
 TASK = "Design an Azure architecture for a real-time analytics platform that ingests IoT data, processes it with Stream Analytics, stores it in SQL Database, and visualizes it using Power BI. Ensure secure access and scalability."
 
+class DiagramPlugin:
+    """Renders the Draw.io file locally from the compact component graph produced by the agent."""
+
+    @kernel_function(description="Renders an Azure architecture diagram (Draw.io) from a component graph and saves it to a file.")
+    def render_architecture_diagram(
+        self,
+        components: Annotated[str, "JSON with services (id, type, label, optional group and sku), optional groups (id, label, optional parent) and edges (from, to, optional label)"],
+    ) -> Annotated[str, "JSON with the path of the diagram file, or an error to fix in the component graph"]:
+        return render_architecture_diagram(components)
+
+
 async def main() -> None:
     async with (
-        AzureCliCredential() as creds,
-        AzureAIAgent.create_client(credential=creds) as client,
+        get_async_credential("cli") as creds,
+        AzureAIAgent.create_client(credential=creds, transport=get_async_transport()) as client,
     ):
-        # Create agent with image generation tool
+        # Create agent with the diagram rendering tool. The model only emits the compact component
+        # graph; layout and Draw.io XML are produced locally by the tool
         agent_definition = await client.agents.create_agent(
             name="ArchitectureDiagramAgent",
             instructions=(
-                "You are an expert Azure architect specialized in artificial intelligence solutions. Based on a business requirement, generate an arquitecture diagram of Draw.io (xml file) "
+                "You are an expert Azure architect specialized in artificial intelligence solutions. Based on a business requirement, design an architecture "
                 "including services like Azure OpenAI, AI Foundry, AI Search, AI Services, Document intelligence, storage accounts, postgresql, and security components. "
-                "Then generate the xml file of the representation of the architecture with a descriptive prompt. Make sure to diagram the connections or dependencies between the components." \
+                "Do NOT write Draw.io XML yourself: call the render_architecture_diagram tool with a compact JSON component graph, for example "
+                '{"groups": [{"id": "vnet", "label": "Virtual Network"}], "services": [{"id": "app", "type": "app_service", "group": "vnet"}, {"id": "aoai", "type": "azure_openai", "sku": "S0"}], '
+                '"edges": [{"from": "app", "to": "aoai", "label": "prompts"}]}. Make sure to include the connections or dependencies between the components as edges. '
+                f"Valid service types are: {', '.join(service.type for service in AZURE_SERVICES)}. "
+                "If the tool returns an error, fix the component graph and call it again. Finally, reply with the file path and a short description of the architecture. "
                 "You can use reference architectures in Azure as a guide https://learn.microsoft.com/en-us/azure/architecture/browse/?azure_categories=ai-machine-learning"
             ),
-            model=AzureAIAgentSettings().model_deployment_name,
+            model=router.deployment_for_agent("architecture_generator"),
 
         )
 
-        # Create Semantic Kernel agent
-        agent = AzureAIAgent(client=client, definition=agent_definition)
+        # Create Semantic Kernel agent with the diagram plugin
+        agent = AzureAIAgent(client=client, definition=agent_definition, plugins=[DiagramPlugin()])
 
         # Create conversation thread
         thread: AzureAIAgentThread | None = None
@@ -38,5 +59,8 @@ async def main() -> None:
             await thread.delete() if thread else None
             await client.agents.delete_agent(agent.id)
 
+    # Release the shared credential and HTTP session of this event loop
+    await close_async_clients()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
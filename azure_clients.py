@@ -0,0 +1,258 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Tuple
+from azure.core.credentials import AccessToken
+from azure.core.pipeline.transport import RequestsTransport
+from azure.identity import AzureCliCredential, DefaultAzureCredential
+from azure.ai.projects import AIProjectClient
+
+# Process-wide factory for credentials, transports and project clients.
+# Every module asks this factory instead of building its own DefaultAzureCredential and
+# AIProjectClient, so the credential chain is walked once, tokens are reused until shortly
+# before they expire and HTTP connections are pooled across clients.
+REFRESH_AHEAD_SECONDS = int(os.getenv("AZURE_TOKEN_REFRESH_AHEAD_SECONDS", "300"))
+POOL_MAXSIZE = int(os.getenv("AZURE_HTTP_POOL_MAXSIZE", "32"))
+
+_SYNC_CREDENTIALS = {"default": DefaultAzureCredential, "cli": AzureCliCredential}
+
+_lock = threading.Lock()
+_credentials: Dict[Tuple, "CachedTokenCredential"] = {}
+_project_clients: Dict[Tuple, AIProjectClient] = {}
+_transport: Optional[RequestsTransport] = None
+_async_clients: Dict[Tuple, Any] = {}
+
+
+class CachedTokenCredential:
+    """
+    Wraps a credential and caches its access tokens per scope. A token that is close to
+    expiring is refreshed in the background while the cached one is still returned, so
+    callers only wait on the credential for the very first token.
+    """
+
+    def __init__(self, credential, refresh_ahead: int = REFRESH_AHEAD_SECONDS):
+        self._credential = credential
+        self._refresh_ahead = refresh_ahead
+        self._tokens: Dict[Tuple, AccessToken] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes: str, claims: Optional[str] = None, tenant_id: Optional[str] = None, **kwargs) -> AccessToken:
+        key = (scopes, claims, tenant_id)
+        token = self._tokens.get(key)
+        remaining = token.expires_on - time.time() if token else 0
+
+        if token and remaining > self._refresh_ahead:
+            return token
+        if token and remaining > 30:
+            self._refresh_in_background(key, kwargs)
+            return token
+
+        with self._lock:
+            # Another caller may have fetched the token while we were waiting
+            token = self._tokens.get(key)
+            if token and token.expires_on - time.time() > 30:
+                return token
+            return self._fetch(key, kwargs)
+
+    def _fetch(self, key: Tuple, kwargs: Dict[str, Any]) -> AccessToken:
+        scopes, claims, tenant_id = key
+        token = self._credential.get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+        self._tokens[key] = token
+        return token
+
+    def _refresh_in_background(self, key: Tuple, kwargs: Dict[str, Any]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(key, kwargs)
+            except Exception:
+                # The cached token is still valid; the next call retries the refresh
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def close(self) -> None:
+        # Shared by the whole process: closing is a no-op so `with` blocks do not tear it down
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class AsyncCachedTokenCredential:
+    """Async counterpart of CachedTokenCredential for asyncio callers."""
+
+    def __init__(self, credential, refresh_ahead: int = REFRESH_AHEAD_SECONDS):
+        self._credential = credential
+        self._refresh_ahead = refresh_ahead
+        self._tokens: Dict[Tuple, AccessToken] = {}
+        self._refreshing: Dict[Tuple, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    async def get_token(self, *scopes: str, claims: Optional[str] = None, tenant_id: Optional[str] = None, **kwargs) -> AccessToken:
+        key = (scopes, claims, tenant_id)
+        token = self._tokens.get(key)
+        remaining = token.expires_on - time.time() if token else 0
+
+        if token and remaining > self._refresh_ahead:
+            return token
+        if token and remaining > 30:
+            if key not in self._refreshing:
+                self._refreshing[key] = asyncio.create_task(self._refresh(key, kwargs))
+            return token
+
+        async with self._lock:
+            token = self._tokens.get(key)
+            if token and token.expires_on - time.time() > 30:
+                return token
+            return await self._fetch(key, kwargs)
+
+    async def _fetch(self, key: Tuple, kwargs: Dict[str, Any]) -> AccessToken:
+        scopes, claims, tenant_id = key
+        token = await self._credential.get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+        self._tokens[key] = token
+        return token
+
+    async def _refresh(self, key: Tuple, kwargs: Dict[str, Any]) -> None:
+        try:
+            await self._fetch(key, kwargs)
+        except Exception:
+            pass
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def get_credential(kind: str = "default", **kwargs) -> CachedTokenCredential:
+    """
+    Returns the process-wide credential for the given kind and options.
+
+    :param kind: "default" for DefaultAzureCredential or "cli" for AzureCliCredential.
+    :param kwargs: Options passed to the credential, e.g. managed_identity_client_id.
+    """
+    key = (kind, tuple(sorted(kwargs.items())))
+    with _lock:
+        if key not in _credentials:
+            _credentials[key] = CachedTokenCredential(_SYNC_CREDENTIALS[kind](**kwargs))
+        return _credentials[key]
+
+
+def get_transport() -> RequestsTransport:
+    """Returns the HTTP transport shared by all sync clients, with a pooled session."""
+    global _transport
+    with _lock:
+        if _transport is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _transport = RequestsTransport(session=session, session_owner=False)
+        return _transport
+
+
+def get_project_client(endpoint: Optional[str] = None, kind: str = "default", **credential_kwargs) -> AIProjectClient:
+    """
+    Returns the process-wide AIProjectClient for an endpoint.
+
+    :param endpoint: Project endpoint, defaults to the AZURE_AI_AGENT_ENDPOINT environment variable.
+    :param kind: Credential kind, see get_credential.
+    :param credential_kwargs: Options passed to the credential.
+    """
+    endpoint = endpoint or os.environ["AZURE_AI_AGENT_ENDPOINT"]
+    credential = get_credential(kind, **credential_kwargs)
+    # Taken before _lock, which get_transport acquires too
+    transport = get_transport()
+    key = (endpoint, kind, tuple(sorted(credential_kwargs.items())))
+    with _lock:
+        if key not in _project_clients:
+            _project_clients[key] = AIProjectClient(endpoint=endpoint, credential=credential, transport=transport)
+        return _project_clients[key]
+
+
+def _loop_key(*parts) -> Tuple:
+    # Async credentials and sessions are bound to the event loop that created them
+    return (id(asyncio.get_running_loop()),) + parts
+
+
+def get_async_credential(kind: str = "cli", **kwargs) -> AsyncCachedTokenCredential:
+    """
+    Returns the async credential of the running event loop for the given kind and options.
+
+    :param kind: "default" for DefaultAzureCredential or "cli" for AzureCliCredential.
+    """
+    from azure.identity.aio import AzureCliCredential as AsyncAzureCliCredential
+    from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
+
+    key = _loop_key("credential", kind, tuple(sorted(kwargs.items())))
+    if key not in _async_clients:
+        credential_type = {"default": AsyncDefaultAzureCredential, "cli": AsyncAzureCliCredential}[kind]
+        _async_clients[key] = AsyncCachedTokenCredential(credential_type(**kwargs))
+    return _async_clients[key]
+
+
+def get_async_transport():
+    """Returns the HTTP transport shared by the async clients of the running event loop."""
+    from azure.core.pipeline.transport import AioHttpTransport
+    import aiohttp
+
+    key = _loop_key("transport")
+    if key not in _async_clients:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=POOL_MAXSIZE))
+        _async_clients[key] = AioHttpTransport(session=session, session_owner=False)
+    return _async_clients[key]
+
+
+def get_async_project_client(endpoint: Optional[str] = None, kind: str = "cli", **credential_kwargs):
+    """
+    Returns the async AIProjectClient of the running event loop for an endpoint.
+
+    :param endpoint: Project endpoint, defaults to the AZURE_AI_AGENT_ENDPOINT environment variable.
+    :param kind: Credential kind, see get_async_credential.
+    """
+    from azure.ai.projects.aio import AIProjectClient as AsyncAIProjectClient
+
+    endpoint = endpoint or os.environ["AZURE_AI_AGENT_ENDPOINT"]
+    key = _loop_key("project_client", endpoint, kind, tuple(sorted(credential_kwargs.items())))
+    if key not in _async_clients:
+        _async_clients[key] = AsyncAIProjectClient(
+            endpoint=endpoint,
+            credential=get_async_credential(kind, **credential_kwargs),
+            transport=get_async_transport(),
+        )
+    return _async_clients[key]
+
+
+async def close_async_clients() -> None:
+    """Closes the async clients, credentials and sessions of the running event loop."""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _async_clients if key[0] == loop_id]:
+        item = _async_clients.pop(key)
+        if key[1] == "credential":
+            await item._credential.close()
+        elif key[1] == "transport":
+            await item.session.close()
+        else:
+            await item.close()
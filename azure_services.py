@@ -0,0 +1,148 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+class AzureService(NamedTuple):
+    """Canonical Azure service type used by the diagram, Bicep and pricing tools."""
+
+    type: str
+    name: str
+    stencil: str
+    keywords: Tuple[str, ...]
+    # Words that name the service as the label of a diagram shape, but not in a sentence ("storage", "browser")
+    label_keywords: Tuple[str, ...] = ()
+
+
+# Draw.io "azure2" icon library paths and the names users and diagrams use for each service.
+# Keywords are matched against lower-cased labels, styles and texts, longest keyword first;
+# label keywords only against labels and styles (match_service_type).
+AZURE_SERVICES: List[AzureService] = [
+    AzureService("azure_openai", "Azure OpenAI", "img/lib/azure2/ai_machine_learning/Azure_OpenAI.svg", ("azure openai", "openai", "aoai", "gpt-4o", "gpt-4.1", "gpt-4", "gpt-35-turbo"), ("gpt",)),
+    AzureService("ai_foundry", "Azure AI Foundry", "img/lib/azure2/ai_machine_learning/AI_Studio.svg", ("ai foundry", "ai studio", "foundry")),
+    AzureService("ai_search", "Azure AI Search", "img/lib/azure2/app_services/Search_Services.svg", ("ai search", "cognitive search", "azure search", "search service")),
+    AzureService("ai_services", "Azure AI Services", "img/lib/azure2/ai_machine_learning/Cognitive_Services.svg", ("ai services", "cognitive services", "cognitive_services")),
+    AzureService("document_intelligence", "Document Intelligence", "img/lib/azure2/ai_machine_learning/Form_Recognizers.svg", ("document intelligence", "form recognizer", "form_recognizer")),
+    AzureService("speech", "Speech Services", "img/lib/azure2/ai_machine_learning/Speech_Services.svg", ("speech", "speech to text", "text to speech")),
+    AzureService("language", "Language Services", "img/lib/azure2/ai_machine_learning/Language_Services.svg", ("language service", "text analytics", "language_services")),
+    AzureService("machine_learning", "Azure Machine Learning", "img/lib/azure2/ai_machine_learning/Machine_Learning.svg", ("machine learning", "azure ml", "machine_learning")),
+    AzureService("bot_service", "Azure Bot Service", "img/lib/azure2/ai_machine_learning/Bot_Services.svg", ("bot service", "azure bot", "bot_services", "chatbot")),
+    AzureService("storage", "Storage Account", "img/lib/azure2/storage/Storage_Accounts.svg", ("storage account", "blob storage", "blob", "data lake", "adls", "storage_accounts"), ("storage",)),
+    AzureService("postgresql", "Azure Database for PostgreSQL", "img/lib/azure2/databases/Azure_Database_PostgreSQL_Server.svg", ("postgresql", "postgres", "pgvector")),
+    AzureService("sql_database", "Azure SQL Database", "img/lib/azure2/databases/SQL_Database.svg", ("sql database", "azure sql", "sql_database")),
+    AzureService("cosmos_db", "Azure Cosmos DB", "img/lib/azure2/databases/Azure_Cosmos_DB.svg", ("cosmos db", "cosmosdb", "cosmos")),
+    AzureService("key_vault", "Key Vault", "img/lib/azure2/security/Key_Vaults.svg", ("key vault", "keyvault", "key_vaults")),
+    AzureService("entra_id", "Microsoft Entra ID", "img/lib/azure2/identity/Azure_Active_Directory.svg", ("entra", "azure active directory", "azure ad", "azure_active_directory")),
+    AzureService("app_service", "App Service", "img/lib/azure2/app_services/App_Services.svg", ("app service", "web app", "webapp", "app_services")),
+    AzureService("functions", "Azure Functions", "img/lib/azure2/compute/Function_Apps.svg", ("azure functions", "function app", "function_apps"), ("functions",)),
+    AzureService("container_apps", "Azure Container Apps", "img/lib/azure2/other/Container_App_Environments.svg", ("container apps", "container app", "container_app")),
+    AzureService("aks", "Azure Kubernetes Service", "img/lib/azure2/compute/Kubernetes_Services.svg", ("kubernetes", "aks", "kubernetes_services")),
+    AzureService("api_management", "API Management", "img/lib/azure2/app_services/API_Management_Services.svg", ("api management", "apim", "api_management")),
+    AzureService("front_door", "Azure Front Door", "img/lib/azure2/networking/Front_Doors.svg", ("front door", "front_doors")),
+    AzureService("application_gateway", "Application Gateway", "img/lib/azure2/networking/Application_Gateways.svg", ("application gateway", "app gateway", "application_gateways", "web application firewall")),
+    AzureService("virtual_network", "Virtual Network", "img/lib/azure2/networking/Virtual_Networks.svg", ("virtual network", "vnet", "virtual_networks")),
+    AzureService("private_endpoint", "Private Endpoint", "img/lib/azure2/networking/Private_Endpoint.svg", ("private endpoint", "private link", "private_endpoint")),
+    AzureService("event_hubs", "Event Hubs", "img/lib/azure2/analytics/Event_Hubs.svg", ("event hubs", "event hub", "event_hubs")),
+    AzureService("service_bus", "Service Bus", "img/lib/azure2/integration/Service_Bus.svg", ("service bus", "service_bus")),
+    AzureService("iot_hub", "IoT Hub", "img/lib/azure2/iot/IoT_Hub.svg", ("iot hub", "iot_hub", "iot")),
+    AzureService("stream_analytics", "Stream Analytics", "img/lib/azure2/analytics/Stream_Analytics_Jobs.svg", ("stream analytics", "stream_analytics")),
+    AzureService("data_factory", "Data Factory", "img/lib/azure2/databases/Data_Factory.svg", ("data factory", "data_factory", "adf")),
+    AzureService("synapse", "Azure Synapse Analytics", "img/lib/azure2/analytics/Azure_Synapse_Analytics.svg", ("synapse",)),
+    AzureService("power_bi", "Power BI", "img/lib/azure2/analytics/Power_BI_Embedded.svg", ("power bi", "powerbi", "power_bi")),
+    AzureService("logic_apps", "Logic Apps", "img/lib/azure2/integration/Logic_Apps.svg", ("logic app", "logic_apps")),
+    AzureService("monitor", "Azure Monitor", "img/lib/azure2/management_governance/Monitor.svg", ("azure monitor", "log analytics"), ("monitor",)),
+    AzureService("application_insights", "Application Insights", "img/lib/azure2/devops/Application_Insights.svg", ("application insights", "app insights", "application_insights")),
+    AzureService("user", "Users", "img/lib/azure2/identity/Users.svg", (), ("users", "user", "client", "browser")),
+]
+
+SERVICES_BY_TYPE: Dict[str, AzureService] = {service.type: service for service in AZURE_SERVICES}
+
+# Azure Retail Prices API $filter of the meters of each service type (without the region)
+RETAIL_PRICE_FILTERS: Dict[str, str] = {
+    "azure_openai": "serviceName eq 'Cognitive Services' and contains(productName, 'OpenAI')",
+    "ai_search": "serviceName eq 'Azure Cognitive Search'",
+    "document_intelligence": "serviceName eq 'Cognitive Services' and contains(productName, 'Form Recognizer')",
+    "speech": "serviceName eq 'Cognitive Services' and contains(productName, 'Speech')",
+    "storage": "serviceName eq 'Storage' and productName eq 'Blob Storage'",
+    "postgresql": "serviceName eq 'Azure Database for PostgreSQL'",
+    "sql_database": "serviceName eq 'SQL Database'",
+    "cosmos_db": "serviceName eq 'Azure Cosmos DB'",
+    "key_vault": "serviceName eq 'Key Vault'",
+    "app_service": "serviceName eq 'Azure App Service'",
+    "functions": "serviceName eq 'Functions'",
+    "container_apps": "serviceName eq 'Azure Container Apps'",
+    "aks": "serviceName eq 'Azure Kubernetes Service'",
+    "api_management": "serviceName eq 'API Management'",
+    "front_door": "serviceName eq 'Azure Front Door Service'",
+    "application_gateway": "serviceName eq 'Application Gateway'",
+    "event_hubs": "serviceName eq 'Event Hubs'",
+    "service_bus": "serviceName eq 'Service Bus'",
+    "monitor": "serviceName eq 'Log Analytics'",
+}
+
+# Region the orchestrator assumes when the user does not name one
+DEFAULT_REGION = "eastus"
+_REGIONS = (
+    "eastus", "eastus2", "westus", "westus2", "westus3", "centralus", "northcentralus", "southcentralus",
+    "canadacentral", "brazilsouth", "northeurope", "westeurope", "uksouth", "francecentral", "germanywestcentral",
+    "swedencentral", "switzerlandnorth", "norwayeast", "eastasia", "southeastasia", "japaneast", "koreacentral",
+    "australiaeast", "centralindia", "uaenorth", "southafricanorth",
+)
+# "eastus2" also matches "East US 2" and "east-us-2"
+_REGION_PATTERNS = [(region, re.compile(r"\b" + r"[\s_-]?".join(region) + r"\b", re.IGNORECASE)) for region in _REGIONS]
+
+# (keyword, service type) pairs, longest keyword first so "azure openai" wins over "openai"
+_KEYWORDS: List[Tuple[str, str]] = sorted(
+    ((keyword, service.type) for service in AZURE_SERVICES for keyword in service.keywords),
+    key=lambda item: -len(item[0]),
+)
+_LABEL_KEYWORDS: List[Tuple[str, str]] = sorted(
+    _KEYWORDS + [(keyword, service.type) for service in AZURE_SERVICES for keyword in service.label_keywords],
+    key=lambda item: -len(item[0]),
+)
+_STENCILS: Dict[str, str] = {service.stencil.rsplit("/", 1)[-1].lower(): service.type for service in AZURE_SERVICES}
+
+
+def _find_word(text: str, keyword: str) -> int:
+    """Position of the first whole-word match of keyword in text ("aks" must not match "breaks"), or -1."""
+    position = text.find(keyword)
+    while position != -1:
+        end = position + len(keyword)
+        if (position == 0 or not text[position - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+            return position
+        position = text.find(keyword, position + 1)
+    return -1
+
+
+def match_service_type(text: str) -> Optional[str]:
+    """
+    Returns the service type whose stencil or keyword appears in a label or style, if any.
+    """
+    text = text.lower()
+    for stencil, service_type in _STENCILS.items():
+        if stencil in text:
+            return service_type
+    for keyword, service_type in _LABEL_KEYWORDS:
+        if _find_word(text, keyword) != -1:
+            return service_type
+    return None
+
+
+def find_service_types(text: str) -> List[str]:
+    """
+    Returns every service type mentioned in a free-form text, in order of first mention.
+    """
+    text = text.lower()
+    found: Dict[str, int] = {}
+    for keyword, service_type in _KEYWORDS:
+        position = _find_word(text, keyword)
+        if position != -1 and position < found.get(service_type, len(text)):
+            found[service_type] = position
+    return sorted(found, key=found.get)
+
+
+def find_region(text: str) -> str:
+    """
+    Returns the first Azure region named in a text ("East US 2" or "eastus2"), or DEFAULT_REGION.
+    """
+    found = [(match.start(), -len(region), region) for region, pattern in _REGION_PATTERNS for match in [pattern.search(text)] if match]
+    return min(found)[2] if found else DEFAULT_REGION
@@ -0,0 +1,58 @@
+"""
+DESCRIPTION:
+    Runs one long conversation against the local FakeProjectClient, with and without thread
+    compaction, and reports the prompt tokens and latency of the turns. With compaction the
+    prompt tokens per turn should stay bounded instead of growing with the conversation.
+
+USAGE:
+    python -m benchmarks.compaction --turns 40 --answer-chars 8000
+"""
+import argparse
+import time
+
+import agent_session
+from benchmarks.fake_agents import FakeAgentsService, FakeProjectClient
+from deployment_scheduler import DeploymentScheduler
+from thread_compaction import ThreadCompactor
+
+
+def run_session(turns: int, answer_chars: int, compaction: bool) -> list:
+    """Prompt tokens and seconds of every turn of one conversation."""
+    project_client = FakeProjectClient(FakeAgentsService(run_latency="const:0.01", answer_chars=answer_chars, seed=0))
+    if compaction:
+        compactor = ThreadCompactor()
+    else:
+        compactor = ThreadCompactor(threshold_tokens=10**12, threshold_messages=10**6, last_messages=10**6 + 2)
+    # run_turn uses the module-level compactor and scheduler; the benchmark swaps in its own
+    agent_session.compactor = compactor
+    agent_session.scheduler = DeploymentScheduler(default_tpm=10**12, default_rpm=10**6)
+
+    thread_id = project_client.agents.threads.create().id
+    results = []
+    for turn in range(turns):
+        prompt = f"Turn {turn}: review the architecture again with a different region and budget."
+        start = time.perf_counter()
+        thread_id = compactor.compact_if_needed(project_client, thread_id, prompt)
+        agent_session.run_turn(project_client, thread_id, "asst_benchmark", prompt)
+        results.append((compactor.metrics()["last_prompt_tokens"], time.perf_counter() - start))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Thread compaction benchmark")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--answer-chars", type=int, default=8000, help="Size of the structured output of every answer")
+    args = parser.parse_args()
+
+    without = run_session(args.turns, args.answer_chars, compaction=False)
+    with_compaction = run_session(args.turns, args.answer_chars, compaction=True)
+    print(f"{'turn':>5} {'prompt tokens':>14} {'compacted':>10}")
+    for turn in range(0, args.turns, max(args.turns // 10, 1)):
+        print(f"{turn + 1:>5} {without[turn][0]:>14} {with_compaction[turn][0]:>10}")
+    for name, results in (("without compaction", without), ("with compaction", with_compaction)):
+        tokens = [result[0] for result in results]
+        print(f"{name}: max {max(tokens)} prompt tokens, total {sum(tokens)}, {sum(r[1] for r in results):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+DESCRIPTION:
+    Parses synthetic Draw.io diagrams of growing size (rendered with drawio_renderer) and
+    reports the parse time per node, which should stay flat if parsing is linear-time.
+
+USAGE:
+    python -m benchmarks.diagram_parsing --sizes 1000,2000,4000,8000
+"""
+import argparse
+import random
+import time
+
+from azure_services import AZURE_SERVICES
+from drawio_parser import parse_diagram
+from drawio_renderer import render_drawio
+
+
+def synthetic_graph(nodes: int, seed: int = 0) -> dict:
+    """A random diagram with one group per 50 services and two edges per service."""
+    rng = random.Random(seed)
+    groups = [{"id": f"g{i}", "label": f"Subnet {i}"} for i in range(max(nodes // 50, 1))]
+    services = [
+        {"id": f"s{i}", "type": rng.choice(AZURE_SERVICES).type, "sku": rng.choice([None, "S1", "P1v3", "Standard_LRS"]), "group": rng.choice(groups)["id"]}
+        for i in range(nodes)
+    ]
+    edges = [{"from": f"s{rng.randrange(nodes)}", "to": f"s{rng.randrange(nodes)}", "label": "calls"} for _ in range(2 * nodes)]
+    return {"groups": groups, "services": services, "edges": edges}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Diagram parser scaling benchmark")
+    parser.add_argument("--sizes", default="1000,2000,4000,8000", help="Comma separated numbers of services")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} {'xml KB':>8} {'parse ms':>10} {'us/node':>8}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        xml = render_drawio(synthetic_graph(size))
+        start = time.perf_counter()
+        graph = parse_diagram(xml)
+        elapsed = time.perf_counter() - start
+        assert len(graph["services"]) == size and len(graph["edges"]) == 2 * size
+        print(f"{size:>8} {len(xml) // 1024:>8} {elapsed * 1000:>10.1f} {elapsed / size * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
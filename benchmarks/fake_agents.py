@@ -0,0 +1,434 @@
+"""
+DESCRIPTION:
+    Local stand-in for the Azure AI Agents service, used to benchmark the glue code of the
+    Chainlit app and the Azure Function without spending Azure quota.
+
+    FakeProjectClient mimics the subset of AIProjectClient.agents used in this repo
+    (threads, messages, runs, file uploads). serve() exposes the same simulation over HTTP for load
+    generators that run out of process.
+
+    Latencies are described with distribution specs (seconds):
+        const:0.5            always 0.5
+        uniform:0.2,1.5      uniformly distributed between 0.2 and 1.5
+        normal:1.0,0.2       normal with mean 1.0 and standard deviation 0.2 (clamped at 0)
+        lognormal:0.0,0.5    lognormal with mu 0.0 and sigma 0.5
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+
+def parse_distribution(spec: str, rng: Optional[random.Random] = None) -> Callable[[], float]:
+    """
+    Turns a distribution spec such as "lognormal:0.0,0.5" into a sampler returning seconds.
+    """
+    rng = rng or random.Random()
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    if kind == "const":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class Model(dict):
+    """Dictionary with attribute access, like the models returned by the Agents SDK."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError as e:
+            raise AttributeError(name) from e
+
+
+def _role(role) -> str:
+    # MessageRole is a str enum; str() of it would return the member name
+    return getattr(role, "value", role)
+
+
+def _last_messages(truncation_strategy) -> Optional[int]:
+    if truncation_strategy and truncation_strategy["type"] == "last_messages":
+        return truncation_strategy["last_messages"]
+    return None
+
+
+def _text_content(text: str) -> Model:
+    return Model(type="text", text=Model(value=text, annotations=[]))
+
+
+class FakeAgentsService:
+    """
+    In-memory simulation of threads, messages and runs.
+
+    A run stays "queued"/"in_progress" for its simulated duration: one sample of the run
+    latency plus the latency of every configured tool call (sequential, or the slowest
+    one if tools run in parallel). It then completes with a canned agent answer.
+
+    :param run_latency: Distribution spec of the model time of a run.
+    :param tool_latencies: Distribution spec per tool name called during each run.
+    :param parallel_tools: Whether tool calls of a run overlap.
+    :param failure_rate: Fraction of runs that finish with status "failed".
+    :param seed: Seed for reproducible latency samples.
+    :param answer_chars: Size of a JSON block appended to every answer, like the Output Contract
+        of the orchestrator. Runs report usage with prompt tokens estimated at 4 characters per
+        token over the messages they see (honoring a last_messages truncation strategy).
+        Streamed runs deliver the answer in deltas spread over the run duration.
+    :param model_latencies: Distribution spec of the model time of the runs on a deployment
+        (the model of the run, passed to runs.create), instead of run_latency.
+    :param hedge_rates: Fraction of the runs on a deployment that answer without confidence.
+    """
+
+    def __init__(
+        self,
+        run_latency: str = "lognormal:0.0,0.5",
+        tool_latencies: Optional[Dict[str, str]] = None,
+        parallel_tools: bool = False,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+        answer_chars: int = 0,
+        model_latencies: Optional[Dict[str, str]] = None,
+        hedge_rates: Optional[Dict[str, float]] = None,
+    ):
+        self._rng = random.Random(seed)
+        self._run_latency = parse_distribution(run_latency, self._rng)
+        self._tool_latencies = {name: parse_distribution(spec, self._rng) for name, spec in (tool_latencies or {}).items()}
+        self._parallel_tools = parallel_tools
+        self._failure_rate = failure_rate
+        self._answer_chars = answer_chars
+        self._model_latencies = {model: parse_distribution(spec, self._rng) for model, spec in (model_latencies or {}).items()}
+        self._hedge_rates = hedge_rates or {}
+        self._lock = threading.Lock()
+        self._threads: Dict[str, List[Model]] = {}
+        self._runs: Dict[str, Model] = {}
+        self._thread_runs: Dict[str, List[str]] = {}
+        self._files: Dict[str, Model] = {}
+
+    @staticmethod
+    def _new_id(prefix: str) -> str:
+        return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+    def _run_duration(self, model: Optional[str] = None):
+        with self._lock:
+            duration = self._model_latencies.get(model, self._run_latency)()
+            tool_times = [sampler() for sampler in self._tool_latencies.values()]
+            failed = self._rng.random() < self._failure_rate
+            hedged = self._rng.random() < self._hedge_rates.get(model, 0.0)
+        if tool_times:
+            duration += max(tool_times) if self._parallel_tools else sum(tool_times)
+        return duration, failed, hedged
+
+    def create_thread(self, messages: Optional[List] = None) -> Model:
+        thread = Model(id=self._new_id("thread"), object="thread", created_at=int(time.time()))
+        with self._lock:
+            self._threads[thread.id] = []
+        for message in messages or []:
+            self.create_message(thread.id, _role(message["role"]), message["content"])
+        return thread
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            del self._threads[thread_id]
+
+    def create_message(self, thread_id: str, role: str, content) -> Model:
+        if isinstance(content, str):
+            parts = [_text_content(content)]
+        else:
+            # Content blocks: text and uploaded images
+            parts = [
+                _text_content(block["text"]) if block["type"] == "text" else Model(type="image_file", image_file=Model(file_id=block["image_file"]["file_id"]))
+                for block in content
+            ]
+        message = Model(
+            id=self._new_id("msg"),
+            object="thread.message",
+            thread_id=thread_id,
+            role=role,
+            content=parts,
+            created_at=int(time.time()),
+        )
+        with self._lock:
+            self._threads[thread_id].insert(0, message)
+        return message
+
+    def upload_file(self, data: bytes, filename: str, purpose: str) -> Model:
+        file_info = Model(id=self._new_id("assistant"), object="file", bytes=len(data), filename=filename, purpose=purpose, status="processed")
+        with self._lock:
+            self._files[file_info.id] = file_info
+        return file_info
+
+    def get_file(self, file_id: str) -> Model:
+        with self._lock:
+            file_info = self._files.get(file_id)
+        if file_info is None:
+            raise ResourceNotFoundError(f"No file found with id '{file_id}'.")
+        return file_info
+
+    def delete_file(self, file_id: str) -> None:
+        with self._lock:
+            self._files.pop(file_id, None)
+
+    def list_messages(self, thread_id: str, order: str = "desc") -> List[Model]:
+        with self._lock:
+            for run_id in self._thread_runs.get(thread_id, []):
+                self._complete_if_due(self._runs[run_id])
+            messages = list(self._threads[thread_id])
+        return messages[::-1] if order == "asc" else messages
+
+    def create_run(self, thread_id: str, agent_id: str, last_messages: Optional[int] = None, model: Optional[str] = None) -> Model:
+        duration, failed, hedged = self._run_duration(model)
+        run = Model(
+            id=self._new_id("run"),
+            object="thread.run",
+            thread_id=thread_id,
+            assistant_id=agent_id,
+            model=model,
+            status="queued",
+            last_error=None,
+            created_at=int(time.time()),
+            due_at=time.monotonic() + duration,
+            will_fail=failed,
+            last_messages=last_messages,
+            usage=None,
+        )
+        run["answer"] = self._answer_text(run.id, hedged)
+        with self._lock:
+            self._runs[run.id] = run
+            self._thread_runs.setdefault(thread_id, []).append(run.id)
+        return Model(run)
+
+    def get_run(self, thread_id: str, run_id: str) -> Model:
+        with self._lock:
+            run = self._runs[run_id]
+            self._complete_if_due(run)
+            return Model(run)
+
+    def _complete_if_due(self, run: Model) -> None:
+        # Must be called with the lock held
+        if run.status not in ("queued", "in_progress"):
+            return
+        if time.monotonic() < run.due_at:
+            run["status"] = "in_progress"
+            return
+        if run.will_fail:
+            run["status"] = "failed"
+            run["last_error"] = Model(code="server_error", message="Simulated run failure")
+            return
+        run["status"] = "completed"
+        text = run.answer
+        context = self._threads[run.thread_id][:run.last_messages]
+        prompt_tokens = sum(len(part.text.value) // 4 for message in context for part in message.content if part.type == "text")
+        run["usage"] = Model(prompt_tokens=prompt_tokens, completion_tokens=len(text) // 4, total_tokens=prompt_tokens + len(text) // 4)
+        answer = Model(
+            id=self._new_id("msg"),
+            object="thread.message",
+            thread_id=run.thread_id,
+            run_id=run.id,
+            role="assistant",
+            content=[_text_content(text)],
+            created_at=int(time.time()),
+        )
+        self._threads[run.thread_id].insert(0, answer)
+
+    def _answer_text(self, run_id: str, hedged: bool = False) -> str:
+        text = f"Simulated answer for run {run_id}"
+        if hedged:
+            text = f"I'm not sure, simulated answer for run {run_id}"
+        if self._answer_chars:
+            # Executive Summary followed by the JSON sections of the Output Contract
+            sections = ("architectureReview", "bicep", "costs", "successStories")
+            body = ",\n".join(f'  "{name}": "' + "x" * (self._answer_chars // len(sections)) + '"' for name in sections)
+            text += "\n- First finding\n- Second finding\n\n```json\n{\n" + body + "\n}\n```"
+        return text
+
+    def stream_run(self, thread_id: str, agent_id: str, last_messages: Optional[int] = None, chunk_chars: int = 200, model: Optional[str] = None):
+        """Yields the (event type, data) pairs of a streamed run, with the answer deltas spread over its duration."""
+        run = self.create_run(thread_id, agent_id, last_messages, model)
+        yield "thread.run.created", run
+        start, due_at = time.monotonic(), run.due_at
+        if not run.will_fail:
+            chunks = [run.answer[i:i + chunk_chars] for i in range(0, len(run.answer), chunk_chars)]
+            for index, chunk in enumerate(chunks):
+                delay = start + (due_at - start) * (index + 1) / len(chunks) - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                yield "thread.message.delta", Model(text=chunk)
+        run = self.wait_for_run(thread_id, run.id)
+        yield f"thread.run.{run.status}", run
+
+    def wait_for_run(self, thread_id: str, run_id: str) -> Model:
+        with self._lock:
+            remaining = self._runs[run_id].due_at - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        return self.get_run(thread_id, run_id)
+
+
+class _Threads:
+    def __init__(self, service: FakeAgentsService):
+        self._service = service
+
+    def create(self, messages: Optional[List] = None, **kwargs) -> Model:
+        return self._service.create_thread(messages)
+
+    def delete(self, thread_id: str, **kwargs) -> None:
+        self._service.delete_thread(thread_id)
+
+
+class _Messages:
+    def __init__(self, service: FakeAgentsService):
+        self._service = service
+
+    def create(self, thread_id: str, role: str, content, **kwargs) -> Model:
+        return self._service.create_message(thread_id, _role(role), content)
+
+    def list(self, thread_id: str, order: str = "desc", **kwargs) -> List[Model]:
+        return self._service.list_messages(thread_id, getattr(order, "value", order))
+
+    def get_last_message_text_by_role(self, thread_id: str, role) -> Optional[Model]:
+        for message in self._service.list_messages(thread_id):
+            if message.role == _role(role):
+                return message.content[-1]
+        return None
+
+
+class _Runs:
+    def __init__(self, service: FakeAgentsService):
+        self._service = service
+
+    def create(self, thread_id: str, agent_id: str, truncation_strategy=None, model: Optional[str] = None, **kwargs) -> Model:
+        return self._service.create_run(thread_id, agent_id, _last_messages(truncation_strategy), model)
+
+    def get(self, thread_id: str, run_id: str, **kwargs) -> Model:
+        return self._service.get_run(thread_id, run_id)
+
+    @contextmanager
+    def stream(self, thread_id: str, agent_id: str, truncation_strategy=None, model: Optional[str] = None, **kwargs):
+        events = self._service.stream_run(thread_id, agent_id, _last_messages(truncation_strategy), model=model)
+        yield ((event_type, data, None) for event_type, data in events)
+
+    def create_and_process(self, thread_id: str, agent_id: str, truncation_strategy=None, model: Optional[str] = None, **kwargs) -> Model:
+        run = self._service.create_run(thread_id, agent_id, _last_messages(truncation_strategy), model)
+        return self._service.wait_for_run(thread_id, run.id)
+
+
+class _Files:
+    def __init__(self, service: FakeAgentsService):
+        self._service = service
+
+    def upload_and_poll(self, file=None, purpose=None, filename: Optional[str] = None, file_path: Optional[str] = None, **kwargs) -> Model:
+        if file_path:
+            with open(file_path, "rb") as f:
+                file, filename = f.read(), os.path.basename(file_path)
+        return self._service.upload_file(file, filename, getattr(purpose, "value", purpose))
+
+    def get(self, file_id: str, **kwargs) -> Model:
+        return self._service.get_file(file_id)
+
+    def delete(self, file_id: str, **kwargs) -> None:
+        self._service.delete_file(file_id)
+
+
+class _Agents:
+    def __init__(self, service: FakeAgentsService):
+        self.threads = _Threads(service)
+        self.messages = _Messages(service)
+        self.runs = _Runs(service)
+        self.files = _Files(service)
+
+    def create_agent(self, model: str, name: str, **kwargs) -> Model:
+        return Model(id=FakeAgentsService._new_id("asst"), model=model, name=name)
+
+    def get_agent(self, agent_id: str) -> Model:
+        return Model(id=agent_id)
+
+    def delete_agent(self, agent_id: str) -> None:
+        return None
+
+
+class FakeProjectClient:
+    """In-process replacement for AIProjectClient backed by a FakeAgentsService."""
+
+    def __init__(self, service: Optional[FakeAgentsService] = None):
+        self.service = service or FakeAgentsService()
+        self.agents = _Agents(self.service)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+    def close(self) -> None:
+        return None
+
+
+def serve(service: FakeAgentsService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """
+    Exposes the simulation with the Agents REST routes used in this repo:
+    POST /threads, POST|GET /threads/{id}/messages, POST /threads/{id}/runs and
+    GET /threads/{id}/runs/{run_id}. Query strings such as api-version are ignored.
+
+    :return: The running server; call shutdown() to stop it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body) -> None:
+            payload = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _route(self) -> List[str]:
+            return [part for part in self.path.split("?", 1)[0].split("/") if part]
+
+        def _body(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_POST(self):
+            parts = self._route()
+            try:
+                if parts == ["threads"]:
+                    return self._reply(200, service.create_thread())
+                if len(parts) == 3 and parts[0] == "threads" and parts[2] == "messages":
+                    body = self._body()
+                    return self._reply(200, service.create_message(parts[1], body.get("role", "user"), body.get("content", "")))
+                if len(parts) == 3 and parts[0] == "threads" and parts[2] == "runs":
+                    body = self._body()
+                    return self._reply(200, service.create_run(parts[1], body.get("assistant_id", ""), model=body.get("model")))
+            except KeyError:
+                return self._reply(404, {"error": {"message": "Not found"}})
+            self._reply(404, {"error": {"message": f"Unknown route {self.path}"}})
+
+        def do_GET(self):
+            parts = self._route()
+            try:
+                if len(parts) == 3 and parts[0] == "threads" and parts[2] == "messages":
+                    return self._reply(200, {"object": "list", "data": service.list_messages(parts[1])})
+                if len(parts) == 4 and parts[0] == "threads" and parts[2] == "runs":
+                    return self._reply(200, service.get_run(parts[1], parts[3]))
+            except KeyError:
+                return self._reply(404, {"error": {"message": "Not found"}})
+            self._reply(404, {"error": {"message": f"Unknown route {self.path}"}})
+
+        def log_message(self, format, *args):
+            return None
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,88 @@
+"""
+DESCRIPTION:
+    Uploads synthetic architecture diagrams through the image pipeline (image_pipeline.py) to
+    the local FakeProjectClient, the way users upload them over a conversation: large
+    screenshots, the same file again, and re-exports of the same diagram at another size or
+    as JPEG. Re-exports are uploaded again (only identical files or prepared images are reused)
+    and counted as near-duplicates. Reports the uploads, cache hits, and bytes and vision
+    tokens saved against uploading every image as is.
+
+USAGE:
+    python -m benchmarks.image_uploads --diagrams 10 --repeats 3
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from benchmarks.fake_agents import FakeAgentsService, FakeProjectClient
+from image_pipeline import ImageUploadCache
+from state_store import StateStore
+
+
+def draw_diagram(seed: int, width: int = 3840, height: int = 2160) -> Image.Image:
+    """Boxes with labels connected by arrows, on a white background, like an exported architecture diagram."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    boxes = []
+    for index in range(rng.randint(8, 20)):
+        x, y = rng.randrange(0, width - 400), rng.randrange(0, height - 200)
+        boxes.append((x, y, x + rng.randint(200, 400), y + rng.randint(100, 200)))
+        color = rng.choice(["#0078d4", "#50e6ff", "#773adc", "#e81123", "#107c10"])
+        draw.rectangle(boxes[-1], outline=color, width=6, fill="#f3f2f1")
+        draw.text((x + 20, y + 20), f"Service {seed}-{index}", fill="black")
+    for a, b in zip(boxes, boxes[1:]):
+        draw.line((a[2], (a[1] + a[3]) // 2, b[0], (b[1] + b[3]) // 2), fill="#605e5c", width=4)
+    return image
+
+
+def encode(image: Image.Image, format: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Image preprocessing and upload deduplication benchmark")
+    parser.add_argument("--diagrams", type=int, default=10, help="Distinct diagrams")
+    parser.add_argument("--repeats", type=int, default=3, help="Times each file is uploaded again over the conversation")
+    args = parser.parse_args()
+
+    project_client = FakeProjectClient(FakeAgentsService(seed=0))
+    cache = ImageUploadCache(StateStore(":memory:"), "fake://project")
+    with tempfile.TemporaryDirectory() as directory:
+        files = []
+        for seed in range(args.diagrams):
+            diagram = draw_diagram(seed)
+            variants = {
+                "png": encode(diagram, "PNG"),
+                # The same diagram exported again: half the size, and as JPEG
+                "small.png": encode(diagram.resize((diagram.width // 2, diagram.height // 2), Image.Resampling.LANCZOS), "PNG"),
+                "jpg": encode(diagram, "JPEG", quality=90),
+            }
+            for suffix, data in variants.items():
+                path = os.path.join(directory, f"diagram{seed}.{suffix}")
+                with open(path, "wb") as f:
+                    f.write(data)
+                files.append(path)
+
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            for path in files:
+                cache.upload(project_client, path)
+        elapsed = time.perf_counter() - start
+
+    metrics = cache.metrics()
+    print(f"{metrics['images']} images in {elapsed:.2f} s: {metrics['uploads']} uploaded, {metrics['exact_hits']} same file, {metrics['prepared_hits']} same prepared image, "
+          f"{metrics['near_duplicates']} uploads of a near-duplicate")
+    print(f"bytes: {metrics['original_bytes']} -> {metrics['uploaded_bytes']} ({metrics['bytes_saved']} saved)")
+    print(f"vision tokens per reference: {metrics['original_tokens']} -> {metrics['tokens']} ({metrics['tokens_saved']} saved)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+DESCRIPTION:
+    Runs routine tasks (success-story summaries, price tables) and heavier ones (architecture
+    reviews) through agent_session.run_task against the local FakeProjectClient, once with every
+    task on the large tier and once with the model routing of model_router (routine tasks on the
+    small tier, escalated to the large one when the answer hedges). The small deployment is faster
+    and answers some prompts without confidence (--hedge-rate).
+
+    Reports the runs, escalations, latency and cost per tier, and the savings of the routing.
+
+USAGE:
+    python -m benchmarks.model_cascade --tasks 60 --hedge-rate 0.1
+"""
+import argparse
+import random
+import time
+
+import agent_session
+from benchmarks.fake_agents import FakeAgentsService, FakeProjectClient
+from deployment_scheduler import DeploymentScheduler
+from model_router import ModelRouter
+
+TASK_MIX = (("success_story_summary", 0.4), ("price_table", 0.4), ("architecture_review", 0.2))
+# Two tiers, whatever the .env configures
+TIERS = [
+    {"name": "small", "deployment": "gpt-4.1-mini", "input_price": 0.40, "output_price": 1.60},
+    {"name": "large", "deployment": "gpt-4o", "input_price": 2.50, "output_price": 10.00},
+]
+
+
+def run(tasks: list, router: ModelRouter, hedge_rate: float, seed: int) -> dict:
+    small, large = router.tiers[0].deployment, router.tiers[-1].deployment
+    service = FakeAgentsService(
+        model_latencies={small: "lognormal:-1.2,0.3", large: "lognormal:-0.5,0.3"},
+        hedge_rates={small: hedge_rate},
+        answer_chars=2000,
+        seed=seed,
+    )
+    project_client = FakeProjectClient(service)
+    # run_task uses the module-level router and scheduler; the benchmark swaps in its own
+    agent_session.router = router
+    agent_session.scheduler = DeploymentScheduler(default_tpm=10**12, default_rpm=10**6)
+
+    start = time.perf_counter()
+    for task in tasks:
+        thread_id = project_client.agents.threads.create().id
+        agent_session.run_task(project_client, thread_id, "asst_benchmark", f"Prompt for {task}", task)
+    return dict(router.report(), seconds=time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Model tier routing and escalation benchmark")
+    parser.add_argument("--tasks", type=int, default=60)
+    parser.add_argument("--hedge-rate", type=float, default=0.1, help="Share of the small-tier answers that fail the confidence check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names, weights = zip(*TASK_MIX)
+    tasks = rng.choices(names, weights, k=args.tasks)
+    routers = (
+        ("large tier only", ModelRouter(TIERS, task_tiers={name: "large" for name in names})),
+        ("routed", ModelRouter(TIERS)),
+    )
+    for name, router in routers:
+        result = run(tasks, router, args.hedge_rate, args.seed)
+        print(f"{name}: {result['seconds']:.2f} s, ${result['cost_usd']:.4f}, escalation rate {result['escalation_rate']}")
+        for tier, stats in result["tiers"].items():
+            print(
+                f"  {tier} ({stats['deployment']}): {stats['runs']} runs, {stats['escalated']} escalated, "
+                f"mean {stats['latency_mean_s']:.3f} s, p95 {stats['latency_p95_s']:.3f} s, ${stats['cost_usd']:.4f}"
+            )
+        print(f"  savings against the large tier: ${result['savings_usd']:.4f} of ${result['cost_largest_tier_usd']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
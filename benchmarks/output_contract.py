@@ -0,0 +1,120 @@
+"""
+DESCRIPTION:
+    Builds synthetic results of the five specialist agents for every prompt of a JSONL workload
+    (review findings, reference architectures, Bicep modules, price line items and success
+    stories, sized with --items) and assembles the Output Contract with the local validator and
+    merger (output_contract.py).
+
+    Reports the time of the local merge, and the tokens passed between the agents: the results as
+    free text (a markdown rendering of the same content) against compact JSON, and the answer of
+    the orchestrator when it rewrites the whole contract against its plan JSON only.
+
+USAGE:
+    python -m benchmarks.output_contract --prompts benchmarks/prompts.jsonl --items 6
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from azure_services import find_region, find_service_types
+from output_contract import merge_contract
+from thread_compaction import count_tokens
+
+PILLARS = ("Reliability", "Security", "Cost Optimization", "Operational Excellence", "Performance Efficiency")
+
+
+def specialist_results(prompt: str, items: int) -> Dict[str, Any]:
+    """Results of the specialists for a prompt, in the shape of their schemas."""
+    services = find_service_types(prompt) or ["app_service", "openai"]
+    region = find_region(prompt)
+    line_items = [
+        {
+            "service": service, "sku": "S1", "meter": f"{service} S1 Unit", "unitPrice": 0.25 + index, "unit": "1 Hour",
+            "quantity": 730, "monthly": round((0.25 + index) * 730, 2), "sourceId": f"meter-{index:04d}",
+            "apiQuery": f"https://prices.azure.com/api/retail/prices?$filter=serviceName eq '{service}' and armRegionName eq '{region}'",
+        }
+        for index, service in enumerate((services * items)[:items])
+    ]
+    return {
+        "architectureReview": [
+            {
+                "pillar": PILLARS[index % len(PILLARS)], "question": f"Review question {index} for {', '.join(services)}",
+                "status": "partial", "findings": [f"Finding {index}.{n} about private networking and identity" for n in range(3)],
+                "references": [f"https://learn.microsoft.com/azure/well-architected/ai/design-principles#section-{index}"],
+            }
+            for index in range(items)
+        ],
+        "referenceArchitectures": [
+            {"title": f"Baseline architecture {index}", "summary": "Fits the chatbot and the knowledge base; add private endpoints.",
+             "url": f"https://learn.microsoft.com/azure/architecture/ai-ml/architecture/baseline-{index}"}
+            for index in range(items // 2 or 1)
+        ],
+        "bicep": {
+            "modules": [{"name": f"modules/{service}.bicep@1.0.0", "purpose": f"Deploys {service}", "code": ""} for service in services]
+            + [{"name": "main.bicep", "purpose": "Composition", "code": "param location string\n" * items}],
+            "parameters": [{"name": "location", "type": "string", "value": region}, {"name": "prefix", "type": "string", "value": None}],
+            "notes": ["az deployment group what-if --template-file main.bicep", "bicep lint main.bicep"],
+        },
+        "costs": {
+            "market": "en-US", "currency": "USD", "region": region, "lineItems": line_items,
+            "totalMonthly": round(sum(item["monthly"] for item in line_items), 2), "missingDetails": ["Expected requests per month"],
+        },
+        "successStories": [
+            {"customer": f"Customer {index}", "businessGoal": "Reduce call handling time", "keyProducts": ["Azure OpenAI", "Azure AI Search"],
+             "technologySolution": "RAG over the knowledge base", "impact": "30% faster answers", "url": None}
+            for index in range(items // 2 or 1)
+        ],
+    }
+
+
+def as_prose(section: str, value: Any) -> str:
+    """Markdown rendering of a result, like the free-text answers of the specialists."""
+    items = value if isinstance(value, list) else [value]
+    lines = [f"## {section}", "Here is what I found for your request:"]
+    for item in items:
+        for key, field in item.items():
+            if isinstance(field, list):
+                lines.append(f"**{key}**:")
+                lines.extend(f"- {entry if not isinstance(entry, dict) else ', '.join(f'{k}: {v}' for k, v in entry.items())}" for entry in field)
+            else:
+                lines.append(f"**{key}**: {field}")
+        lines.append("")
+    lines.append("Let me know if you need more details.")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Output Contract merge benchmark")
+    parser.add_argument("--prompts", default="benchmarks/prompts.jsonl")
+    parser.add_argument("--items", type=int, default=6, help="Items per specialist result")
+    args = parser.parse_args()
+
+    with open(args.prompts, "r", encoding="utf-8") as f:
+        prompts = [json.loads(line)["prompt"] for line in f if line.strip()]
+
+    merge_ms: List[float] = []
+    tokens = {"prose": 0, "compact": 0, "contract": 0, "plan": 0}
+    for prompt in prompts:
+        results = specialist_results(prompt, args.items)
+        outputs = {section: [json.dumps({section: value}, separators=(",", ":"))] for section, value in results.items()}
+        plan = {"persona": "A", "summary": prompt, "assumptions": ["Market USD", "Region eastus"], "openQuestions": []}
+
+        start = time.perf_counter()
+        contract = merge_contract(plan, outputs)
+        merge_ms.append((time.perf_counter() - start) * 1000)
+
+        tokens["prose"] += sum(count_tokens(as_prose(section, value)) for section, value in results.items())
+        tokens["compact"] += sum(count_tokens(texts[0]) for texts in outputs.values())
+        # The orchestrator used to write the whole contract; now it writes the plan only
+        tokens["contract"] += count_tokens(json.dumps(contract, indent=2, ensure_ascii=False))
+        tokens["plan"] += count_tokens(json.dumps(plan, indent=2, ensure_ascii=False))
+
+    merge_ms.sort()
+    print(f"{len(prompts)} requests, local merge: mean {sum(merge_ms) / len(merge_ms):.3f} ms, max {merge_ms[-1]:.3f} ms")
+    print(f"specialist results: {tokens['prose']} tokens as free text, {tokens['compact']} as compact JSON")
+    print(f"orchestrator answer: {tokens['contract']} tokens rewriting the contract, {tokens['plan']} for the plan only")
+
+
+if __name__ == "__main__":
+    main()
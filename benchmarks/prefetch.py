@@ -0,0 +1,94 @@
+"""
+DESCRIPTION:
+    Replays the prompts of a JSONL workload with and without speculative prefetch. For every
+    prompt the orchestrator "plans" for --planning seconds, then calls the retrieval tools
+    with the arguments a specialist agent would use (a query about the same services and
+    topics). The tools are synthetic, with the plans, keys and match checks of the real ones
+    (pg_agent_tools, docs_index), and sleep for --tool-latency seconds.
+
+    Reports the time of every request after the planning step, and the prefetch hit rate.
+
+USAGE:
+    python -m benchmarks.prefetch --prompts benchmarks/prompts.jsonl --planning 1.5 --tool-latency 1.0
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+from prefetch import Prefetcher, same_query, topic_key
+
+
+def build_tools(prefetcher: Prefetcher, latency: float) -> Dict[str, Callable]:
+    """Synthetic retrieval tools registered with the key and plan of the real ones."""
+
+    @prefetcher.tool(
+        key=lambda call: (topic_key(call["vector_search_query"]), call["limit"]) if topic_key(call["vector_search_query"]) else None,
+        plan=lambda text: [{"vector_search_query": text, "limit": 10}],
+        match=same_query("vector_search_query"),
+    )
+    def vector_search_success_stories(vector_search_query: str, limit: int = 10) -> str:
+        time.sleep(latency)
+        return json.dumps({"stories": limit})
+
+    @prefetcher.tool(
+        key=lambda call: (topic_key(call["query"]), call["collection"], call["top"]) if topic_key(call["query"]) else None,
+        plan=lambda text: [{"query": text, "collection": collection, "top": 5} for collection in ("waf", "reference")],
+        match=same_query("query"),
+    )
+    def search_architecture_docs(query: str, collection: str = "all", top: int = 5) -> str:
+        time.sleep(latency)
+        return json.dumps([])
+
+    return {
+        "success_stories": vector_search_success_stories,
+        "docs": search_architecture_docs,
+    }
+
+
+def agent_calls(prompt: str, tools: Dict[str, Callable]) -> List[Callable[[], str]]:
+    """Tool calls of the specialist agents for a prompt, with queries rephrased the way an agent does."""
+    topics = " ".join(topic_key(prompt)).replace("_", " ")
+    calls = [lambda: tools["success_stories"](f"Success stories of {topics} solutions")]
+    calls.append(lambda: tools["docs"](f"Reference architecture for {topics}", collection="reference"))
+    return calls
+
+
+def run(prompts: List[str], planning: float, latency: float, prefetch: bool) -> Dict[str, float]:
+    prefetcher = Prefetcher(enabled=prefetch, enabled_tools=[])
+    tools = build_tools(prefetcher, latency)
+    seconds = []
+    for index, prompt in enumerate(prompts):
+        request_id = f"request-{index}"
+        prefetcher.start(request_id, prompt)
+        time.sleep(planning)  # The orchestrator classifies the persona and plans
+        start = time.perf_counter()
+        for call in agent_calls(prompt, tools):
+            call()
+        seconds.append(time.perf_counter() - start)
+        prefetcher.finish(request_id)
+    prefetcher.shutdown()
+    return dict(prefetcher.metrics(), seconds=sum(seconds), requests=len(prompts))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Speculative prefetch benchmark")
+    parser.add_argument("--prompts", default="benchmarks/prompts.jsonl")
+    parser.add_argument("--planning", type=float, default=1.5, help="Seconds the orchestrator takes before calling the tools")
+    parser.add_argument("--tool-latency", type=float, default=1.0, help="Seconds per retrieval")
+    args = parser.parse_args()
+
+    with open(args.prompts, "r", encoding="utf-8") as f:
+        prompts = [json.loads(line)["prompt"] for line in f if line.strip()]
+    for name, prefetch in (("without prefetch", False), ("with prefetch", True)):
+        result = run(prompts, args.planning, args.tool_latency, prefetch)
+        print(f"{name}: {result['seconds']:.2f} s of tool time after planning for {result['requests']} requests")
+        if prefetch:
+            print(
+                f"  started {result['started']}, hits {result['hits']} ({result['waited_hits']} still running), "
+                f"misses {result['misses']}, unused {result['unused']}, cancelled {result['cancelled']}, hit rate {result['hit_rate']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
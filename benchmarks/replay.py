@@ -0,0 +1,143 @@
+"""
+DESCRIPTION:
+    Replays a JSONL prompt workload against the glue code of the Chainlit app
+    (agent_session.run_turn) or the Azure Function (function_app.run_prompt) at several
+    concurrency levels, and reports throughput and p50/p90/p99 latency per level.
+
+    By default the calls go to the local FakeProjectClient, so no Azure quota is used.
+
+USAGE:
+    python -m benchmarks.replay --prompts benchmarks/prompts.jsonl --concurrency 1,4,16
+
+    Each line of the prompt file is a JSON object with a "prompt" field.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from benchmarks.fake_agents import FakeAgentsService, FakeProjectClient
+
+
+def load_prompts(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["prompt"] for line in f if line.strip()]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def chainlit_turn(project_client, agent_id: str) -> Callable[[str], str]:
+    """One Chainlit session per prompt: create the thread, then run the turn."""
+    from agent_session import run_turn
+
+    def turn(prompt: str) -> str:
+        thread = project_client.agents.threads.create()
+        return run_turn(project_client, thread.id, agent_id, prompt)
+
+    return turn
+
+
+def function_turn(project_client, agent_id: str) -> Callable[[str], str]:
+    """One HTTP request to the Function per prompt (without the agent setup)."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pg_azurefunction"))
+    from function_app import run_prompt
+
+    agent = project_client.agents.get_agent(agent_id)
+
+    def turn(prompt: str) -> str:
+        thread = project_client.agents.threads.create()
+        return run_prompt(project_client, thread, agent, prompt)
+
+    return turn
+
+
+TARGETS = {"chainlit": chainlit_turn, "function": function_turn}
+
+
+def run_level(turn: Callable[[str], str], prompts: List[str], concurrency: int) -> Dict[str, float]:
+    """Runs every prompt once with the given number of concurrent workers."""
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(prompt: str) -> float:
+        start = time.perf_counter()
+        turn(prompt)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed, prompt) for prompt in prompts]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(prompts),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p90_s": percentile(latencies, 90),
+        "p99_s": percentile(latencies, 99),
+    }
+
+
+def print_report(results: List[Dict[str, float]]) -> None:
+    print(f"{'concurrency':>11} {'requests':>8} {'errors':>6} {'rps':>8} {'p50 s':>8} {'p90 s':>8} {'p99 s':>8}")
+    for row in results:
+        print(
+            f"{row['concurrency']:>11} {row['requests']:>8} {row['errors']:>6} {row['throughput_rps']:>8.2f} "
+            f"{row['p50_s']:>8.3f} {row['p90_s']:>8.3f} {row['p99_s']:>8.3f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline latency and throughput benchmark")
+    parser.add_argument("--prompts", default=os.path.join(os.path.dirname(__file__), "prompts.jsonl"))
+    parser.add_argument("--target", choices=sorted(TARGETS), default="chainlit")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma separated concurrency levels")
+    parser.add_argument("--repeat", type=int, default=1, help="Times the prompt file is replayed per level")
+    parser.add_argument("--run-latency", default="lognormal:0.0,0.5")
+    parser.add_argument("--tool-latency", action="append", default=[], metavar="NAME=SPEC",
+                        help="Latency of a tool called in every run, e.g. get_cost_estimates=uniform:0.5,2")
+    parser.add_argument("--parallel-tools", action="store_true")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    service = FakeAgentsService(
+        run_latency=args.run_latency,
+        tool_latencies=dict(item.split("=", 1) for item in args.tool_latency),
+        parallel_tools=args.parallel_tools,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    )
+    project_client = FakeProjectClient(service)
+    agent = project_client.agents.create_agent(model="fake", name="benchmark")
+    turn = TARGETS[args.target](project_client, agent.id)
+
+    prompts = load_prompts(args.prompts) * args.repeat
+    results = [run_level(turn, prompts, int(level)) for level in args.concurrency.split(",")]
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+DESCRIPTION:
+    Sends a burst of Azure Function tool calls, with repeated arguments, through the queue-based
+    tool workers (pg_azurefunction/tool_workers.py) and checks that every call is answered under
+    its correlation ID. Reports how many tool executions were saved by deduplication and
+    batching, against executing every message on its own.
+
+    By default the queues are in memory; --azurite uses Azurite (or any Storage account given
+    with --connection-string). Several --workers poll the same queues, like Function instances.
+
+USAGE:
+    python -m benchmarks.tool_workers --calls 200 --distinct 40 --workers 2
+    python -m benchmarks.tool_workers --azurite
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pg_azurefunction"))
+from tool_workers import InMemoryQueue, StorageQueue, ToolRegistry, ToolWorker  # noqa: E402
+
+
+def build_registry(latency: float) -> ToolRegistry:
+    """Synthetic tools with the shape of worker_tools: a batchable search and a price lookup."""
+    registry = ToolRegistry()
+
+    def search_batch(calls):
+        time.sleep(latency)
+        return [json.dumps({"query": call["vector_search_query"], "stories": call.get("limit", 10)}) for call in calls]
+
+    @registry.register(name="vector_search_success_stories", batch=search_batch, batch_key=lambda arguments: arguments.get("limit", 10))
+    def search(vector_search_query: str, limit: int = 10) -> str:
+        """Synthetic vector search."""
+        return search_batch([{"vector_search_query": vector_search_query, "limit": limit}])[0]
+
+    @registry.register(name="get_azure_retail_prices")
+    def prices(filter: str, currency_code: str = "USD") -> str:
+        """Synthetic price lookup."""
+        time.sleep(latency)
+        return json.dumps({"filter": filter, "items": []})
+
+    return registry
+
+
+def make_calls(count: int, distinct: int, seed: int) -> list:
+    """Tool calls as the Agents service puts them on the input queues, with repeated arguments."""
+    rng = random.Random(seed)
+    calls = []
+    for _ in range(count):
+        n = rng.randrange(distinct)
+        if n % 2:
+            calls.append(("vector_search_success_stories", {"vector_search_query": f"use case {n}", "limit": 5}))
+        else:
+            calls.append(("get_azure_retail_prices", {"filter": f"serviceName eq 'Service {n}'"}))
+    return [(tool, dict(arguments, CorrelationId=str(uuid.uuid4()))) for tool, arguments in calls]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Queue-based tool workers benchmark")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=40, help="Number of distinct argument sets")
+    parser.add_argument("--workers", type=int, default=2, help="Workers polling the same queues")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per tool execution")
+    parser.add_argument("--azurite", action="store_true", help="Use Storage queues instead of in-memory queues")
+    parser.add_argument("--connection-string", default="UseDevelopmentStorage=true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    registry = build_registry(args.latency)
+    if args.azurite:
+        prefix = f"bench{uuid.uuid4().hex[:8]}"
+        input_queues = {tool.name: StorageQueue(args.connection_string, f"{prefix}-{tool.input_queue}") for tool in registry}
+        output_queue = StorageQueue(args.connection_string, f"{prefix}-output")
+    else:
+        input_queues = {tool.name: InMemoryQueue() for tool in registry}
+        output_queue = InMemoryQueue()
+
+    calls = make_calls(args.calls, args.distinct, args.seed)
+    for tool_name, message in calls:
+        input_queues[tool_name].send_message(json.dumps(message))
+
+    workers = [ToolWorker(registry) for _ in range(args.workers)]
+    start = time.perf_counter()
+
+    def drain(worker: ToolWorker) -> None:
+        while worker.poll(input_queues, output_queue):
+            pass
+
+    threads = [threading.Thread(target=drain, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    replies = {}
+    while True:
+        messages = output_queue.receive_messages(max_messages=32)
+        if not messages:
+            break
+        for message in messages:
+            reply = json.loads(message.content)
+            replies[reply["CorrelationId"]] = reply["Value"]
+            output_queue.delete_message(message)
+    missing = [message["CorrelationId"] for _, message in calls if message["CorrelationId"] not in replies]
+
+    stats = {key: sum(worker.stats()[key] for worker in workers) for key in workers[0].stats()}
+    for worker in workers:
+        worker.shutdown()
+    print(f"{len(calls)} calls, {len(replies)} replies, {len(missing)} missing, {elapsed:.2f} s")
+    print(f"executions {stats['executions']} (batches {stats['batches']}), deduplicated {stats['deduplicated']}, errors {stats['errors']}")
+    print(f"one execution per message: {len(calls) * args.latency:.2f} s of tool time, workers: {stats['executions'] * args.latency:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
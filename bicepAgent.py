@@ -0,0 +1,70 @@
+import os
+from azure.ai.agents.models import FunctionTool, ToolSet
+from bicep_assembler import bicep_functions
+from tool_executor import ConcurrentToolExecutor, create_and_process_run
+from dotenv import load_dotenv
+from azure_clients import get_project_client
+from model_router import router
+from output_contract import response_format
+# Load environment variables
+load_dotenv(".env")
+
+project_endpoint = os.getenv("AZURE_AI_AGENT_ENDPOINT")  # Ensure the PROJECT_ENDPOINT environment variable is set
+
+# Get the shared AIProjectClient instance (credential, tokens and connections are reused)
+project_client = get_project_client(project_endpoint)
+
+# Initialize agent toolset with the Bicep library functions
+functions = FunctionTool(bicep_functions)
+toolset = ToolSet()
+toolset.add(functions)
+
+tool_executor = ConcurrentToolExecutor(bicep_functions)
+
+agent = project_client.agents.create_agent(
+    model=router.deployment_for_agent("bicep"),
+    name="Bicep agent",
+    description="Bicep infrastructure as code expert Agent",
+    instructions="""
+    You are an expert Azure architect specialized in infrastructure as code with Bicep. Your role is to receive an architecture
+    (description or component graph) and return the Bicep templates to deploy it.
+    Do NOT write Bicep modules yourself: the modules come from a pre-validated, versioned library.
+    1) Call list_bicep_modules to see the available component types, their parameters and outputs.
+    2) Call assemble_bicep once with the composition: prefix (3 to 20 lowercase letters, digits and dashes), location and
+       the list of components with only the parameters that differ from the defaults. Never pass values for secure parameters
+       such as passwords: they are read from environment variables at deployment. Wire dependencies with "ref:<component>.<output>" values (e.g. app settings with endpoints).
+    3) If the tool returns an error, fix the composition and call it again.
+    Answer with the bicep JSON object: main.bicep and main.bicepparam as modules with their code, every library module used
+    as a module named by its path and version (empty code), the parameters of main.bicepparam, and as notes the validation
+    commands and the components not available in the library. Never include secrets in the templates.
+    """,
+    toolset=toolset,
+    # Compact JSON section of the Output Contract, merged by the app without another model pass
+    response_format=response_format("bicep"),
+)
+print(f"Created agent, ID: {agent.id}")
+
+# Create a thread for communication
+thread = project_client.agents.threads.create()
+print(f"Created thread, ID: {thread.id}")
+
+# Create a message to thread
+message = project_client.agents.messages.create(
+    thread_id=thread.id,
+    role="user",
+    content="I need the Bicep templates for a RAG solution in eastus: an App Service web app that uses Azure OpenAI (gpt-4o), Azure AI Search and a storage account for the documents.",
+)
+print(f"Created message, ID: {message.id}")
+
+# Create and process an agent run in the thread with tools
+run = create_and_process_run(project_client, thread_id=thread.id, agent_id=agent.id, executor=tool_executor)
+print(f"Run finished with status: {run.status}")
+
+# Fetch and log all messages exchanged during the conversation thread
+messages = project_client.agents.messages.list(thread_id=thread.id)
+for msg in messages:
+    print(f"Message ID: {msg.id}, Role: {msg.role}, Content: {msg.content}")
+
+# Delete the agent after use
+project_client.agents.delete_agent(agent.id)
+print("Deleted agent")
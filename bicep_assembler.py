@@ -0,0 +1,286 @@
+import os
+import re
+import json
+import shutil
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set
+
+# Versioned library of pre-validated Bicep modules (see bicep_library/index.json).
+# The Bicep agent only decides the composition; the boilerplate comes from the library.
+LIBRARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bicep_library")
+
+_PARAM_PATTERN = re.compile(r"^((?:@\w+\([^\n]*\)\s*\n)*)param (\w+) (\w+)( = .+)?$", re.MULTILINE)
+_OUTPUT_PATTERN = re.compile(r"^output (\w+) (\w+)", re.MULTILINE)
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Resource names are lowercase letters, digits and dashes. Per component type: the longest name
+# passed to the module (which adds suffixes such as "-plan") and whether it may contain dashes
+_NAME_RULES = {
+    "azure_openai": (64, True),
+    "ai_search": (60, True),
+    "storage": (24, False),
+    "postgresql": (63, True),
+    "key_vault": (24, False),
+    "app_service": (55, True),
+    "document_intelligence": (64, True),
+    "monitor": (58, True),
+}
+_DEFAULT_NAME_RULE = (60, True)
+# Prefix of every resource name: 3 to 20 lowercase letters, digits and dashes, starting with a letter
+_PREFIX_PATTERN = re.compile(r"^[a-z][a-z0-9-]{1,18}[a-z0-9]$")
+_PREFIX_MAX_LENGTH = 20
+
+
+@lru_cache(maxsize=1)
+def load_library() -> Dict[str, Any]:
+    """
+    Loads the module index and the parameters and outputs declared in every module file.
+    """
+    with open(os.path.join(LIBRARY_DIR, "index.json"), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    for module in index["modules"].values():
+        with open(os.path.join(LIBRARY_DIR, module["file"]), "r", encoding="utf-8") as f:
+            source = f.read()
+        module["params"] = {
+            name: {"type": param_type, "required": not default, "secure": "@secure()" in decorators}
+            for decorators, name, param_type, default in _PARAM_PATTERN.findall(source)
+        }
+        module["outputs"] = dict(_OUTPUT_PATTERN.findall(source))
+    return index
+
+
+def list_bicep_modules() -> str:
+    """
+    Lists the Bicep modules available in the library with their parameters and outputs.
+
+    :return: JSON with the library version and, per component type, the module description, parameters and outputs.
+    :rtype: str
+    """
+    index = load_library()
+    return json.dumps({
+        "version": index["version"],
+        "modules": {
+            component_type: {
+                "description": module["description"],
+                "parameters": {
+                    name: param["type"] + (" (required)" if param["required"] else "")
+                    for name, param in module["params"].items()
+                    if name not in ("name", "location", "tags")
+                },
+                "outputs": list(module["outputs"]),
+            }
+            for component_type, module in index["modules"].items()
+        },
+    })
+
+
+def _bicep_value(value: Any, refs: Set[str], indent: str = "    ") -> str:
+    """Renders a JSON value as a Bicep expression; "ref:<component>.<output>" strings become module outputs."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        if value.startswith("ref:"):
+            component, _, output = value[4:].partition(".")
+            refs.add(value[4:])
+            return f"{component}.outputs.{output}"
+        escaped = (
+            value.replace("\\", "\\\\").replace("'", "\\'").replace("${", "\\${")
+            .replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+        )
+        return f"'{escaped}'"
+    inner = indent + "  "
+    if isinstance(value, list):
+        if not value:
+            return "[]"
+        return "[\n" + "".join(f"{inner}{_bicep_value(item, refs, inner)}\n" for item in value) + f"{indent}]"
+    if isinstance(value, dict):
+        if not value:
+            return "{}"
+        lines = []
+        for key, item in value.items():
+            key = key if _IDENTIFIER.match(key) else _bicep_value(str(key), refs)
+            lines.append(f"{inner}{key}: {_bicep_value(item, refs, inner)}\n")
+        return "{\n" + "".join(lines) + f"{indent}}}"
+    raise ValueError(f"Unsupported value: {value!r}")
+
+
+def _has_ref(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.startswith("ref:")
+    if isinstance(value, list):
+        return any(_has_ref(item) for item in value)
+    if isinstance(value, dict):
+        return any(_has_ref(item) for item in value.values())
+    return False
+
+
+def _resource_name(component_type: str, name: str) -> str:
+    """
+    Bicep expression of the resource name of a component: the prefix and the component name,
+    lowercased, with underscores turned into dashes and within the length limit of the type.
+    """
+    max_length, dashes = _NAME_RULES.get(component_type, _DEFAULT_NAME_RULE)
+    suffix = re.sub(r"-+", "-", name.lower().replace("_", "-")).strip("-")
+    if not suffix:
+        raise ValueError(f"Component name {name} must contain letters or digits")
+    if not dashes:
+        return f"take(toLower(replace('${{namePrefix}}{suffix}', '-', '')), {max_length})"
+    # Room for the longest prefix and its dash, so the name is never cut after a dash
+    suffix = suffix[:max_length - _PREFIX_MAX_LENGTH - 1].rstrip("-")
+    return f"toLower('${{namePrefix}}-{suffix}')"
+
+
+def assemble(spec: Dict[str, Any], output_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Assembles main.bicep and main.bicepparam from a list of components.
+
+    The spec has the form:
+        {"prefix": "contoso", "location": "eastus",
+         "components": [{"type": "azure_openai", "name": "aoai", "parameters": {"sku": "S0"}},
+                        {"type": "app_service", "name": "web",
+                         "parameters": {"appSettings": {"AZURE_OPENAI_ENDPOINT": "ref:aoai.endpoint"}}}]}
+
+    Plain parameter values become parameters of main.bicep with their value in main.bicepparam;
+    values that reference other components are wired directly. Secure parameters are always read
+    from environment variables in main.bicepparam, so no secret is ever written. Resource names are
+    the prefix and the component name, adapted to the naming rules of each resource type.
+
+    :param output_dir: If given, main.bicep, main.bicepparam and the used modules are written there.
+    :raises ValueError: If a component type, parameter or reference is unknown, a required parameter
+        is missing, a secure parameter is given a value, the prefix is not a valid name prefix or the
+        location is not a plain string.
+    """
+    index = load_library()
+    location = spec.get("location")
+    if location is not None and (not isinstance(location, str) or location.startswith("ref:")):
+        raise ValueError(f"location must be a plain string, got {location!r}")
+    prefix = spec.get("prefix", "app")
+    if not isinstance(prefix, str) or not _PREFIX_PATTERN.match(prefix):
+        raise ValueError(f"prefix must have 3 to 20 lowercase letters, digits and dashes and start with a letter, got {prefix!r}")
+    components = spec.get("components") or []
+    names = [component.get("name") or component["type"] for component in components]
+    if len(set(names)) != len(names):
+        raise ValueError("Component names must be unique")
+
+    main_params = [
+        "@description('Azure region for all resources')\nparam location string = resourceGroup().location",
+        f"@description('Prefix for resource names')\n@minLength(3)\n@maxLength({_PREFIX_MAX_LENGTH})\nparam namePrefix string",
+        "@description('Tags applied to all resources')\nparam tags object = {}",
+    ]
+    refs: Set[str] = set()
+    bicepparam = ["using 'main.bicep'", "", f"param namePrefix = {_bicep_value(prefix, refs, '')}"]
+    if spec.get("location"):
+        bicepparam.append(f"param location = {_bicep_value(spec['location'], refs, '')}")
+    modules = []
+    used_files = {}
+    outputs = []
+
+    for component, name in zip(components, names):
+        module = index["modules"].get(component["type"])
+        if module is None:
+            raise ValueError(f"Unknown component type {component['type']}, available: {', '.join(index['modules'])}")
+        if not _IDENTIFIER.match(name):
+            raise ValueError(f"Component name {name} must be a valid identifier")
+        used_files[module["file"]] = module["version"]
+
+        parameters = dict(component.get("parameters") or {})
+        unknown = set(parameters) - set(module["params"])
+        if unknown:
+            raise ValueError(f"Unknown parameters for {component['type']}: {', '.join(sorted(unknown))}")
+
+        values = [f"    name: {_resource_name(component['type'], name)}", "    location: location", "    tags: tags"]
+
+        for param_name, param in module["params"].items():
+            if param_name in ("name", "location", "tags"):
+                continue
+            main_name = name + param_name[0].upper() + param_name[1:]
+            if param["secure"]:
+                env_name = re.sub(r"(?<!^)(?=[A-Z])", "_", main_name).upper()
+                if param_name in parameters:
+                    raise ValueError(
+                        f"{param_name} of {name} is a secure parameter: do not pass its value, it is read from the "
+                        f"environment variable {env_name} at deployment"
+                    )
+                main_params.append(f"@secure()\nparam {main_name} {param['type']}")
+                bicepparam.append(f"param {main_name} = readEnvironmentVariable('{env_name}')")
+                values.append(f"    {param_name}: {main_name}")
+            elif param_name in parameters and _has_ref(parameters[param_name]):
+                values.append(f"    {param_name}: {_bicep_value(parameters[param_name], refs, '    ')}")
+            elif param_name in parameters:
+                main_params.append(f"param {main_name} {param['type']}")
+                bicepparam.append(f"param {main_name} = {_bicep_value(parameters[param_name], refs, '')}")
+                values.append(f"    {param_name}: {main_name}")
+            elif param["required"]:
+                raise ValueError(f"Missing required parameter {param_name} for {component['type']} ({name})")
+
+        modules.append(
+            f"// {module['description']} (library v{module['version']})\n"
+            f"module {name} '{module['file']}' = {{\n"
+            f"  name: '{name}'\n"
+            f"  params: {{\n" + "\n".join(values) + "\n  }\n}"
+        )
+        outputs.extend(
+            f"output {name}{output[0].upper() + output[1:]} {output_type} = {name}.outputs.{output}"
+            for output, output_type in module["outputs"].items()
+            if output_type == "string" and output not in ("principalId",) and not output.lower().endswith("connectionstring")
+        )
+
+    for ref in refs:
+        component, _, output = ref.partition(".")
+        if component not in names:
+            raise ValueError(f"Reference to unknown component: {ref}")
+        component_type = components[names.index(component)]["type"]
+        if output not in index["modules"][component_type]["outputs"]:
+            raise ValueError(f"Unknown output {output} of {component}, available: {', '.join(index['modules'][component_type]['outputs'])}")
+
+    main = (
+        f"// Assembled from the Bicep module library v{index['version']}\n"
+        "targetScope = 'resourceGroup'\n\n"
+        + "\n\n".join(main_params) + "\n\n"
+        + "\n\n".join(modules) + "\n\n"
+        + "\n".join(outputs) + "\n"
+    )
+    result = {
+        "libraryVersion": index["version"],
+        "files": {"main.bicep": main, "main.bicepparam": "\n".join(bicepparam) + "\n"},
+        "modules": [{"path": path, "version": version} for path, version in used_files.items()],
+        "validation": [
+            "az bicep build --file main.bicep",
+            "az deployment group what-if --resource-group <rg> --template-file main.bicep --parameters main.bicepparam",
+        ],
+    }
+
+    if output_dir:
+        for file_name, content in result["files"].items():
+            with open(os.path.join(output_dir, file_name), "w", encoding="utf-8") as f:
+                f.write(content)
+        os.makedirs(os.path.join(output_dir, "modules"), exist_ok=True)
+        for path in used_files:
+            shutil.copy(os.path.join(LIBRARY_DIR, path), os.path.join(output_dir, path))
+    return result
+
+
+def assemble_bicep(components: str) -> str:
+    """
+    Assembles a parameterized main.bicep and main.bicepparam from pre-validated library modules.
+
+    :param components: JSON with "prefix" (3 to 20 lowercase letters, digits and dashes), optional "location" and "components": a list of
+        {"type", "name", "parameters"}; a parameter value "ref:<name>.<output>" wires the output of another component.
+    :type components: str
+
+    :return: JSON with the generated files, the library modules they use and validation commands, or an error to fix.
+    :rtype: str
+    """
+    try:
+        return json.dumps(assemble(json.loads(components)))
+    except (ValueError, KeyError, TypeError) as e:
+        return json.dumps({"error": str(e), "hint": "Call list_bicep_modules to see the component types, parameters and outputs"})
+
+
+# Statically defined Bicep functions for fast reference
+bicep_functions: Set[Callable[..., Any]] = {
+    list_bicep_modules,
+    assemble_bicep,
+}
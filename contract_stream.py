@@ -0,0 +1,212 @@
+import re
+import json
+from typing import Any, List, NamedTuple, Optional
+
+# Titles of the top-level sections of the orchestrator Output Contract (see OrcAgent.py)
+SECTION_TITLES = {
+    "summary": "Summary",
+    "assumptions": "Assumptions",
+    "openQuestions": "Open questions",
+    "architectureReview": "Architecture review",
+    "referenceArchitectures": "Reference architectures",
+    "bicep": "Bicep",
+    "costs": "Costs",
+    "successStories": "Success stories",
+    # Added by the local merger (output_contract.py): outputs left out or fixed
+    "notes": "Notes",
+}
+
+_BULLET = re.compile(r"^(?:[-*•]|\d+[.)])\s+(.*)$")
+
+
+class ContractEvent(NamedTuple):
+    """
+    Piece of an answer that is complete and can be shown:
+        ("bullet", None, text)  a bullet of the Executive Summary
+        ("text", None, text)    any other line of prose
+        ("section", key, value) a top-level member of the JSON object, parsed (the raw text of a member cut off by the end of the answer)
+    """
+
+    kind: str
+    key: Optional[str]
+    value: Any
+
+
+class ContractStreamParser:
+    """
+    Incremental parser of the orchestrator answer: an Executive Summary followed by a JSON object,
+    optionally in a ```json fence.
+
+    Text is fed as it streams in; every character is scanned once, so a whole answer is parsed in
+    linear time whatever the size of the deltas. Prose lines are emitted when their line ends. In a
+    ```json fence, each top-level member of the JSON object is emitted as soon as its value closes;
+    an object outside a fence is only taken for the contract once it closes, since prose lines can
+    start with a brace too. Text that turns out not to be a JSON object is emitted as prose.
+    """
+
+    def __init__(self):
+        self._mode = "prose"  # prose, json (inside the top-level object) or after
+        self._line: List[str] = []
+        self._fence: Optional[str] = None  # info string of the open code fence, e.g. "json"
+        # Text of the object so far, replayed as prose if it is not JSON
+        self._raw: List[str] = []
+        self._replaying = False
+        # Sections of an object outside a fence, emitted once the object closes
+        self._held: Optional[List[ContractEvent]] = None
+        # Scanner state inside the top-level object
+        self._expect = "key"  # key, colon or value
+        self._key: List[str] = []
+        self._current_key: Optional[str] = None
+        self._value: List[str] = []
+        self._nesting = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[ContractEvent]:
+        """Consumes the next chunk of the answer and returns the events it completes."""
+        events: List[ContractEvent] = []
+        for char in text:
+            self._feed_char(char, events)
+        return events
+
+    def close(self) -> List[ContractEvent]:
+        """Flushes the rest of the answer once the stream ends, including a JSON member left open."""
+        events: List[ContractEvent] = []
+        if self._mode == "json":
+            if self._current_key and "".join(self._value).strip():
+                raw = "".join(self._value).strip()
+                try:
+                    value = json.loads(raw)
+                except ValueError:
+                    value = raw
+                self._section(ContractEvent("section", self._current_key, value), events)
+            events.extend(self._held or [])
+        self._flush_line(events)
+        return events
+
+    def _feed_char(self, char: str, events: List[ContractEvent]) -> None:
+        if self._mode == "json":
+            self._raw.append(char)
+            if not self._scan_json(char, events):
+                self._back_to_prose(events)
+        elif char == "{" and self._mode == "prose" and not self._replaying and not "".join(self._line).strip():
+            # A JSON object starts at the beginning of a line
+            self._line = []
+            self._raw = [char]
+            self._mode = "json"
+            self._expect = "key"
+            self._held = None if self._fence == "json" else []
+        elif char == "\n":
+            self._flush_line(events)
+        else:
+            self._line.append(char)
+
+    def _back_to_prose(self, events: List[ContractEvent]) -> None:
+        """The text since the opening brace is not a JSON object: emit it as prose."""
+        raw = "".join(self._raw)
+        self._mode = "prose"
+        self._raw = []
+        self._held = None
+        self._expect = "key"
+        self._key = []
+        self._current_key = None
+        self._value = []
+        self._nesting = 0
+        self._in_string = False
+        self._escape = False
+        self._replaying = True
+        for char in raw:
+            self._feed_char(char, events)
+        self._replaying = False
+
+    def _flush_line(self, events: List[ContractEvent]) -> None:
+        line = "".join(self._line).strip()
+        self._line = []
+        if line.startswith("```"):
+            self._fence = None if self._fence is not None else line[3:].strip().lower()
+            return
+        if not line:
+            return
+        bullet = _BULLET.match(line)
+        if bullet and self._mode == "prose":
+            events.append(ContractEvent("bullet", None, bullet.group(1)))
+        else:
+            events.append(ContractEvent("text", None, line))
+
+    def _section(self, event: ContractEvent, events: List[ContractEvent]) -> None:
+        if self._held is None:
+            events.append(event)
+        else:
+            self._held.append(event)
+
+    def _close_object(self, events: List[ContractEvent]) -> None:
+        self._mode = "after"
+        events.extend(self._held or [])
+        self._held = None
+        self._raw = []
+
+    def _scan_json(self, char: str, events: List[ContractEvent]) -> bool:
+        """Advances the scanner of the top-level object; False if the text is not a JSON object."""
+        if self._expect == "value":
+            return self._scan_value(char, events)
+        if self._in_string:
+            # Inside a top-level key
+            if self._escape:
+                self._escape = False
+                self._key.append(char)
+            elif char == "\\":
+                self._escape = True
+                self._key.append(char)
+            elif char == '"':
+                self._in_string = False
+                try:
+                    self._current_key = json.loads('"' + "".join(self._key) + '"')
+                except ValueError:
+                    return False
+                self._key = []
+                self._expect = "colon"
+            elif char == "\n":
+                return False
+            else:
+                self._key.append(char)
+        elif char.isspace():
+            pass
+        elif char == '"' and self._expect == "key":
+            self._in_string = True
+        elif char == ":" and self._expect == "colon":
+            self._expect = "value"
+        elif char == "}" and self._expect == "key":
+            self._close_object(events)
+        else:
+            return False
+        return True
+
+    def _scan_value(self, char: str, events: List[ContractEvent]) -> bool:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+        elif char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._nesting += 1
+        elif char in "}]" and self._nesting:
+            self._nesting -= 1
+        elif char in ",}" and not self._nesting:
+            # End of the value of a top-level member
+            try:
+                value = json.loads("".join(self._value))
+            except ValueError:
+                return False
+            self._section(ContractEvent("section", self._current_key, value), events)
+            self._value = []
+            self._current_key = None
+            self._expect = "key"
+            if char == "}":
+                self._close_object(events)
+            return True
+        self._value.append(char)
+        return True
@@ -26,22 +26,22 @@ USAGE:
 # Import necessary libraries
 import os
 import jsonref
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
 from azure.ai.agents.models import OpenApiTool, OpenApiAnonymousAuthDetails
 
 from dotenv import load_dotenv
+from azure_clients import get_project_client
+from model_router import router
+from output_contract import response_format
 
 load_dotenv()
 
 endpoint = os.getenv("AZURE_AI_AGENT_ENDPOINT")
-model_deployment_name = os.getenv("AZURE_AI_AGENT_MODEL_DEPLOYMENT_NAME")
+# The orchestrator calls this agent as a connected agent, where its answers cannot be escalated:
+# it is created on the large tier (model_router.py)
+model_deployment_name = router.deployment_for_agent("costs")
 
-# Initialize the project client using the endpoint and default credentials
-with AIProjectClient(
-    endpoint=endpoint,
-    credential=DefaultAzureCredential(exclude_interactive_browser_credential=False),
-) as project_client:
+# Get the shared project client for the endpoint (credential, tokens and connections are reused)
+with get_project_client(endpoint, exclude_interactive_browser_credential=False) as project_client:
     # </initialization>
 
     # <weather_tool_setup>
@@ -100,8 +100,9 @@ with AIProjectClient(
             Outputs must be deterministic and structured for downstream calculation, also provide the queries used to get the data.
             If the call returns >1,000 rows, loop through all pages. If you return a partial result (error/timeouts), say so and include the last successful NextPageLink.
             
-            Always return the API URL (query) used to get data""", # Define agent's role
+            Always return the API URL (query) used to get data: answer with the costs JSON object, one line item per meter with its meterId as sourceId and the query as apiQuery.""", # Define agent's role
         tools=openapi_tool.definitions, # Provide the list of tool definitions
+        response_format=response_format("costs"), # Compact JSON section of the Output Contract
     )
     print(f"Created agent, ID: {agent.id}")
     # </agent_creation>
@@ -0,0 +1,558 @@
+"""
+DESCRIPTION:
+    Local hybrid index (BM25 + embeddings) over the Azure Well-Architected Framework for AI and
+    the AI reference architecture pages, used instead of live Bing searches to ground the WAF and
+    reference architecture agents. Every chunk keeps the page URL and section anchor so answers
+    can cite it. The agents call search_architecture_docs as an Azure Function tool
+    (docs_search_tool), answered by the Function in pg_azurefunction, which refreshes its own
+    snapshot with a timer trigger.
+
+USAGE:
+    python docs_index.py refresh                # snapshot the pages and rebuild the index
+    python docs_index.py refresh --max-age 168  # only if the snapshot is older than a week (for a scheduled job)
+    python docs_index.py search "private networking for Azure OpenAI"
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import hashlib
+import argparse
+import threading
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urldefrag
+
+import numpy as np
+import requests
+
+from tool_telemetry import traced_tool, record_payload
+from prefetch import prefetcher, same_query, topic_key
+
+# Snapshot location; the refresh job rewrites it atomically
+DOCS_INDEX_DIR = os.getenv("DOCS_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "docs_index_data"))
+
+# Queues of the search_architecture_docs tool served by the Function (pg_azurefunction/worker_tools.py)
+DOCS_SEARCH_QUEUE_ENDPOINT = os.getenv("AZURE_STORAGE_QUEUE_ENDPOINT", "")
+DOCS_SEARCH_INPUT_QUEUE = "search-architecture-docs-input"
+
+# Collections ingested: seed pages and the URL prefix that links are followed within
+SOURCES: Dict[str, Dict[str, Any]] = {
+    "waf": {
+        "prefix": "https://learn.microsoft.com/en-us/azure/well-architected/ai/",
+        "seeds": [
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/get-started",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/design-principles",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/design-areas",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/application-design",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/application-platform",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/grounding-data-design",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/training-data-design",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/data-platform",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/mlops-genaiops",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/operations",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/test",
+            "https://learn.microsoft.com/en-us/azure/well-architected/ai/responsible-ai",
+        ],
+    },
+    "reference": {
+        "prefix": "https://learn.microsoft.com/en-us/azure/architecture/ai-ml/",
+        "seeds": [
+            "https://learn.microsoft.com/en-us/azure/architecture/ai-ml/",
+            "https://learn.microsoft.com/en-us/azure/architecture/ai-ml/architecture/baseline-azure-ai-foundry-chat",
+            "https://learn.microsoft.com/en-us/azure/architecture/ai-ml/architecture/basic-azure-ai-foundry-chat",
+            "https://learn.microsoft.com/en-us/azure/architecture/ai-ml/architecture/baseline-openai-e2e-chat",
+            "https://learn.microsoft.com/en-us/azure/architecture/ai-ml/guide/rag/rag-solution-design-and-evaluation-guide",
+            "https://learn.microsoft.com/en-us/azure/architecture/ai-ml/architecture/search-blob-metadata",
+            "https://learn.microsoft.com/en-us/azure/architecture/ai-ml/architecture/automate-document-classification-durable-functions",
+            "https://learn.microsoft.com/en-us/azure/architecture/ai-ml/openai/architecture/call-center-openai-analytics",
+        ],
+    },
+}
+
+MAX_PAGES_PER_COLLECTION = int(os.getenv("DOCS_INDEX_MAX_PAGES", "80"))
+CHUNK_WORDS = 300
+CHUNK_OVERLAP = 40
+EMBEDDING_DIM = 768
+# Candidates taken from each retriever before reciprocal rank fusion
+CANDIDATES = 50
+RRF_K = 60
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from has have how i if in into is it its may more of on or "
+    "our should so such than that the their them then there these this to use used using was we what "
+    "when where which while will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms without stopwords; dotted and dashed names such as gpt-4o stay one term."""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class _PageExtractor(HTMLParser):
+    """Collects the title, the sections (heading, anchor, text) and the links of the <main> element of a Learn page."""
+
+    _SKIP = {"script", "style", "nav", "header", "footer", "aside", "button", "form", "svg"}
+    _BLOCKS = {"p", "li", "div", "tr", "pre", "br", "td", "h4", "h5", "dd", "dt"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.sections: List[Dict[str, Any]] = [{"heading": "", "anchor": "", "text": []}]
+        self.links: List[str] = []
+        self._main_depth = 0
+        self._skip_depth = 0
+        self._heading: Optional[List[str]] = None
+        self._heading_tag = ""
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        if tag == "a" and attributes.get("href"):
+            self.links.append(attributes["href"])
+        if tag == "main":
+            self._main_depth += 1
+        if not self._main_depth:
+            return
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in ("h1", "h2", "h3") and not self._skip_depth:
+            self._heading, self._heading_tag = [], tag
+            if tag != "h1":
+                self.sections.append({"heading": "", "anchor": attributes.get("id") or "", "text": []})
+        elif tag in self._BLOCKS:
+            self.sections[-1]["text"].append("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "main" and self._main_depth:
+            self._main_depth -= 1
+        elif tag in self._SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == self._heading_tag and self._heading is not None:
+            heading = " ".join("".join(self._heading).split())
+            if tag == "h1":
+                self.title = self.title or heading
+            else:
+                self.sections[-1]["heading"] = heading
+            self._heading = None
+        elif tag in self._BLOCKS and self._main_depth:
+            self.sections[-1]["text"].append("\n")
+
+    def handle_data(self, data):
+        if not self._main_depth or self._skip_depth:
+            return
+        if self._heading is not None:
+            self._heading.append(data)
+        else:
+            self.sections[-1]["text"].append(data)
+
+
+def extract_page(html: str) -> Tuple[str, List[Dict[str, str]], List[str]]:
+    """
+    Extracts the main content of a Learn page.
+
+    :return: The page title, its sections as {"heading", "anchor", "text"} and the links it contains.
+    """
+    parser = _PageExtractor()
+    parser.feed(html)
+    parser.close()
+    sections = []
+    for section in parser.sections:
+        lines = (" ".join(line.split()) for line in "".join(section["text"]).splitlines())
+        text = "\n".join(line for line in lines if line)
+        if text:
+            sections.append({"heading": section["heading"], "anchor": section["anchor"], "text": text})
+    return parser.title, sections, parser.links
+
+
+def chunk_page(url: str, title: str, sections: List[Dict[str, str]], collection: str) -> List[Dict[str, Any]]:
+    """Splits every section in chunks of at most CHUNK_WORDS words, overlapping by CHUNK_OVERLAP words."""
+    chunks = []
+    for section in sections:
+        words = section["text"].split()
+        step = CHUNK_WORDS - CHUNK_OVERLAP
+        for start in range(0, max(len(words) - CHUNK_OVERLAP, 1), step):
+            chunks.append({
+                "collection": collection,
+                "url": url,
+                "title": title,
+                "heading": section["heading"],
+                "citation": f"{url}#{section['anchor']}" if section["anchor"] else url,
+                "text": " ".join(words[start:start + CHUNK_WORDS]),
+            })
+    return chunks
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embeddings: word unigrams, word bigrams and character trigrams are hashed
+    into a fixed number of dimensions (with a sign hash to reduce collisions) and L2-normalized.
+    Needs no model or network, so indexing and queries run offline in milliseconds, and trigrams
+    let related word forms (encrypt / encryption) match where BM25 does not.
+
+    Any object with a `name` and an `embed(texts) -> np.ndarray` method can replace it.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+        self._word_features: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _hash(self, features: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Dimension and sign of every feature."""
+        digests = np.array([zlib.crc32(feature.encode("utf-8")) for feature in features], dtype=np.uint32)
+        return (digests % self.dim).astype(np.intp), np.where(digests & 0x80000000, 1.0, -1.0).astype(np.float32)
+
+    def _word(self, word: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Hashed unigram and character trigrams of a word, cached since the vocabulary is small."""
+        cached = self._word_features.get(word)
+        if cached is None:
+            padded = f"#{word}#"
+            cached = self._hash([word] + [padded[i:i + 3] for i in range(len(padded) - 2)])
+            self._word_features[word] = cached
+        return cached
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            if not words:
+                continue
+            parts = [self._word(word) for word in words]
+            parts.append(self._hash([f"{first} {second}" for first, second in zip(words, words[1:])]))
+            np.add.at(vectors[row], np.concatenate([part[0] for part in parts]), np.concatenate([part[1] for part in parts]))
+        # Sublinear term frequency, then unit length so the dot product is the cosine similarity
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class BM25:
+    """Okapi BM25 over an inverted index; scoring touches only the postings of the query terms."""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.size = len(documents)
+        self.lengths = np.array([len(document) for document in documents], dtype=np.float32)
+        average = float(self.lengths.mean()) if self.size else 0.0
+        self._norm = k1 * (1 - b + b * self.lengths / (average or 1.0))
+
+        postings: Dict[str, Dict[int, int]] = {}
+        for doc_id, document in enumerate(documents):
+            for term in document:
+                counts = postings.setdefault(term, {})
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, counts in postings.items():
+            doc_ids = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+            frequencies = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            idf = float(np.log(1 + (self.size - len(counts) + 0.5) / (len(counts) + 0.5)))
+            self.postings[term] = (doc_ids, frequencies, idf)
+
+    def scores(self, query: List[str]) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(query):
+            if term in self.postings:
+                doc_ids, frequencies, idf = self.postings[term]
+                scores[doc_ids] += idf * frequencies * (self.k1 + 1) / (frequencies + self._norm[doc_ids])
+        return scores
+
+
+def _top(scores: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> List[int]:
+    """Indexes of the k highest positive scores, best first."""
+    if mask is not None:
+        scores = np.where(mask, scores, 0)
+    k = min(k, int(np.count_nonzero(scores > 0)))
+    if k == 0:
+        return []
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")].tolist()
+
+
+class DocsIndex:
+    """Chunks of the snapshot with their BM25 index and embedding matrix."""
+
+    def __init__(self, pages: Dict[str, Dict[str, Any]], chunks: List[Dict[str, Any]],
+                 vectors: Optional[np.ndarray] = None, embedder: Optional[HashingEmbedder] = None,
+                 created_at: Optional[float] = None):
+        self.pages = pages
+        self.chunks = chunks
+        self.embedder = embedder or HashingEmbedder()
+        self.created_at = created_at or time.time()
+        self.bm25 = BM25([tokenize(f"{chunk['title']} {chunk['heading']} {chunk['text']}") for chunk in chunks])
+        if vectors is None or vectors.shape != (len(chunks), self.embedder.dim):
+            vectors = self.embedder.embed([f"{chunk['heading']} {chunk['text']}" for chunk in chunks])
+        self.vectors = vectors
+        self._collections = np.array([chunk["collection"] for chunk in chunks]) if chunks else np.array([], dtype=str)
+
+    def search(self, query: str, top: int = 5, collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Hybrid retrieval: the BM25 and the vector rankings are merged with reciprocal rank fusion.
+
+        :param collection: Restrict the results to one collection ("waf" or "reference").
+        """
+        if not self.chunks:
+            return []
+        mask = self._collections == collection if collection else None
+        lexical = _top(self.bm25.scores(tokenize(query)), CANDIDATES, mask)
+        semantic = _top(self.vectors @ self.embedder.embed([query])[0], CANDIDATES, mask)
+
+        fused: Dict[int, float] = {}
+        for ranking in (lexical, semantic):
+            for rank, chunk_id in enumerate(ranking):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        best = sorted(fused, key=lambda chunk_id: (-fused[chunk_id], chunk_id))[:top]
+        return [dict(self.chunks[chunk_id], score=round(fused[chunk_id], 5)) for chunk_id in best]
+
+    def save(self, directory: str = DOCS_INDEX_DIR) -> None:
+        """Writes the snapshot to a temporary directory first so readers never see a partial index."""
+        staging = directory.rstrip("/\\") + ".tmp"
+        os.makedirs(staging, exist_ok=True)
+        with open(os.path.join(staging, "snapshot.json"), "w", encoding="utf-8") as f:
+            json.dump({"created_at": self.created_at, "embedder": self.embedder.name, "pages": self.pages, "chunks": self.chunks}, f)
+        np.save(os.path.join(staging, "vectors.npy"), self.vectors)
+        if os.path.isdir(directory):
+            previous = directory.rstrip("/\\") + ".old"
+            os.replace(directory, previous)
+            os.replace(staging, directory)
+            for name in os.listdir(previous):
+                os.remove(os.path.join(previous, name))
+            os.rmdir(previous)
+        else:
+            os.replace(staging, directory)
+
+    @classmethod
+    def load(cls, directory: str = DOCS_INDEX_DIR, embedder: Optional[HashingEmbedder] = None) -> "DocsIndex":
+        """
+        :raises FileNotFoundError: If there is no snapshot yet.
+        """
+        with open(os.path.join(directory, "snapshot.json"), "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        embedder = embedder or HashingEmbedder()
+        vectors = np.load(os.path.join(directory, "vectors.npy")) if snapshot["embedder"] == embedder.name else None
+        return cls(snapshot["pages"], snapshot["chunks"], vectors, embedder, snapshot["created_at"])
+
+
+def _fetch(session: requests.Session, url: str, etag: Optional[str]) -> Optional[requests.Response]:
+    """GET with If-None-Match; returns None when the page did not change."""
+    headers = {"If-None-Match": etag} if etag else {}
+    response = session.get(url, headers=headers, timeout=30)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    return response
+
+
+def ingest(previous: Optional[DocsIndex] = None, max_pages: int = MAX_PAGES_PER_COLLECTION) -> DocsIndex:
+    """
+    Crawls every collection from its seed pages, following links within its URL prefix, and
+    builds a new index. Pages that did not change since the previous snapshot (same ETag or same
+    content hash) reuse their chunks and vectors instead of being re-chunked and re-embedded.
+    """
+    session = requests.Session()
+    session.headers["User-Agent"] = "azureaiarchitectagent-docs-index"
+    old_pages = previous.pages if previous else {}
+    old_chunks: Dict[str, List[int]] = {}
+    for chunk_id, chunk in enumerate(previous.chunks if previous else []):
+        old_chunks.setdefault(chunk["url"], []).append(chunk_id)
+
+    pages: Dict[str, Dict[str, Any]] = {}
+    chunks: List[Dict[str, Any]] = []
+    reused_vectors: Dict[int, np.ndarray] = {}
+
+    for collection, source in SOURCES.items():
+        queue = list(source["seeds"])
+        seen = set(queue)
+        fetched = 0
+        while queue and fetched < max_pages:
+            url = queue.pop(0)
+            old = old_pages.get(url)
+            try:
+                response = _fetch(session, url, old.get("etag") if old else None)
+            except requests.RequestException as e:
+                print(f"Skipping {url}: {e}")
+                if not old:
+                    continue
+                response = None
+            fetched += 1
+
+            if response is not None:
+                content_hash = hashlib.sha256(response.content).hexdigest()
+                title, sections, links = extract_page(response.text)
+                links = sorted({urldefrag(urljoin(url, link))[0].split("?")[0] for link in links})
+                links = [link for link in links if link.startswith(source["prefix"]) and link != url]
+                for link in links:
+                    if link not in seen:
+                        seen.add(link)
+                        queue.append(link)
+                if not old or old["hash"] != content_hash:
+                    pages[url] = {"collection": collection, "title": title, "etag": response.headers.get("ETag"), "hash": content_hash,
+                                  "links": links, "fetched_at": time.time()}
+                    chunks.extend(chunk_page(url, title, sections, collection))
+                    continue
+            else:
+                # Unchanged (or unreachable) page: follow the links recorded in the previous snapshot
+                for link in old.get("links", []):
+                    if link not in seen:
+                        seen.add(link)
+                        queue.append(link)
+
+            pages[url] = old
+            for chunk_id in old_chunks.get(url, []):
+                reused_vectors[len(chunks)] = previous.vectors[chunk_id]
+                chunks.append(previous.chunks[chunk_id])
+
+    embedder = previous.embedder if previous else HashingEmbedder()
+    vectors = np.zeros((len(chunks), embedder.dim), dtype=np.float32)
+    new_ids = [chunk_id for chunk_id in range(len(chunks)) if chunk_id not in reused_vectors]
+    if new_ids:
+        vectors[new_ids] = embedder.embed([f"{chunks[i]['heading']} {chunks[i]['text']}" for i in new_ids])
+    for chunk_id, vector in reused_vectors.items():
+        vectors[chunk_id] = vector
+    print(f"Indexed {len(pages)} pages, {len(chunks)} chunks ({len(new_ids)} new or changed)")
+    return DocsIndex(pages, chunks, vectors, embedder)
+
+
+def refresh_index(directory: str = DOCS_INDEX_DIR, max_age_hours: Optional[float] = None) -> bool:
+    """
+    Re-snapshots the documentation incrementally and replaces the saved index.
+
+    :param max_age_hours: Skip the refresh if the saved snapshot is more recent than this.
+    :return: True if the index was rebuilt.
+    """
+    try:
+        previous = DocsIndex.load(directory)
+    except FileNotFoundError:
+        previous = None
+    if previous and max_age_hours is not None and time.time() - previous.created_at < max_age_hours * 3600:
+        print(f"Snapshot is {(time.time() - previous.created_at) / 3600:.1f} hours old, nothing to do")
+        return False
+    index = ingest(previous)
+    if not index.chunks:
+        print("No page could be indexed, keeping the current snapshot")
+        return False
+    index.save(directory)
+    return True
+
+
+# Snapshot loaded by this process and the version of its file
+_loaded: Dict[str, Any] = {"version": None, "index": None}
+_loaded_lock = threading.Lock()
+
+
+def get_docs_index() -> DocsIndex:
+    """
+    Saved snapshot, reloaded when its file changes: a refresh by this or another process (the
+    Function timer, a scheduled job) replaces the snapshot with new files.
+
+    :raises FileNotFoundError: If there is no snapshot yet.
+    """
+    directory = DOCS_INDEX_DIR
+    with _loaded_lock:
+        try:
+            stat = os.stat(os.path.join(directory, "snapshot.json"))
+            version = (directory, stat.st_ino, stat.st_mtime_ns)
+            if _loaded["version"] != version:
+                _loaded["index"] = DocsIndex.load(directory)
+                _loaded["version"] = version
+        except FileNotFoundError:
+            # A refresh is swapping the snapshot directories: keep serving the loaded one
+            if _loaded["index"] is None or _loaded["version"][0] != directory:
+                raise
+        return _loaded["index"]
+
+
+@prefetcher.tool(
+    key=lambda call: (topic_key(call["query"]), call["collection"], call["top"]) if topic_key(call["query"]) else None,
+    plan=lambda text: [{"query": text, "collection": collection, "top": 5} for collection in ("waf", "reference")],
+    match=same_query("query"),
+)
+@traced_tool
+def search_architecture_docs(query: str, collection: str = "all", top: int = 5) -> str:
+    """
+    Searches the local snapshot of the Azure Well-Architected Framework for AI and the Azure AI
+    reference architectures.
+
+    :param query: What to look for, e.g. "network isolation for Azure OpenAI in the baseline chat architecture".
+    :type query: str
+    :param collection: "waf" for Well-Architected guidance, "reference" for reference architectures, or "all", defaults to all
+    :type collection: str, optional
+    :param top: Number of passages to return, defaults to 5
+    :type top: int, optional
+
+    :return: JSON list of passages with their citation URL, page title, section heading and text.
+    :rtype: str
+    """
+    record_payload("requested_query", query)
+    try:
+        index = get_docs_index()
+    except FileNotFoundError:
+        return json.dumps({"error": "The documentation index has not been built, run: python docs_index.py refresh"})
+    results = index.search(query, top=max(1, min(int(top), 20)), collection=None if collection == "all" else collection)
+    passages = json.dumps([
+        {"citation": result["citation"], "title": result["title"], "heading": result["heading"], "text": result["text"]}
+        for result in results
+    ])
+    record_payload("passages", passages)
+    return passages
+
+
+def docs_search_tool(storage_service_endpoint: str = DOCS_SEARCH_QUEUE_ENDPOINT) -> Any:
+    """
+    AzureFunctionTool that calls search_architecture_docs through the queue workers of the
+    Function (pg_azurefunction/worker_tools.py), so agents called as connected agents of the
+    orchestrator can search the documentation: local plugins only run in the script that created them.
+
+    :param storage_service_endpoint: Queue endpoint of the Storage account of the Function, e.g. "https://<account>.queue.core.windows.net".
+    :raises ValueError: If no endpoint is given or configured in AZURE_STORAGE_QUEUE_ENDPOINT.
+    """
+    from azure.ai.agents.models import AzureFunctionStorageQueue, AzureFunctionTool
+
+    if not storage_service_endpoint:
+        raise ValueError("AZURE_STORAGE_QUEUE_ENDPOINT is not set: the documentation search runs in the Function tool workers")
+    return AzureFunctionTool(
+        name="search_architecture_docs",
+        description="Searches the local snapshot of the Azure Well-Architected Framework for AI and the Azure AI reference architectures.",
+        parameters={
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": 'What to look for, e.g. "network isolation for Azure OpenAI in the baseline chat architecture".'},
+                "collection": {"type": "string", "description": '"waf" for Well-Architected guidance, "reference" for reference architectures, or "all", defaults to all'},
+                "top": {"type": "integer", "description": "Number of passages to return, defaults to 5"},
+            },
+            "required": ["query"],
+        },
+        input_queue=AzureFunctionStorageQueue(queue_name=DOCS_SEARCH_INPUT_QUEUE, storage_service_endpoint=storage_service_endpoint),
+        output_queue=AzureFunctionStorageQueue(queue_name="output", storage_service_endpoint=storage_service_endpoint),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local index of Azure architecture documentation")
+    commands = parser.add_subparsers(dest="command", required=True)
+    refresh = commands.add_parser("refresh", help="Snapshot the documentation and rebuild the index")
+    refresh.add_argument("--max-age", type=float, default=None, help="Only refresh if the snapshot is older than this many hours")
+    search = commands.add_parser("search", help="Query the index")
+    search.add_argument("query")
+    search.add_argument("--collection", default="all", choices=["all", *SOURCES])
+    search.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        refresh_index(max_age_hours=args.max_age)
+    else:
+        start = time.perf_counter()
+        results = json.loads(search_architecture_docs(args.query, args.collection, args.top))
+        elapsed = (time.perf_counter() - start) * 1000
+        if isinstance(results, dict):
+            sys.exit(results["error"])
+        for result in results:
+            print(f"{result['citation']}\n  {result['title']} > {result['heading']}\n  {result['text'][:200]}...\n")
+        print(f"{len(results)} results in {elapsed:.1f} ms (including loading the index)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import re
+import json
+import zlib
+import base64
+import html
+from urllib.parse import unquote
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional
+
+from azure_services import find_service_types, match_service_type
+
+# File extensions of the diagrams users can upload
+DIAGRAM_EXTENSIONS = (".drawio", ".dio", ".xml", ".vdx")
+
+# SKU / tier names that commonly appear in diagram labels, e.g. "AI Search (S1)", "App Service P1v3"
+SKU_PATTERN = re.compile(
+    r"\b(Standard[ _][A-Za-z0-9_]+|Premium(?:[ _]v\d)?|Basic|Free|Consumption|Serverless|GP_[A-Za-z0-9_]+|"
+    r"[SPB]\d+(?:v\d)?|S0|F0|Hot|Cool|Archive|LRS|ZRS|GRS|RAGRS|GZRS)\b"
+)
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+_BREAK_PATTERN = re.compile(r"<br\s*/?>|<div>|</div>", re.IGNORECASE)
+
+
+def _local(tag: str) -> str:
+    """Tag name without its XML namespace."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def clean_label(value: Optional[str]) -> str:
+    """Plain text of a Draw.io label, which may contain HTML."""
+    if not value:
+        return ""
+    text = _TAG_PATTERN.sub("", _BREAK_PATTERN.sub(" ", value))
+    return " ".join(html.unescape(text).split())
+
+
+def extract_sku(text: str) -> Optional[str]:
+    """Returns the SKU or tier mentioned in a label, if any."""
+    match = SKU_PATTERN.search(text)
+    return match.group(1) if match else None
+
+
+def _decode_diagram(diagram: ET.Element) -> Optional[ET.Element]:
+    """
+    Returns the mxGraphModel of a <diagram>, decompressing it if needed.
+
+    :raises ValueError: If a compressed page is corrupt (bad base64, deflate data or XML).
+    """
+    model = diagram.find("mxGraphModel")
+    if model is not None:
+        return model
+    text = (diagram.text or "").strip()
+    if not text:
+        return None
+    try:
+        xml = unquote(zlib.decompress(base64.b64decode(text), -15).decode("utf-8"))
+        return ET.fromstring(xml)
+    except (ValueError, zlib.error, ET.ParseError) as e:
+        # binascii.Error and UnicodeDecodeError are ValueErrors; zlib and XML errors are not
+        raise ValueError(f"Invalid compressed diagram page {diagram.get('name') or ''!r}: {e}") from e
+
+
+def _parse_mxgraph(model: ET.Element, prefix: str, graph: Dict[str, List[Dict[str, Any]]]) -> None:
+    """
+    Adds the services, groups and edges of one mxGraphModel to graph. Every cell is visited a
+    constant number of times, so parsing is linear in the size of the diagram.
+    """
+    root = model.find("root")
+    if root is None:
+        return
+
+    cells: Dict[str, Dict[str, Any]] = {}
+    for element in root:
+        tag = _local(element.tag)
+        if tag == "mxCell":
+            cell, attributes = element, {}
+        elif tag in ("object", "UserObject"):
+            cell = element.find("mxCell")
+            if cell is None:
+                continue
+            attributes = dict(element.attrib)
+        else:
+            continue
+        cell_id = element.get("id") or cell.get("id")
+        cells[cell_id] = {
+            "id": cell_id,
+            "parent": cell.get("parent"),
+            "value": attributes.get("label", cell.get("value")),
+            "style": cell.get("style") or "",
+            "vertex": cell.get("vertex") == "1",
+            "edge": cell.get("edge") == "1",
+            "source": cell.get("source"),
+            "target": cell.get("target"),
+            "sku": attributes.get("sku") or attributes.get("tier"),
+        }
+
+    # Vertices that contain other vertices are groups; labels attached to edges are edge labels
+    containers = set()
+    edge_labels: Dict[str, str] = {}
+    for cell in cells.values():
+        parent = cells.get(cell["parent"])
+        if not parent:
+            continue
+        if parent["edge"]:
+            edge_labels[parent["id"]] = clean_label(cell["value"])
+        elif cell["vertex"] and parent["vertex"]:
+            containers.add(parent["id"])
+
+    def group_of(cell):
+        parent = cells.get(cell["parent"])
+        return prefix + parent["id"] if parent and parent["id"] in containers else None
+
+    services = set()
+    for cell in cells.values():
+        if not cell["vertex"] or cells.get(cell["parent"], {}).get("edge"):
+            continue
+        label = clean_label(cell["value"])
+        style = cell["style"]
+        if cell["id"] in containers or "swimlane" in style or "container=1" in style or style.startswith("group"):
+            graph["groups"].append({"id": prefix + cell["id"], "label": label, "parent": group_of(cell)})
+            containers.add(cell["id"])
+            continue
+        service_type = match_service_type(f"{style} {label}")
+        if not service_type and not label:
+            continue
+        services.add(cell["id"])
+        graph["services"].append({
+            "id": prefix + cell["id"],
+            "type": service_type,
+            "label": label,
+            "sku": cell["sku"] or extract_sku(label),
+            "group": group_of(cell),
+        })
+
+    for cell in cells.values():
+        if cell["edge"] and cell["source"] in services and cell["target"] in services:
+            graph["edges"].append({
+                "from": prefix + cell["source"],
+                "to": prefix + cell["target"],
+                "label": clean_label(cell["value"]) or edge_labels.get(cell["id"], ""),
+            })
+
+
+def _parse_visio(root: ET.Element, graph: Dict[str, List[Dict[str, Any]]]) -> None:
+    """
+    Adds the shapes and connections of a Visio XML drawing (.vdx, or the page XML of a .vsdx)
+    to graph. Connectors are resolved through the Connects section.
+    """
+    pages = [element for element in root.iter() if _local(element.tag) in ("Page", "PageContents")] or [root]
+    for page_index, page in enumerate(pages):
+        prefix = f"p{page_index}:" if len(pages) > 1 else ""
+        shapes: Dict[str, Dict[str, Any]] = {}
+
+        def visit(shape: ET.Element, group: Optional[str]) -> None:
+            shape_id = shape.get("ID")
+            text = " ".join("".join(child.itertext()) for child in shape if _local(child.tag) == "Text")
+            name = shape.get("NameU") or shape.get("Name") or ""
+            children = [child for sub in shape if _local(sub.tag) == "Shapes" for child in sub if _local(child.tag) == "Shape"]
+            shapes[shape_id] = {"name": name, "text": clean_label(text), "group": group, "is_group": bool(children)}
+            for child in children:
+                visit(child, shape_id)
+
+        for container in page:
+            if _local(container.tag) == "Shapes":
+                for shape in container:
+                    if _local(shape.tag) == "Shape":
+                        visit(shape, None)
+
+        # Each connector shape is glued to a shape with its begin point and to another with its end point
+        ends: Dict[str, Dict[str, str]] = {}
+        for connects in page:
+            if _local(connects.tag) != "Connects":
+                continue
+            for connect in connects:
+                end = "from" if connect.get("FromCell", "").startswith("Begin") else "to"
+                ends.setdefault(connect.get("FromSheet"), {})[end] = connect.get("ToSheet")
+
+        page_services = set()
+        for shape_id, shape in shapes.items():
+            group = prefix + shape["group"] if shape["group"] else None
+            if shape["is_group"]:
+                graph["groups"].append({"id": prefix + shape_id, "label": shape["text"], "parent": group})
+            elif shape_id not in ends and (shape["text"] or match_service_type(shape["name"])):
+                label = shape["text"] or shape["name"]
+                page_services.add(shape_id)
+                graph["services"].append({
+                    "id": prefix + shape_id,
+                    "type": match_service_type(f"{shape['name']} {label}"),
+                    "label": label,
+                    "sku": extract_sku(label),
+                    "group": group,
+                })
+
+        for connector_id, end in ends.items():
+            if end.get("from") in page_services and end.get("to") in page_services:
+                graph["edges"].append({
+                    "from": prefix + end["from"],
+                    "to": prefix + end["to"],
+                    "label": shapes.get(connector_id, {}).get("text", ""),
+                })
+
+
+def parse_diagram(xml: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Parses a Draw.io file (plain or compressed, one or more pages), a bare mxGraphModel or a
+    Visio XML drawing into a normalized component graph:
+        {"services": [{"id", "type", "label", "sku", "group"}],
+         "groups": [{"id", "label", "parent"}],
+         "edges": [{"from", "to", "label"}]}
+
+    Service types come from azure_services and are None for shapes that are not recognized.
+
+    :raises ValueError: If the document is not a supported diagram format.
+    """
+    try:
+        root = ET.fromstring(xml)
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid diagram XML: {e}") from e
+
+    graph: Dict[str, List[Dict[str, Any]]] = {"services": [], "groups": [], "edges": []}
+    tag = _local(root.tag)
+    if tag == "mxfile":
+        diagrams = root.findall("diagram")
+        for index, diagram in enumerate(diagrams):
+            model = _decode_diagram(diagram)
+            if model is not None:
+                _parse_mxgraph(model, f"p{index}:" if len(diagrams) > 1 else "", graph)
+    elif tag == "mxGraphModel":
+        _parse_mxgraph(root, "", graph)
+    elif tag in ("VisioDocument", "PageContents"):
+        _parse_visio(root, graph)
+    else:
+        raise ValueError(f"Unsupported diagram format: <{tag}>")
+    return graph
+
+
+def parse_description(text: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Builds a component graph from a free-form architecture description: every Azure service
+    mentioned becomes a service, and lines like "App Service -> Azure OpenAI" become edges.
+    """
+    graph: Dict[str, List[Dict[str, Any]]] = {"services": [], "groups": [], "edges": []}
+    for service_type in find_service_types(text):
+        graph["services"].append({"id": service_type, "type": service_type, "label": service_type, "sku": None, "group": None})
+
+    for line in text.splitlines():
+        parts = [part for part in re.split(r"\s*(?:->|→|=>)\s*", line) if part.strip()]
+        for source_text, target_text in zip(parts, parts[1:]):
+            source, target = match_service_type(source_text), match_service_type(target_text)
+            if source and target and source != target:
+                graph["edges"].append({"from": source, "to": target, "label": ""})
+                # Ends named like shape labels ("Browser -> App Service") are services too
+                for service_type in (source, target):
+                    if all(service["id"] != service_type for service in graph["services"]):
+                        graph["services"].append({"id": service_type, "type": service_type, "label": service_type, "sku": None, "group": None})
+    return graph
+
+
+def summarize_graph(graph: Dict[str, List[Dict[str, Any]]]) -> str:
+    """
+    Compact JSON of a component graph to pass to the review, Bicep and cost agents
+    (empty fields are dropped to save tokens).
+    """
+    compact = {
+        key: [{field: value for field, value in item.items() if value} for item in items]
+        for key, items in graph.items()
+        if items
+    }
+    return json.dumps(compact, separators=(",", ":"))
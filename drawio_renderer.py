@@ -0,0 +1,285 @@
+import os
+import json
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from azure_services import SERVICES_BY_TYPE, match_service_type
+
+# Layout constants (pixels): services flow left to right in layers
+ICON_SIZE = 64
+LAYER_SPACING = 220
+ROW_SPACING = 140
+GROUP_PADDING = 40
+MARGIN = 80
+
+ICON_STYLE = "image;aspect=fixed;html=1;points=[];align=center;fontSize=12;verticalLabelPosition=bottom;verticalAlign=top;image={image};"
+GENERIC_STYLE = "rounded=1;whiteSpace=wrap;html=1;fillColor=#dae8fc;strokeColor=#6c8ebf;"
+GROUP_STYLE = "container=1;collapsible=0;rounded=0;whiteSpace=wrap;html=1;dashed=1;fillColor=none;strokeColor=#0078D4;verticalAlign=top;align=left;spacingLeft=8;fontStyle=1;"
+EDGE_STYLE = "edgeStyle=orthogonalEdgeStyle;rounded=1;orthogonalLoop=1;html=1;endArrow=block;endFill=1;"
+
+
+def validate_graph(graph: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Checks a component graph and fills in defaults.
+
+    The graph has the form:
+        {"groups": [{"id": "vnet", "label": "Virtual Network", "parent": null}],
+         "services": [{"id": "aoai", "type": "azure_openai", "label": "Azure OpenAI", "group": "vnet"}],
+         "edges": [{"from": "app", "to": "aoai", "label": "prompts"}]}
+
+    Service types come from azure_services; unknown types are matched by keyword, and
+    services that still do not match are drawn as generic boxes.
+
+    :raises ValueError: If the graph is not an object of lists of objects, ids are duplicated or an edge or group reference is unknown.
+    """
+    if not isinstance(graph, dict):
+        raise ValueError(f"The component graph must be a JSON object, got {type(graph).__name__}")
+    for field in ("groups", "services", "edges"):
+        items = graph.get(field) or []
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValueError(f"{field} must be a list of objects")
+    groups = graph.get("groups") or []
+    services = graph.get("services") or []
+    edges = graph.get("edges") or []
+
+    group_ids = set()
+    for group in groups:
+        if group["id"] in group_ids:
+            raise ValueError(f"Duplicated group id: {group['id']}")
+        group_ids.add(group["id"])
+    for group in groups:
+        if group.get("parent") and group["parent"] not in group_ids:
+            raise ValueError(f"Unknown parent group {group['parent']} for group {group['id']}")
+
+    service_ids = set()
+    for service in services:
+        if service["id"] in service_ids or service["id"] in group_ids:
+            raise ValueError(f"Duplicated id: {service['id']}")
+        service_ids.add(service["id"])
+        if service.get("group") and service["group"] not in group_ids:
+            raise ValueError(f"Unknown group {service['group']} for service {service['id']}")
+        if service.get("type") not in SERVICES_BY_TYPE:
+            service["type"] = match_service_type(f"{service.get('type', '')} {service.get('label', '')}")
+        if not service.get("label"):
+            service["label"] = SERVICES_BY_TYPE[service["type"]].name if service["type"] else service["id"]
+
+    for edge in edges:
+        for end in ("from", "to"):
+            if edge.get(end) not in service_ids:
+                raise ValueError(f"Unknown service {edge.get(end)} in edge {edge}")
+
+    return {"groups": groups, "services": services, "edges": edges}
+
+
+def layout(graph: Dict[str, Any]) -> Dict[str, Tuple[int, int]]:
+    """
+    Deterministic layered layout: services are assigned to layers by longest path from the
+    sources (cycles are broken by input order), then ordered within each layer by group and
+    by the barycenter of their neighbours to reduce edge crossings.
+
+    :return: Top-left position of every service icon.
+    """
+    ids = [service["id"] for service in graph["services"]]
+    index = {service_id: i for i, service_id in enumerate(ids)}
+    group_of = {service["id"]: service.get("group") or "" for service in graph["services"]}
+
+    successors: Dict[str, List[str]] = {service_id: [] for service_id in ids}
+    predecessors: Dict[str, List[str]] = {service_id: [] for service_id in ids}
+    for edge in graph["edges"]:
+        if edge["from"] != edge["to"]:
+            successors[edge["from"]].append(edge["to"])
+            predecessors[edge["to"]].append(edge["from"])
+
+    # Topological order with cycles broken by input order (iterative DFS)
+    state: Dict[str, int] = {}
+    order: List[str] = []
+    back_edges = set()
+    for root in ids:
+        if root in state:
+            continue
+        stack = [(root, iter(successors[root]))]
+        state[root] = 1
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node] = 2
+                order.append(node)
+                stack.pop()
+            elif state.get(child) == 1:
+                back_edges.add((node, child))
+            elif child not in state:
+                state[child] = 1
+                stack.append((child, iter(successors[child])))
+    order.reverse()
+
+    # Longest path layering
+    layer_of = {service_id: 0 for service_id in ids}
+    for node in order:
+        for child in successors[node]:
+            if (node, child) not in back_edges:
+                layer_of[child] = max(layer_of[child], layer_of[node] + 1)
+
+    layers: Dict[int, List[str]] = {}
+    for service_id in ids:
+        layers.setdefault(layer_of[service_id], []).append(service_id)
+
+    # Barycenter ordering, one sweep forward and one backward
+    position = {service_id: i for layer in layers.values() for i, service_id in enumerate(layer)}
+    for neighbours, sweep in ((predecessors, sorted(layers)), (successors, sorted(layers, reverse=True))):
+        for layer_index in sweep:
+            def key(service_id):
+                linked = [position[n] for n in neighbours[service_id]]
+                barycenter = sum(linked) / len(linked) if linked else position[service_id]
+                return (group_of[service_id], barycenter, index[service_id])
+
+            layers[layer_index].sort(key=key)
+            for i, service_id in enumerate(layers[layer_index]):
+                position[service_id] = i
+
+    return {
+        service_id: (MARGIN + layer_of[service_id] * LAYER_SPACING, MARGIN + position[service_id] * ROW_SPACING)
+        for service_id in ids
+    }
+
+
+def _group_boxes(graph: Dict[str, Any], positions: Dict[str, Tuple[int, int]]) -> Dict[str, Tuple[int, int, int, int]]:
+    """Bounding box (x, y, width, height) of every group around its services and sub-groups."""
+    children: Dict[str, List[str]] = {}
+    for group in graph["groups"]:
+        if group.get("parent"):
+            children.setdefault(group["parent"], []).append(group["id"])
+    members: Dict[str, List[str]] = {}
+    for service in graph["services"]:
+        if service.get("group"):
+            members.setdefault(service["group"], []).append(service["id"])
+
+    boxes: Dict[str, Tuple[int, int, int, int]] = {}
+
+    def box(group_id: str, visiting: frozenset) -> Optional[Tuple[int, int, int, int]]:
+        if group_id in boxes:
+            return boxes[group_id]
+        if group_id in visiting:
+            return None
+        rects = [(x, y, x + ICON_SIZE, y + ICON_SIZE + 30) for x, y in (positions[m] for m in members.get(group_id, []))]
+        for child in children.get(group_id, []):
+            child_box = box(child, visiting | {group_id})
+            if child_box:
+                x, y, width, height = child_box
+                rects.append((x, y, x + width, y + height))
+        if not rects:
+            return None
+        left = min(r[0] for r in rects) - GROUP_PADDING
+        top = min(r[1] for r in rects) - GROUP_PADDING
+        right = max(r[2] for r in rects) + GROUP_PADDING
+        bottom = max(r[3] for r in rects) + GROUP_PADDING // 2
+        boxes[group_id] = (left, top, right - left, bottom - top)
+        return boxes[group_id]
+
+    for group in graph["groups"]:
+        box(group["id"], frozenset())
+    return boxes
+
+
+def _cell(cell_id: str, value: str, style: str, x: int, y: int, width: int, height: int, parent: str = "1") -> str:
+    return (
+        f"        <mxCell id={quoteattr(cell_id)} value={quoteattr(value)} style={quoteattr(style)} vertex=\"1\" parent={quoteattr(parent)}>\n"
+        f"          <mxGeometry x=\"{x}\" y=\"{y}\" width=\"{width}\" height=\"{height}\" as=\"geometry\" />\n"
+        f"        </mxCell>\n"
+    )
+
+
+def iter_drawio_xml(graph: Dict[str, Any], name: str = "Architecture") -> Iterator[str]:
+    """
+    Renders a component graph as Draw.io (mxGraph) XML, yielding the document piece by piece
+    so large diagrams can be streamed to a file or a response.
+    """
+    graph = validate_graph(graph)
+    positions = layout(graph)
+    boxes = _group_boxes(graph, positions)
+
+    yield '<mxfile host="app.diagrams.net" type="device">\n'
+    yield f"  <diagram id=\"architecture\" name={quoteattr(name)}>\n"
+    yield '    <mxGraphModel dx="1422" dy="794" grid="1" gridSize="10" guides="1" tooltips="1" connect="1" arrows="1" fold="1" page="1" pageScale="1" math="0" shadow="0">\n'
+    yield "      <root>\n"
+    yield '        <mxCell id="0" />\n'
+    yield '        <mxCell id="1" parent="0" />\n'
+
+    # Groups are containers: their children are positioned relative to the group's top-left corner
+    parent_of = {group["id"]: group.get("parent") for group in graph["groups"]}
+
+    def parent_cell(group_id: Optional[str]) -> Tuple[str, int, int]:
+        if group_id in boxes:
+            return f"group-{group_id}", boxes[group_id][0], boxes[group_id][1]
+        return "1", 0, 0
+
+    # Outer groups first: a container must be defined before its children
+    drawn_groups = [group for group in graph["groups"] if group["id"] in boxes]
+    for group in sorted(drawn_groups, key=lambda g: -boxes[g["id"]][2] * boxes[g["id"]][3]):
+        x, y, width, height = boxes[group["id"]]
+        parent, offset_x, offset_y = parent_cell(parent_of[group["id"]])
+        yield _cell(f"group-{group['id']}", escape(group.get("label", group["id"])), GROUP_STYLE, x - offset_x, y - offset_y, width, height, parent)
+
+    for service in graph["services"]:
+        x, y = positions[service["id"]]
+        parent, offset_x, offset_y = parent_cell(service.get("group"))
+        x, y = x - offset_x, y - offset_y
+        label = escape(service["label"]) + (f"<br>{escape(str(service['sku']))}" if service.get("sku") else "")
+        if service["type"]:
+            style = ICON_STYLE.format(image=SERVICES_BY_TYPE[service["type"]].stencil)
+            yield _cell(f"svc-{service['id']}", label, style, x, y, ICON_SIZE, ICON_SIZE, parent)
+        else:
+            yield _cell(f"svc-{service['id']}", label, GENERIC_STYLE, x - 28, y + 2, ICON_SIZE + 56, ICON_SIZE - 4, parent)
+
+    # Labels are HTML (html=1 in the styles): escaped once for HTML here, and once for XML by quoteattr
+    for i, edge in enumerate(graph["edges"]):
+        yield (
+            f"        <mxCell id=\"edge-{i}\" value={quoteattr(escape(str(edge.get('label') or '')))} style={quoteattr(EDGE_STYLE)} edge=\"1\" parent=\"1\" "
+            f"source={quoteattr('svc-' + edge['from'])} target={quoteattr('svc-' + edge['to'])}>\n"
+            f"          <mxGeometry relative=\"1\" as=\"geometry\" />\n"
+            f"        </mxCell>\n"
+        )
+
+    yield "      </root>\n"
+    yield "    </mxGraphModel>\n"
+    yield "  </diagram>\n"
+    yield "</mxfile>\n"
+
+
+def render_drawio(graph: Dict[str, Any], name: str = "Architecture") -> str:
+    """Renders a component graph as a complete Draw.io XML document."""
+    return "".join(iter_drawio_xml(graph, name))
+
+
+def render_architecture_diagram(components: str, output_path: str = "architecture.drawio") -> str:
+    """
+    Renders an Azure architecture diagram (Draw.io) from a compact component graph and saves it.
+    The graph is validated first and the diagram written to a temporary file that replaces the
+    output only once it is complete, so an invalid graph leaves an existing diagram untouched.
+
+    :param components: JSON component graph with "services" (id, type, label, optional group and sku),
+        optional "groups" (id, label, optional parent) and "edges" (from, to, optional label).
+    :type components: str
+    :param output_path: File where the Draw.io diagram is written, defaults to architecture.drawio
+    :type output_path: str, optional
+
+    :return: JSON with the output path and the number of services and edges, or an error to fix.
+    :rtype: str
+    """
+    try:
+        graph = validate_graph(json.loads(components))
+    except (ValueError, KeyError, TypeError) as e:
+        return json.dumps({"error": f"Invalid component graph: {e}"})
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".drawio", delete=False) as f:
+        try:
+            for chunk in iter_drawio_xml(graph):
+                f.write(chunk)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, output_path)
+    return json.dumps({"path": output_path, "services": len(graph["services"]), "edges": len(graph.get("edges") or [])})
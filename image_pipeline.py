@@ -0,0 +1,265 @@
+import io
+import os
+import math
+import hashlib
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from PIL import Image, ImageOps
+from azure.core.exceptions import ResourceNotFoundError
+from azure.ai.agents.models import FilePurpose, MessageImageFileParam, MessageInputImageFileBlock, MessageInputTextBlock
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp")
+
+# Vision tokens an uploaded diagram may cost at high detail: 85 + 170 per 512 px tile (765 = 4 tiles)
+IMAGE_TOKEN_BUDGET = int(os.getenv("IMAGE_TOKEN_BUDGET", "765"))
+# Uploads whose dHash differs from an earlier one in at most this many bits are counted as near-duplicates
+# (metrics only: a revised diagram can be that close, so its file ID is never reused)
+DHASH_MAX_DISTANCE = int(os.getenv("IMAGE_DHASH_MAX_DISTANCE", "10"))
+
+_TILE = 512
+_BASE_TOKENS = 85
+_TILE_TOKENS = 170
+
+
+def _service_size(width: int, height: int) -> Tuple[int, int]:
+    """Size the service processes an image at with high detail: within 2048 x 2048, then the short side at most 768."""
+    scale = min(1.0, 2048 / max(width, height), 768 / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def vision_tokens(width: int, height: int) -> int:
+    """Vision tokens of an image of this size at high detail."""
+    width, height = _service_size(width, height)
+    return _BASE_TOKENS + _TILE_TOKENS * math.ceil(width / _TILE) * math.ceil(height / _TILE)
+
+
+def target_size(width: int, height: int, token_budget: int = IMAGE_TOKEN_BUDGET) -> Tuple[int, int]:
+    """Largest size, with the same aspect ratio, whose vision tokens fit in the budget."""
+    width, height = _service_size(width, height)
+    max_tiles = max(1, (token_budget - _BASE_TOKENS) // _TILE_TOKENS)
+    # Best scale over the tile grids (columns x rows) that fit in the budget
+    scale = max(
+        min(_TILE * columns / width, _TILE * (max_tiles // columns) / height)
+        for columns in range(1, max_tiles + 1)
+    )
+    scale = min(scale, 1.0)
+    return max(1, math.floor(width * scale)), max(1, math.floor(height * scale))
+
+
+def dhash(image: Image.Image, hash_size: int = 16) -> str:
+    """
+    Difference hash (256 bits by default): robust to rescaling and recompression, so it finds the
+    same diagram in another file, while mostly white diagrams with different boxes stay apart.
+    """
+    pixels = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS).tobytes()
+    bits = 0
+    for row in range(hash_size):
+        for column in range(hash_size):
+            index = row * (hash_size + 1) + column
+            bits = (bits << 1) | (pixels[index] > pixels[index + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class PreparedImage(NamedTuple):
+    """A diagram downscaled and recompressed for upload."""
+
+    data: bytes
+    filename: str
+    width: int
+    height: int
+    tokens: int
+    original_bytes: int
+    original_tokens: int
+
+
+def prepare_image(image: Image.Image, name: str, original_bytes: int, token_budget: int = IMAGE_TOKEN_BUDGET) -> PreparedImage:
+    """
+    Downscales an image to the token budget and recompresses it: as a palette PNG (diagrams have
+    few colors and sharp edges) or as JPEG, whichever is smaller.
+    """
+    original_tokens = vision_tokens(*image.size)
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        # Transparent backgrounds become white, as diagrams are drawn on white
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image.convert("RGBA"), mask=image.convert("RGBA").split()[-1])
+        image = background
+    else:
+        image = image.convert("RGB")
+
+    size = target_size(*image.size, token_budget)
+    if size != image.size:
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    png = io.BytesIO()
+    image.quantize(colors=256, method=Image.Quantize.MEDIANCUT).save(png, format="PNG", optimize=True)
+    jpeg = io.BytesIO()
+    image.save(jpeg, format="JPEG", quality=85, optimize=True)
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if len(png.getvalue()) <= len(jpeg.getvalue()):
+        data, filename = png.getvalue(), f"{stem}.png"
+    else:
+        data, filename = jpeg.getvalue(), f"{stem}.jpg"
+    return PreparedImage(data, filename, size[0], size[1], vision_tokens(*size), original_bytes, original_tokens)
+
+
+class ImageRef(NamedTuple):
+    """Uploaded image to reference from a message, with its vision tokens."""
+
+    file_id: str
+    tokens: int
+
+
+class ImageUploadCache:
+    """
+    Uploads the diagrams of the users once: every image is downscaled and recompressed to the
+    token budget, and its file ID is kept by the sha256 of the file and of the prepared bytes, so
+    the same file, or a copy whose prepared image is identical (e.g. re-saved with other
+    metadata), reuses the file uploaded before, within a session or across sessions (the file
+    IDs are kept in the state store, per project endpoint and token budget). A file ID read back
+    from the store is checked with the service the first time this process reuses it, and the
+    image is uploaded again if the file was deleted.
+
+    Only identical content is reused: a revised diagram (a box added or relabelled) can be a
+    few bits away from the previous version in a perceptual hash, and the model must see the
+    new version. The dHash of every upload is kept for the metrics only, to count how many
+    uploads are near-duplicates of an earlier one.
+
+    :param store: StateStore that persists the file IDs.
+    :param endpoint: Endpoint of the project the files are uploaded to (file IDs are only valid there).
+    :param token_budget: Vision tokens an image may cost.
+    :param max_distance: dHash distance up to which an upload is counted as a near-duplicate.
+    """
+
+    def __init__(self, store, endpoint: str, token_budget: int = IMAGE_TOKEN_BUDGET, max_distance: int = DHASH_MAX_DISTANCE):
+        self.store = store
+        self.endpoint = endpoint
+        self.token_budget = token_budget
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._by_sha256: Optional[Dict[str, Tuple[str, str, int]]] = None
+        # File IDs uploaded or found on the service by this process
+        self._checked: Set[str] = set()
+        self._metrics = {
+            "images": 0, "uploads": 0, "exact_hits": 0, "prepared_hits": 0, "near_duplicates": 0, "missing_files": 0,
+            "original_bytes": 0, "uploaded_bytes": 0, "original_tokens": 0, "tokens": 0,
+        }
+
+    def _known(self) -> Dict[str, Tuple[str, str, int]]:
+        # Loaded from the store once per process
+        if self._by_sha256 is None:
+            self._by_sha256 = {
+                sha256: (image_hash, file_id, tokens) for sha256, image_hash, file_id, tokens in self.store.image_files(self.endpoint, self.token_budget)
+            }
+        return self._by_sha256
+
+    def _exists(self, project_client, file_id: str) -> bool:
+        """Whether a known file is still on the service; a deleted one is forgotten so the image is uploaded again."""
+        with self._lock:
+            if file_id in self._checked:
+                return True
+        try:
+            project_client.agents.files.get(file_id)
+        except ResourceNotFoundError:
+            print(f"Image file {file_id} is no longer available, uploading the image again")
+            with self._lock:
+                known = self._known()
+                for sha256 in [sha256 for sha256, (_, known_id, _) in known.items() if known_id == file_id]:
+                    del known[sha256]
+                self._metrics["missing_files"] += 1
+            self.store.delete_image_file(self.endpoint, file_id)
+            return False
+        with self._lock:
+            self._checked.add(file_id)
+        return True
+
+    def _near_duplicate(self, image_hash: str) -> bool:
+        return any(hamming(image_hash, known_hash) <= self.max_distance for known_hash, _, _ in self._known().values())
+
+    def _count(self, original_bytes: int, uploaded_bytes: int, original_tokens: int, tokens: int, hit: Optional[str]) -> None:
+        with self._lock:
+            self._metrics["images"] += 1
+            self._metrics["original_bytes"] += original_bytes
+            self._metrics["uploaded_bytes"] += uploaded_bytes
+            self._metrics["original_tokens"] += original_tokens
+            self._metrics["tokens"] += tokens
+            if hit:
+                self._metrics[hit] += 1
+            else:
+                self._metrics["uploads"] += 1
+
+    def _remember(self, sha256: str, image_hash: str, file_id: str, tokens: int) -> None:
+        with self._lock:
+            self._known()[sha256] = (image_hash, file_id, tokens)
+            self._checked.add(file_id)
+        self.store.save_image_file(self.endpoint, self.token_budget, sha256, image_hash, file_id, tokens)
+
+    def upload(self, project_client, path: str, name: Optional[str] = None) -> ImageRef:
+        """
+        File ID of an image for a message, uploading it only if the same file or the same prepared image was uploaded before.
+
+        :param path: Path of the image file.
+        :param name: Original file name.
+        """
+        with open(path, "rb") as f:
+            raw = f.read()
+        sha256 = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            known = self._known().get(sha256)
+        if known and self._exists(project_client, known[1]):
+            # Same file: nothing to decode nor upload
+            with Image.open(io.BytesIO(raw)) as image:
+                original_tokens = vision_tokens(*image.size)
+            self._count(len(raw), 0, original_tokens, known[2], "exact_hits")
+            return ImageRef(known[1], known[2])
+
+        with Image.open(io.BytesIO(raw)) as image:
+            image.load()
+            image_hash = dhash(image)
+            prepared = prepare_image(image, name or os.path.basename(path), len(raw), self.token_budget)
+        prepared_sha256 = hashlib.sha256(prepared.data).hexdigest()
+        with self._lock:
+            known = self._known().get(prepared_sha256)
+        if known and not self._exists(project_client, known[1]):
+            known = None
+        with self._lock:
+            near_duplicate = known is None and self._near_duplicate(image_hash)
+        if known:
+            # Another file with the same pixels (e.g. re-saved): the prepared image was uploaded before
+            self._count(len(raw), 0, prepared.original_tokens, known[2], "prepared_hits")
+            self._remember(sha256, image_hash, known[1], known[2])
+            return ImageRef(known[1], known[2])
+
+        file_info = project_client.agents.files.upload_and_poll(file=prepared.data, filename=prepared.filename, purpose=FilePurpose.AGENTS)
+        print(
+            f"Uploaded image {prepared.filename} as {file_info.id}: {prepared.original_bytes} -> {len(prepared.data)} bytes, "
+            f"{prepared.original_tokens} -> {prepared.tokens} vision tokens"
+        )
+        self._count(len(raw), len(prepared.data), prepared.original_tokens, prepared.tokens, None)
+        if near_duplicate:
+            with self._lock:
+                self._metrics["near_duplicates"] += 1
+        self._remember(sha256, image_hash, file_info.id, prepared.tokens)
+        self._remember(prepared_sha256, image_hash, file_info.id, prepared.tokens)
+        return ImageRef(file_info.id, prepared.tokens)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters, with the bytes and vision tokens saved against uploading every image as is."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["bytes_saved"] = metrics["original_bytes"] - metrics["uploaded_bytes"]
+        metrics["tokens_saved"] = metrics["original_tokens"] - metrics["tokens"]
+        return metrics
+
+
+def image_content(text: str, images: List[ImageRef]) -> Any:
+    """Message content with the text and the images (the text alone if there are no images)."""
+    if not images:
+        return text
+    return [MessageInputTextBlock(text=text)] + [
+        MessageInputImageFileBlock(image_file=MessageImageFileParam(file_id=image.file_id, detail="high")) for image in images
+    ]
@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+from opentelemetry import trace
+from thread_compaction import parse_structured
+
+# The tiers name the deployments of the .env, whichever module imports the router first
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# A validator returns None if an answer is good enough, or the reason it is not
+Validator = Callable[[str], Optional[str]]
+
+# Answers whose "confidence" field is below this value are escalated
+CONFIDENCE_THRESHOLD = float(os.getenv("MODEL_CONFIDENCE_THRESHOLD", "0.6"))
+
+
+class ModelTier(NamedTuple):
+    """A model deployment and its price, in USD per million tokens."""
+
+    name: str
+    deployment: str
+    input_price: float
+    output_price: float
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.input_price + completion_tokens * self.output_price) / 1_000_000
+
+
+def default_tiers() -> List[Dict[str, Any]]:
+    """
+    Tiers from the cheapest to the largest: AZURE_AI_AGENT_SMALL_MODEL_DEPLOYMENT_NAME (e.g.
+    gpt-4.1-mini) for routine steps, the agents' deployment for the rest. Without a small
+    deployment there is a single tier: every agent and task runs on the agents' deployment.
+    """
+    large = {"name": "large", "deployment": os.getenv("AZURE_AI_AGENT_MODEL_DEPLOYMENT_NAME", "gpt-4o"), "input_price": 2.50, "output_price": 10.00}
+    small = os.getenv("AZURE_AI_AGENT_SMALL_MODEL_DEPLOYMENT_NAME")
+    if not small:
+        return [large]
+    return [{"name": "small", "deployment": small, "input_price": 0.40, "output_price": 1.60}, large]
+
+
+# Tier each agent is created with (names as in the agent scripts). The orchestrator calls the
+# specialists as connected agents, inside its own run: their answers never go through cascade(),
+# so an agent on the small tier would be neither validated nor escalated. All of them stay on the
+# large tier; the routine work of the costs and success stories agents runs on the small tier as
+# tasks (TASK_TIERS) when they are called directly with run_task.
+AGENT_TIERS = {
+    "orchestrator": "large",
+    "architecture_review": "large",
+    "reference_architecture": "large",
+    "architecture_generator": "large",
+    "bicep": "large",
+    "costs": "large",
+    "success_stories": "large",
+}
+
+# Tier each task type starts at; a run that fails its validation is repeated on the next tier
+TASK_TIERS = {
+    "success_story_summary": "small",
+    "price_table": "small",
+    "persona_classification": "small",
+    "architecture_review": "large",
+    "bicep": "large",
+    "orchestration": "large",
+}
+
+_HEDGES = re.compile(
+    r"\b(i(?:'m| am) not (?:sure|certain)|i do(?:n't| not) know|i(?:'m| am) unable to|i cannot (?:determine|find|answer)|"
+    r"could not find any|no (?:relevant )?information (?:is )?available|not enough information)\b",
+    re.IGNORECASE,
+)
+
+
+def non_empty(answer: str) -> Optional[str]:
+    return None if answer and answer.strip() else "empty answer"
+
+
+def confident(answer: str) -> Optional[str]:
+    """Fails empty answers, answers that hedge, and answers whose "confidence" field is below the threshold."""
+    reason = non_empty(answer)
+    if reason:
+        return reason
+    match = _HEDGES.search(answer)
+    if match:
+        return f"hedging answer ({match.group(0)!r})"
+    data = parse_structured(answer)
+    if isinstance(data, dict) and isinstance(data.get("confidence"), (int, float)) and data["confidence"] < CONFIDENCE_THRESHOLD:
+        return f"confidence {data['confidence']} below {CONFIDENCE_THRESHOLD}"
+    return None
+
+
+def json_with_keys(*keys: str) -> Validator:
+    """Validator of answers that must end with a JSON object with the given keys."""
+
+    def validate(answer: str) -> Optional[str]:
+        data = parse_structured(answer)
+        if not isinstance(data, dict):
+            return "no JSON object in the answer"
+        missing = [key for key in keys if key not in data]
+        return f"missing keys {missing}" if missing else None
+
+    return validate
+
+
+def all_of(*validators: Validator) -> Validator:
+    """Validator that fails with the first validator that fails."""
+
+    def validate(answer: str) -> Optional[str]:
+        for validator in validators:
+            reason = validator(answer)
+            if reason:
+                return reason
+        return None
+
+    return validate
+
+
+class CascadeResult(NamedTuple):
+    """Outcome of a cascade: the result of the accepted attempt and the tiers tried."""
+
+    result: Any
+    answer: str
+    tier: ModelTier
+    attempts: List[Tuple[str, Optional[str]]]  # (tier name, validation failure) per attempt
+
+
+class ModelRouter:
+    """
+    Assigns a model tier to every agent and task type.
+
+    Agents are created on the deployment of their tier (deployment_for_agent). Task runs go
+    through cascade(): the run starts on the tier of the task and its answer is checked by a
+    quick validator (confidence, JSON schema); if the check fails, the run is repeated on the
+    next, larger tier, and the escalation is logged and added as an event to the current span.
+    Runs of connected agents happen inside the run of the orchestrator and are not cascaded. Every run is recorded per tier, so report() shows the latency and the
+    cost per tier and the savings against running everything on the largest tier.
+
+    :param tiers: Tiers from the cheapest to the largest, as dicts with name, deployment, input_price and output_price.
+    :param agent_tiers: Tier name per agent.
+    :param task_tiers: Tier name per task type. Unknown agents and tasks use the largest tier.
+    """
+
+    def __init__(
+        self, tiers: Optional[List[Dict[str, Any]]] = None, agent_tiers: Optional[Dict[str, str]] = None, task_tiers: Optional[Dict[str, str]] = None,
+    ):
+        self.tiers = [ModelTier(**tier) for tier in (tiers or default_tiers())]
+        self._by_name = {tier.name: tier for tier in self.tiers}
+        self.agent_tiers = dict(AGENT_TIERS, **(agent_tiers or {}))
+        self.task_tiers = dict(TASK_TIERS, **(task_tiers or {}))
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {
+            tier.name: {"runs": 0, "escalated": 0, "seconds": [], "prompt_tokens": 0, "completion_tokens": 0} for tier in self.tiers
+        }
+        self._cascades = 0
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """
+        Reads the tiers from MODEL_TIERS (JSON list) and the overrides of the agent and task tiers
+        from AGENT_MODEL_TIERS and TASK_MODEL_TIERS (JSON objects).
+        """
+        tiers = os.getenv("MODEL_TIERS")
+        return cls(
+            tiers=json.loads(tiers) if tiers else None,
+            agent_tiers=json.loads(os.getenv("AGENT_MODEL_TIERS", "{}")),
+            task_tiers=json.loads(os.getenv("TASK_MODEL_TIERS", "{}")),
+        )
+
+    def tier(self, name: Optional[str]) -> ModelTier:
+        """Tier by name, the largest one if the name is unknown."""
+        return self._by_name.get(name, self.tiers[-1])
+
+    def tier_for_agent(self, agent: str) -> ModelTier:
+        return self.tier(self.agent_tiers.get(agent))
+
+    def deployment_for_agent(self, agent: str) -> str:
+        """Model deployment to create an agent with."""
+        return self.tier_for_agent(agent).deployment
+
+    def tier_for_task(self, task: str) -> ModelTier:
+        return self.tier(self.task_tiers.get(task))
+
+    def record(self, tier: ModelTier, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        """Records one run on a tier."""
+        with self._lock:
+            stats = self._stats[tier.name]
+            stats["runs"] += 1
+            stats["seconds"].append(seconds)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+
+    def cascade(
+        self, task: str, attempt: Callable[[ModelTier, Optional[str]], Tuple[Any, str]], validate: Validator = confident,
+    ) -> CascadeResult:
+        """
+        Runs a task from its tier up, until an answer passes the validator or the largest tier answered.
+
+        :param task: Task type (see TASK_TIERS).
+        :param attempt: Runs the task on a tier, given the reason the previous answer failed (None
+            on the first attempt), and returns (result, answer text). It records its run with record().
+        :param validate: Check of the answer, None if it is good enough.
+        """
+        start = self.tiers.index(self.tier_for_task(task))
+        attempts: List[Tuple[str, Optional[str]]] = []
+        failure = None
+        with self._lock:
+            self._cascades += 1
+        for tier in self.tiers[start:]:
+            result, answer = attempt(tier, failure)
+            failure = validate(answer)
+            attempts.append((tier.name, failure))
+            if failure is None or tier is self.tiers[-1]:
+                return CascadeResult(result, answer, tier, attempts)
+            logger.info("Answer of %s on the %s tier failed validation (%s), escalating", task, tier.name, failure)
+            trace.get_current_span().add_event("model_tier_escalation", {"task": task, "tier": tier.name, "failure": failure})
+            with self._lock:
+                self._stats[tier.name]["escalated"] += 1
+
+    def report(self) -> Dict[str, Any]:
+        """Runs, escalations, latency, tokens and cost per tier, and the savings against running everything on the largest tier."""
+        largest = self.tiers[-1]
+        tiers = {}
+        with self._lock:
+            stats = {name: dict(values, seconds=sorted(values["seconds"])) for name, values in self._stats.items()}
+            cascades = self._cascades
+        for tier in self.tiers:
+            values = stats[tier.name]
+            seconds = values["seconds"]
+            tiers[tier.name] = {
+                "deployment": tier.deployment,
+                "runs": values["runs"],
+                "escalated": values["escalated"],
+                "latency_mean_s": sum(seconds) / len(seconds) if seconds else 0.0,
+                "latency_p95_s": seconds[int(0.95 * (len(seconds) - 1))] if seconds else 0.0,
+                "prompt_tokens": values["prompt_tokens"],
+                "completion_tokens": values["completion_tokens"],
+                "cost_usd": tier.cost(values["prompt_tokens"], values["completion_tokens"]),
+            }
+        cost = sum(tier["cost_usd"] for tier in tiers.values())
+        # The escalated attempts would not have run if everything ran on the largest tier
+        accepted = [stats[name] for name in tiers if stats[name]["runs"]]
+        largest_cost = sum(
+            largest.cost(values["prompt_tokens"], values["completion_tokens"]) * (values["runs"] - values["escalated"]) / values["runs"]
+            for values in accepted
+        )
+        escalations = sum(tier["escalated"] for tier in tiers.values())
+        return {
+            "tiers": tiers,
+            "cascades": cascades,
+            "escalation_rate": round(escalations / cascades, 3) if cascades else None,
+            "cost_usd": cost,
+            "cost_largest_tier_usd": largest_cost,
+            "savings_usd": largest_cost - cost,
+        }
+
+
+# Shared by the agent scripts and the sessions of the process
+router = ModelRouter.from_env()
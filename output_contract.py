@@ -0,0 +1,279 @@
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from azure.ai.agents.models import ResponseFormatJsonSchema, ResponseFormatJsonSchemaType
+from contract_stream import SECTION_TITLES
+from thread_compaction import parse_structured, split_structured
+
+# Validation errors reported per output, the rest are counted
+MAX_ERRORS = 5
+
+
+def _string(nullable: bool = False) -> Dict[str, Any]:
+    return {"type": ["string", "null"]} if nullable else {"type": "string"}
+
+
+def _number(nullable: bool = False) -> Dict[str, Any]:
+    return {"type": ["number", "null"]} if nullable else {"type": "number"}
+
+
+def _strings() -> Dict[str, Any]:
+    return {"type": "array", "items": {"type": "string"}}
+
+
+def _array(items: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "array", "items": items}
+
+
+def _object(**properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Strict object: every property is required (nullable if optional) and no other property is allowed, as structured output requires."""
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+# Result of every specialist: an object with its section of the Output Contract, in the shape of the contract
+SECTION_SCHEMAS = {
+    "architectureReview": _array(_object(
+        pillar={"type": "string", "enum": ["Reliability", "Security", "Cost Optimization", "Operational Excellence", "Performance Efficiency"]},
+        question=_string(),
+        status={"type": "string", "enum": ["met", "partial", "gap", "unknown"]},
+        findings=_strings(),
+        references=_strings(),
+    )),
+    "referenceArchitectures": _array(_object(title=_string(), summary=_string(), url=_string())),
+    "bicep": _object(
+        modules=_array(_object(name=_string(), purpose=_string(), code=_string())),
+        parameters=_array(_object(name=_string(), type=_string(), value=_string(nullable=True))),
+        notes=_strings(),
+    ),
+    "costs": _object(
+        market=_string(),
+        currency=_string(),
+        region=_string(),
+        lineItems=_array(_object(
+            service=_string(),
+            sku=_string(),
+            meter=_string(),
+            unitPrice=_number(),
+            unit=_string(),
+            quantity=_number(),
+            monthly=_number(),
+            sourceId=_string(),
+            apiQuery=_string(),
+        )),
+        totalMonthly=_number(),
+        missingDetails=_strings(),
+    ),
+    "successStories": _array(_object(
+        customer=_string(),
+        businessGoal=_string(),
+        keyProducts=_strings(),
+        technologySolution=_string(),
+        impact=_string(),
+        url=_string(nullable=True),
+    )),
+}
+
+# Contract section of every connected agent of the orchestrator (see OrcAgent.py)
+CONNECTED_AGENT_SECTIONS = {
+    "get_architecture_review": "architectureReview",
+    "get_reference_architecture": "referenceArchitectures",
+    "get_bicep_templates": "bicep",
+    "get_cost_estimates": "costs",
+    "get_success_stories": "successStories",
+}
+
+# Fields that identify an item of a list section, to drop the repeated ones when an agent is called twice
+_IDENTITY = {
+    "architectureReview": ("pillar", "question"),
+    "referenceArchitectures": ("url",),
+    "successStories": ("customer", "url"),
+}
+
+
+def specialist_schema(section: str) -> Dict[str, Any]:
+    """JSON schema of the result of the specialist of a section: {"<section>": <section value>}."""
+    return _object(**{section: SECTION_SCHEMAS[section]})
+
+
+def response_format(section: str) -> ResponseFormatJsonSchemaType:
+    """Structured output of the specialist agent of a section, for create_agent(response_format=...)."""
+    return ResponseFormatJsonSchemaType(
+        json_schema=ResponseFormatJsonSchema(
+            name=f"{section}_result",
+            description=f"{SECTION_TITLES[section]} section of the architecture Output Contract",
+            schema=specialist_schema(section),
+        )
+    )
+
+
+_TYPES = {
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, list),
+    "object": lambda value: isinstance(value, dict),
+    "null": lambda value: value is None,
+}
+
+
+def validate(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Errors of a value against a JSON schema, in the subset used by the specialist schemas (type,
+    enum, properties, required, additionalProperties and items). Empty if the value is valid.
+    """
+    errors: List[str] = []
+    types = schema.get("type")
+    if types is not None:
+        types = types if isinstance(types, list) else [types]
+        if not any(_TYPES[name](value) for name in types):
+            return [f"{path}: expected {' or '.join(types)}, got {type(value).__name__}"]
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: {value!r} is not one of {schema['enum']}")
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path}.{name}: missing")
+        for name, item in value.items():
+            if name in properties:
+                errors.extend(validate(item, properties[name], f"{path}.{name}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}.{name}: not allowed")
+    elif isinstance(value, list) and "items" in schema:
+        for index, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{index}]"))
+    return errors
+
+
+def parse_result(section: str, text: str) -> Tuple[Optional[Any], List[str]]:
+    """
+    Section value from the output of a specialist, with the validation errors.
+
+    :return: (value, errors); value is None if the output is not JSON or not valid.
+    """
+    data = parse_structured(text)
+    if data is None:
+        return None, ["not a JSON object"]
+    errors = validate(data, specialist_schema(section))
+    if errors:
+        return None, errors[:MAX_ERRORS] + ([f"and {len(errors) - MAX_ERRORS} more"] if len(errors) > MAX_ERRORS else [])
+    return data[section], []
+
+
+def validator(section: str) -> Callable[[str], Optional[str]]:
+    """Validator of the output of a specialist for model_router (None if the output matches its schema)."""
+
+    def check(answer: str) -> Optional[str]:
+        _, errors = parse_result(section, answer)
+        return f"does not match the {section} schema: {'; '.join(errors)}" if errors else None
+
+    return check
+
+
+def _unique(items: List[Any], key: Callable[[Any], Any]) -> List[Any]:
+    seen = set()
+    result = []
+    for item in items:
+        identity = key(item)
+        if identity not in seen:
+            seen.add(identity)
+            result.append(item)
+    return result
+
+
+def _combine(section: str, values: List[Any], notes: List[str]) -> Any:
+    """One section from the results of every call to its specialist (an agent can be called more than once per request)."""
+    if section in _IDENTITY:
+        fields = _IDENTITY[section]
+        return _unique([item for value in values for item in value], lambda item: tuple(item.get(field) for field in fields))
+    if section == "bicep":
+        modules = {module["name"]: module for value in values for module in value["modules"]}
+        parameters = {parameter["name"]: parameter for value in values for parameter in value["parameters"]}
+        bicep_notes = _unique([note for value in values for note in value["notes"]], lambda note: note)
+        return {"modules": list(modules.values()), "parameters": list(parameters.values()), "notes": bicep_notes}
+    if section == "costs":
+        first = values[0]
+        line_items = _unique(
+            [item for value in values for item in value["lineItems"]],
+            lambda item: (item["sourceId"], item["sku"], item["quantity"], item["monthly"]),
+        )
+        total = round(sum(item["monthly"] for item in line_items), 2)
+        if len(values) == 1 and abs(total - first["totalMonthly"]) > 0.01:
+            notes.append(f"Costs: totalMonthly recomputed from the line items ({total}), the agent reported {first['totalMonthly']}.")
+        return {
+            "market": first["market"],
+            "currency": first["currency"],
+            "region": first["region"],
+            "lineItems": line_items,
+            "totalMonthly": total,
+            "missingDetails": _unique([detail for value in values for detail in value["missingDetails"]], lambda detail: detail),
+        }
+    return values[-1]
+
+
+def merge_contract(plan: Dict[str, Any], outputs: Dict[str, List[str]]) -> Dict[str, Any]:
+    """
+    Assembles the Output Contract from the plan of the orchestrator (summary, assumptions,
+    openQuestions) and the outputs of the specialists, without another model pass. Outputs
+    that do not match their schema are left out and reported in the notes, as well as the
+    fixes made to them; a section the orchestrator wrote itself is kept if no valid output replaces it.
+
+    :param plan: JSON object of the orchestrator answer.
+    :param outputs: Raw outputs of the specialists per contract section.
+    """
+    notes: List[str] = list(plan.get("notes", []))
+    sections: Dict[str, Any] = {}
+    for section, texts in outputs.items():
+        values = []
+        for text in texts:
+            value, errors = parse_result(section, text)
+            if errors:
+                notes.append(f"{SECTION_TITLES[section]}: an agent output was left out, it does not match its schema ({'; '.join(errors)}).")
+            else:
+                values.append(value)
+        if values:
+            sections[section] = _combine(section, values, notes)
+
+    contract: Dict[str, Any] = {}
+    for key in SECTION_TITLES:
+        if key in sections:
+            contract[key] = sections[key]
+        elif key in plan:
+            contract[key] = plan[key]
+    contract.update((key, value) for key, value in plan.items() if key not in contract and key != "notes")
+    if notes:
+        contract["notes"] = notes
+    return contract
+
+
+def specialist_outputs(project_client, thread_id: str, run_id: str) -> Dict[str, List[str]]:
+    """Outputs of the connected agents called by an orchestrator run, per contract section, in call order."""
+    outputs: Dict[str, List[str]] = {}
+    for step in project_client.agents.run_steps.list(thread_id=thread_id, run_id=run_id, order="asc"):
+        for call in step.get("step_details", {}).get("tool_calls", []):
+            if call.get("type") != "connected_agent":
+                continue
+            details = call.get("connected_agent", {})
+            section = CONNECTED_AGENT_SECTIONS.get(details.get("name"))
+            if section and details.get("output"):
+                outputs.setdefault(section, []).append(details["output"])
+    return outputs
+
+
+def assemble_contract(project_client, thread_id: str, run, answer: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Executive Summary and merged Output Contract of an orchestrator run.
+
+    :param run: Finished ThreadRun of the orchestrator.
+    :param answer: Answer of the orchestrator: the Executive Summary followed by its plan JSON.
+    :return: (Executive Summary, contract)
+    """
+    prose, _ = split_structured(answer)
+    plan = parse_structured(answer)
+    outputs = specialist_outputs(project_client, thread_id, run.id)
+    return prose, merge_contract(plan if isinstance(plan, dict) else {}, outputs)
+
+
+def contract_answer(prose: str, contract: Dict[str, Any]) -> str:
+    """Answer text with the merged contract, as the orchestrator used to write it (kept in the state store)."""
+    return f"{prose}\n\n```json\n{json.dumps(contract, indent=2, ensure_ascii=False)}\n```"
@@ -3,8 +3,7 @@ import json
 import pandas as pd
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
-from azure.ai.agents.telemetry import trace_function
-from opentelemetry import trace
+from tool_telemetry import traced_tool, record_payload, mark_failed
 import logging
 import azure.functions as func
 
@@ -12,7 +11,7 @@ import azure.functions as func
 load_dotenv(".env")
 CONN_STR = os.getenv("AZURE_PG_CONNECTION")
 
-@trace_function
+@traced_tool
 def main(msg: func.QueueMessage) -> str:
     """
     Azure Function triggered by Azure Storage Queue.
@@ -47,14 +46,14 @@ def main(msg: func.QueueMessage) -> str:
         # Execute query
         df = pd.read_sql(query, db, params=(vector_search_query, limit))
 
-        # Add tracing attributes
-        span = trace.get_current_span()
-        span.set_attribute("requested_query", query)
+        # Add tracing payloads
+        record_payload("requested_query", query)
         cases_json = json.dumps(df.to_json(orient="records"))
-        span.set_attribute("cases_json", cases_json)
+        record_payload("cases_json", cases_json)
 
         return cases_json
 
     except Exception as e:
         logging.error(f"Error processing queue message: {e}")
+        mark_failed(str(e))
         return json.dumps({"error": str(e)})
\ No newline at end of file
@@ -5,18 +5,30 @@ from dotenv import load_dotenv
 from datetime import datetime
 import json
 from typing import Any, Callable, Set
-from sqlalchemy import create_engine
-from azure.ai.agents.telemetry import trace_function
-from opentelemetry import trace
+from tool_telemetry import traced_tool, record_payload
+from prefetch import prefetcher, same_query, topic_key
 
 # Load environment variables
 load_dotenv(".env")
 CONN_STR = os.getenv("AZURE_PG_CONNECTION")
+# Postgres cancels queries running longer than this, so a timed out tool call does not keep its thread
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "20000"))
+
+# The traced_tool decorator traces the function call in its own span. Payloads recorded with
+# record_payload are attached following the shared capture policy (size caps, hashing, sampling).
+
+# Tools decorated with prefetcher.tool read first the results prefetched for the user message
+# (see prefetch.py): success stories about the same services and topics, for a query about that
+# message. The retail prices tool runs in the Azure Function (pg_azurefunction/worker_tools.py)
 
-# The trace_func decorator will trace the function call and enable adding additional attributes
-# to the span in the function implementation. Note that this will trace the function parameters and their values.
 
 # Get data from the Postgres database
+@prefetcher.tool(
+    key=lambda call: (topic_key(call["vector_search_query"]), call["limit"]) if topic_key(call["vector_search_query"]) else None,
+    plan=lambda text: [{"vector_search_query": text, "limit": 10}],
+    match=same_query("vector_search_query"),
+)
+@traced_tool
 def vector_search_success_stories(vector_search_query: str, limit: int = 10) -> str:
     """
     Fetches the success stories of implementations of AI projects in Azure.
@@ -30,7 +42,7 @@ def vector_search_success_stories(vector_search_query: str, limit: int = 10) ->
     :rtype: str
     """
         
-    db = create_engine(CONN_STR)
+    db = create_engine(CONN_STR, connect_args={"options": f"-c statement_timeout={PG_STATEMENT_TIMEOUT_MS}"})
     
     query = """
     SELECT story_id, story_title, business_goal, 
@@ -46,12 +58,11 @@ def vector_search_success_stories(vector_search_query: str, limit: int = 10) ->
     # Fetch cases information from the database
     df = pd.read_sql(query, db, params=(vector_search_query,limit))
 
-    # Adding attributes to the current span
-    span = trace.get_current_span()
-    span.set_attribute("requested_query", query)
+    # Adding payloads to the current span
+    record_payload("requested_query", query)
 
     cases_json = json.dumps(df.to_json(orient="records"))
-    span.set_attribute("cases_json", cases_json)
+    record_payload("cases_json", cases_json)
     return cases_json
 
 
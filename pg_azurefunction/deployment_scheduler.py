@@ -0,0 +1,242 @@
+# Copy of ../deployment_scheduler.py, kept in sync by sync_function_modules.py: edit the original and run it.
+import os
+import re
+import json
+import time
+import heapq
+import itertools
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from azure.core.exceptions import HttpResponseError
+
+# Priorities: lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+
+# Tokens reserved for a run before its real usage is known (the orchestrator fans out to
+# several connected agents, so a single run consumes far more than its prompt)
+RUN_TOKEN_ESTIMATE = int(os.getenv("AZURE_AI_AGENT_RUN_TOKEN_ESTIMATE", "8000"))
+MAX_RETRIES = int(os.getenv("AZURE_AI_AGENT_MAX_RETRIES", "5"))
+
+
+class RateLimited(Exception):
+    """Raised by a scheduled call when the deployment answered with a rate limit error."""
+
+    def __init__(self, retry_after: float, message: str = "Rate limit exceeded"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a prompt plus the reservation for the rest of the run."""
+    return len(text) // 4 + RUN_TOKEN_ESTIMATE
+
+
+def raise_for_rate_limit(run) -> None:
+    """
+    Raises RateLimited if an agent run failed because the deployment was throttled.
+    The Agents service reports this as a failed run with code "rate_limit_exceeded" and a
+    message like "Try again in 20 seconds".
+    """
+    error = getattr(run, "last_error", None)
+    if run.status != "failed" or not error or error.get("code") != "rate_limit_exceeded":
+        return
+    match = re.search(r"(\d+(?:\.\d+)?) second", error.get("message", ""))
+    raise RateLimited(float(match.group(1)) if match else 10.0, error.get("message", "Rate limit exceeded"))
+
+
+def _retry_after(error: HttpResponseError) -> float:
+    headers = error.response.headers if error.response is not None else {}
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    if headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+    return 10.0
+
+
+def _positive_budget(value: Any, name: str) -> int:
+    """
+    A tokens or requests per minute budget as an int.
+
+    :raises ValueError: If the budget is not a positive number (the buckets refill in proportion to it).
+    """
+    try:
+        budget = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name} budget: {value!r}") from None
+    if budget <= 0:
+        raise ValueError(f"Invalid {name} budget: {value!r}, it must be greater than 0")
+    return budget
+
+
+class _Deployment:
+    """Token buckets, wait queue and metrics of a single model deployment."""
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.requests = float(requests_per_minute)
+        self.refilled_at = time.monotonic()
+        self.paused_until = 0.0
+        self.queue: List[tuple] = []
+        self.condition = threading.Condition()
+        self.granted = 0
+        self.throttled = 0
+        self.wait_times: List[float] = []
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.refilled_at
+        self.refilled_at = now
+        self.tokens = min(self.tokens_per_minute, self.tokens + elapsed * self.tokens_per_minute / 60)
+        self.requests = min(self.requests_per_minute, self.requests + elapsed * self.requests_per_minute / 60)
+
+    def time_until_available(self, tokens: int, now: float) -> float:
+        """Seconds until the budget allows a request of the given size, 0 if it does now."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        # A request larger than the whole budget is let through once the bucket is full
+        tokens = min(tokens, self.tokens_per_minute)
+        missing_tokens = max(tokens - self.tokens, 0) * 60 / self.tokens_per_minute
+        missing_requests = max(1 - self.requests, 0) * 60 / self.requests_per_minute
+        return max(missing_tokens, missing_requests)
+
+
+class DeploymentScheduler:
+    """
+    Admission control for model deployments.
+
+    Requests wait in a priority queue per deployment (interactive before batch, first come
+    first served within a priority) until the deployment's tokens-per-minute and
+    requests-per-minute budgets allow them. A 429 pauses the whole deployment for the
+    retry-after period and puts the request back in the queue.
+
+    :param budgets: Budget per deployment name, e.g. {"gpt-4o": {"tpm": 150000, "rpm": 900}}.
+        Deployments without a budget use default_tpm and default_rpm.
+    :raises ValueError: If a tpm or rpm budget is not a positive number.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, Dict[str, int]]] = None, default_tpm: int = 150000, default_rpm: int = 900):
+        self._default_tpm = _positive_budget(default_tpm, "default tpm")
+        self._default_rpm = _positive_budget(default_rpm, "default rpm")
+        self._budgets = {
+            name: {
+                "tpm": _positive_budget(budget.get("tpm", self._default_tpm), f"tpm of {name}"),
+                "rpm": _positive_budget(budget.get("rpm", self._default_rpm), f"rpm of {name}"),
+            }
+            for name, budget in (budgets or {}).items()
+        }
+        self._deployments: Dict[str, _Deployment] = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "DeploymentScheduler":
+        """
+        Reads the budgets from DEPLOYMENT_BUDGETS (JSON) and the defaults from
+        DEPLOYMENT_DEFAULT_TPM and DEPLOYMENT_DEFAULT_RPM.
+        """
+        return cls(
+            budgets=json.loads(os.getenv("DEPLOYMENT_BUDGETS", "{}")),
+            default_tpm=int(os.getenv("DEPLOYMENT_DEFAULT_TPM", "150000")),
+            default_rpm=int(os.getenv("DEPLOYMENT_DEFAULT_RPM", "900")),
+        )
+
+    def _deployment(self, name: str) -> _Deployment:
+        with self._lock:
+            if name not in self._deployments:
+                budget = self._budgets.get(name, {"tpm": self._default_tpm, "rpm": self._default_rpm})
+                self._deployments[name] = _Deployment(budget["tpm"], budget["rpm"])
+            return self._deployments[name]
+
+    def acquire(self, deployment: str, tokens: int, priority: int = INTERACTIVE) -> float:
+        """
+        Blocks until the request is at the head of the deployment queue and fits the budget,
+        then consumes the budget.
+
+        :return: Seconds the request waited in the queue.
+        """
+        state = self._deployment(deployment)
+        entry = (priority, next(self._sequence))
+        enqueued = time.monotonic()
+        with state.condition:
+            heapq.heappush(state.queue, entry)
+            while True:
+                now = time.monotonic()
+                state.refill(now)
+                wait = state.time_until_available(tokens, now) if state.queue[0] == entry else None
+                if wait == 0:
+                    break
+                state.condition.wait(timeout=wait)
+
+            heapq.heappop(state.queue)
+            state.tokens -= tokens
+            state.requests -= 1
+            state.granted += 1
+            waited = time.monotonic() - enqueued
+            state.wait_times.append(waited)
+            del state.wait_times[:-1000]
+            state.condition.notify_all()
+        return waited
+
+    def report_usage(self, deployment: str, reserved_tokens: int, used_tokens: int) -> None:
+        """Corrects the token budget once the real usage of a request is known."""
+        state = self._deployment(deployment)
+        with state.condition:
+            state.tokens = min(state.tokens_per_minute, state.tokens + reserved_tokens - used_tokens)
+            state.condition.notify_all()
+
+    def backoff(self, deployment: str, retry_after: float) -> None:
+        """Pauses every request to the deployment for retry_after seconds."""
+        state = self._deployment(deployment)
+        with state.condition:
+            state.throttled += 1
+            state.paused_until = max(state.paused_until, time.monotonic() + retry_after)
+            state.condition.notify_all()
+
+    def submit(self, deployment: str, call: Callable[[], Any], tokens: int, priority: int = INTERACTIVE, max_retries: int = MAX_RETRIES) -> Any:
+        """
+        Runs call once the deployment admits it, retrying after the retry-after period when it
+        is throttled (HTTP 429 or RateLimited).
+        """
+        for attempt in range(max_retries + 1):
+            waited = self.acquire(deployment, tokens, priority)
+            if waited > 1:
+                print(f"Waited {waited:.1f}s for deployment {deployment}")
+            try:
+                return call()
+            except HttpResponseError as e:
+                if e.status_code != 429 or attempt == max_retries:
+                    raise
+                self.backoff(deployment, _retry_after(e))
+            except RateLimited as e:
+                if attempt == max_retries:
+                    raise
+                self.backoff(deployment, e.retry_after)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth per priority, wait times and throttling counts per deployment."""
+        result = {}
+        with self._lock:
+            deployments = dict(self._deployments)
+        for name, state in deployments.items():
+            with state.condition:
+                waits = sorted(state.wait_times)
+                result[name] = {
+                    "queue_depth": len(state.queue),
+                    "queue_depth_interactive": sum(1 for priority, _ in state.queue if priority == INTERACTIVE),
+                    "queue_depth_batch": sum(1 for priority, _ in state.queue if priority == BATCH),
+                    "granted": state.granted,
+                    "throttled": state.throttled,
+                    "wait_mean_s": sum(waits) / len(waits) if waits else 0.0,
+                    "wait_p95_s": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                    "wait_max_s": waits[-1] if waits else 0.0,
+                }
+        return result
+
+
+# Shared by every caller in the process so all of them draw from the same budgets
+scheduler = DeploymentScheduler.from_env()
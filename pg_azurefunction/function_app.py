@@ -1,70 +1,55 @@
 import azure.functions as func
-import json
 import logging
 import os
-import time
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
-from azure.ai.agents.models import AzureFunctionStorageQueue, AzureFunctionTool
+from azure.ai.agents.models import MessageRole
+from azure_clients import get_project_client as get_shared_project_client
+from tool_workers import OUTPUT_QUEUE_NAME, ToolWorker
+from worker_tools import registry
+from tool_telemetry import configure_tracing, overhead_stats
+from docs_index import DOCS_INDEX_DIR, refresh_index
+from deployment_scheduler import INTERACTIVE, estimate_tokens, raise_for_rate_limit, scheduler
 
 app = func.FunctionApp()
 
+# Export the spans of the tool calls to Application Insights (APPLICATIONINSIGHTS_CONNECTION_STRING)
+logging.info(f"Tracing configured: {configure_tracing()}")
 
-# Name of the queues to get and send the function call messages
-input_queue_name = "input"
-output_queue_name = "output"
 
-# Function to initialize the agent client and the tools Azure Functions that the agent can use
-def initialize_client():
-    # Create a project client using the project endpoint from local.settings.json
-    # Check if we have a user-assigned managed identity client ID
+# Name of the queue to send the function call results; every tool has its own input queue
+output_queue_name = OUTPUT_QUEUE_NAME
+
+# Model deployment of the agent. Its runs wait for budget in the DeploymentScheduler of the
+# instance, so DEPLOYMENT_BUDGETS in the Function settings is the budget of a single instance
+AGENT_MODEL = os.getenv("AZURE_AI_AGENT_MODEL_DEPLOYMENT_NAME", "gpt-4.1-mini")
+
+# Executes the tool calls of this Function instance, deduplicating and batching concurrent calls
+worker = ToolWorker(registry, max_workers=int(os.getenv("TOOL_WORKER_THREADS", "8")))
+
+# Project client of the Function instance from the shared factory (azure_clients.py): the credential,
+# its tokens and the pooled connections are reused by every invocation
+def get_project_client():
+    # Use the user-assigned managed identity if configured, else the default credential chain (local development)
     managed_identity_client_id = os.environ.get("PROJECT_ENDPOINT__clientId")
-    
     if managed_identity_client_id:
-        # Use user-assigned managed identity
-        credential = DefaultAzureCredential(managed_identity_client_id=managed_identity_client_id)
-        logging.info(f"Using user-assigned managed identity with client ID: {managed_identity_client_id}")
-    else:
-        # Use default credential chain (for local development)
-        credential = DefaultAzureCredential()
-        logging.info("Using default credential chain")
-    
-    project_client = AIProjectClient(
-        credential=credential,
-        endpoint=os.environ["PROJECT_ENDPOINT"]
-    )
-    logging.info("Successfully created AI Project client")
+        return get_shared_project_client(os.environ["PROJECT_ENDPOINT"], managed_identity_client_id=managed_identity_client_id)
+    return get_shared_project_client(os.environ["PROJECT_ENDPOINT"])
+
+# Function to initialize the agent client and the tools Azure Functions that the agent can use
+def initialize_client():
+    project_client = get_project_client()
 
     # Get the connection string from local.settings.json
     storage_connection_string = os.environ["STORAGE_CONNECTION__queueServiceUri"]
 
-    # Define the Azure Function tool
-    azure_function_tool = AzureFunctionTool(
-        name="GetWeather",
-        description="Get the weather in a location.",
-        parameters={
-            "type": "object",
-            "properties": {
-                "location": { "type": "string", "description": "The location to look up." },
-            },
-            "required": [ "location" ],
-        },
-        input_queue=AzureFunctionStorageQueue(
-            queue_name=input_queue_name,
-            storage_service_endpoint=storage_connection_string,
-        ),
-        output_queue=AzureFunctionStorageQueue(
-            queue_name=output_queue_name,
-            storage_service_endpoint=storage_connection_string
-        )
-    )
+    # Define the Azure Function tools, one input queue per registered tool
+    tool_definitions = registry.definitions(storage_connection_string, output_queue_name)
 
-    # Create an agent with the Azure Function tool to get the weather
+    # Create an agent with the Azure Function tools
     agent = project_client.agents.create_agent(
-        model="gpt-4.1-mini",
-        name="azure-function-agent-get-weather",
-        instructions="You are a helpful support agent. Answer the user's questions to the best of your ability.",
-        tools=azure_function_tool.definitions,
+        model=AGENT_MODEL,
+        name="azure-function-agent-tools",
+        instructions="You are a helpful support agent. Answer the user's questions to the best of your ability, using the tools to look up success stories and Azure prices.",
+        tools=tool_definitions,
     )
     logging.info(f"Created agent, agent ID: {agent.id}")
 
@@ -74,6 +59,40 @@ def initialize_client():
 
     return project_client, thread, agent
 
+# Function to send a prompt to the agent and wait for its answer
+def run_prompt(project_client, thread, agent, prompt):
+    # Send the prompt to the agent
+    message = project_client.agents.messages.create(
+        thread_id=thread.id,
+        role="user",
+        content=prompt,
+    )
+    logging.info(f"Created message, message ID: {message.id}")
+
+    # Run the agent once the deployment has budget for it; the tools run in the queue triggers
+    def process_run():
+        run = project_client.agents.runs.create_and_process(thread_id=thread.id, agent_id=agent.id)
+        raise_for_rate_limit(run)
+        return run
+
+    tokens = estimate_tokens(prompt)
+    run = scheduler.submit(AGENT_MODEL, process_run, tokens, INTERACTIVE)
+    usage = getattr(run, "usage", None)
+    if usage:
+        scheduler.report_usage(AGENT_MODEL, tokens, usage.total_tokens)
+
+    logging.info(f"Run finished with status: {run.status}, deployments {scheduler.metrics()}")
+
+    if run.status == "failed":
+        logging.error(f"Run failed: {run.last_error}")
+
+    # Get the last message from the agent (the messages are listed newest first, up to the first agent message)
+    last_msg = project_client.agents.messages.get_last_message_text_by_role(thread_id=thread.id, role=MessageRole.AGENT)
+    if last_msg:
+        logging.info(f"Last Message: {last_msg.text.value}")
+
+    return last_msg.text.value if last_msg else "No response from agent"
+
 @app.route(route="prompt", auth_level=func.AuthLevel.FUNCTION)
 def prompt(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Python HTTP trigger function processed a request.')
@@ -86,43 +105,8 @@ def prompt(req: func.HttpRequest) -> func.HttpResponse:
     project_client, thread, agent = initialize_client()
 
     try:
-        # Send the prompt to the agent
-        message = project_client.agents.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=prompt,
-        )
-        logging.info(f"Created message, message ID: {message.id}")
-
-        # Run the agent
-        run = project_client.agents.runs.create(thread_id=thread.id, agent_id=agent.id)
-        # Monitor and process the run status
-        while run.status in ["queued", "in_progress", "requires_action"]:
-            time.sleep(1)
-            run = project_client.agents.runs.get(thread_id=thread.id, run_id=run.id)
-
-            if run.status not in ["queued", "in_progress", "requires_action"]:
-                break
-
-        logging.info(f"Run finished with status: {run.status}")
-
-        if run.status == "failed":
-            logging.error(f"Run failed: {run.last_error}")
-
-        messages = project_client.agents.messages.list(thread_id=thread.id)
-        logging.info(f"Messages: {messages}")
-
-        # Get the last message from the agent
-        last_msg = None
-        for data_point in messages:
-            if data_point['role'] == "assistant":
-                last_msg = data_point['content'][-1]
-                logging.info(f"Last Message: {last_msg.text.value}")
-                break
-        
-        # Prepare response (moved outside of try-finally to use the last_msg variable)
-        response_text = last_msg.text.value if last_msg else "No response from agent"
-        
+        response_text = run_prompt(project_client, thread, agent, prompt)
+
     finally:
         # Delete the agent once done - this will execute regardless of success or exceptions
         try:
@@ -134,22 +118,33 @@ def prompt(req: func.HttpRequest) -> func.HttpResponse:
 
     return func.HttpResponse(response_text)
 
-# Function to get the weather
-@app.function_name(name="GetWeather")
-@app.queue_output(arg_name="outputQueueItem",  queue_name=output_queue_name, connection="STORAGE_CONNECTION")
-@app.queue_trigger(arg_name="msg", queue_name=input_queue_name, connection="STORAGE_CONNECTION") 
-def process_queue_message(msg: func.QueueMessage,  outputQueueItem: func.Out[str]) -> None:
-    logging.info('Python queue trigger function processed a queue item')
-
-    messagepayload = json.loads(msg.get_body().decode('utf-8'))
-    location = messagepayload['location']
-    correlation_id = messagepayload['CorrelationId']
-
-    # Send message to queue. Sends a mock message for the weather
-    result_message = {
-        'Value': 'Weather is 74 degrees and sunny in ' + location,
-        'CorrelationId': correlation_id
-    }
-    outputQueueItem.set(json.dumps(result_message).encode('utf-8'))
-
-    logging.info(f"Sent message to queue: {output_queue_name} with message {result_message}")
+# Keeps the documentation snapshot of search_architecture_docs up to date. DOCS_INDEX_DIR must be a
+# writable folder shared by the instances (e.g. /home/data/docs_index); the searches reload the
+# snapshot when it is replaced. Runs at startup too, but only rebuilds a missing or old snapshot
+@app.timer_trigger(schedule=os.getenv("DOCS_INDEX_REFRESH_SCHEDULE", "0 0 3 * * *"), arg_name="timer", run_on_startup=True)
+def refresh_docs_index(timer: func.TimerRequest) -> None:
+    rebuilt = refresh_index(DOCS_INDEX_DIR, max_age_hours=float(os.getenv("DOCS_INDEX_MAX_AGE_HOURS", "24")))
+    logging.info(f"Documentation index in {DOCS_INDEX_DIR} rebuilt: {rebuilt}")
+
+# Queue trigger of a registered tool. Instances scale out with the length of the input queues;
+# within an instance, concurrent messages share the ToolWorker
+def register_tool_trigger(tool):
+    @app.function_name(name=tool.name)
+    @app.queue_output(arg_name="outputQueueItem", queue_name=output_queue_name, connection="STORAGE_CONNECTION")
+    @app.queue_trigger(arg_name="msg", queue_name=tool.input_queue, connection="STORAGE_CONNECTION")
+    def process_queue_message(msg: func.QueueMessage, outputQueueItem: func.Out[str]) -> None:
+        logging.info(f"Processing queue item {msg.id} of tool {tool.name} (dequeue count {msg.dequeue_count})")
+
+        # Errors of the tool are returned to the agent in the Value, so the message is not retried
+        result_message = worker.handle(tool.name, msg.get_body())
+        outputQueueItem.set(result_message)
+
+        logging.info(
+            f"Sent message to queue: {output_queue_name} for tool {tool.name}, worker stats {worker.stats()}, tool telemetry {overhead_stats()}"
+        )
+
+    return process_queue_message
+
+
+for tool in registry:
+    register_tool_trigger(tool)
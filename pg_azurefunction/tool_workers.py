@@ -0,0 +1,333 @@
+"""
+Queue-dispatched tool workers for the AzureFunctionTool pattern.
+
+The Agents service puts every call of an Azure Function tool on the input queue of the tool as
+{"<argument>": ..., "CorrelationId": "..."} and waits for {"Value": "...", "CorrelationId": "..."}
+on the output queue. Tools are registered by name in a ToolRegistry; a ToolWorker executes the
+calls, either from queue triggers (function_app.py, which scales out across Function instances
+with the queue length) or by polling the queues itself (any process, e.g. against Azurite).
+
+Within a worker, concurrent calls of the same tool with the same arguments are executed once and
+answered under every correlation ID, and calls of tools with a batch function are grouped for a
+short window and executed together.
+"""
+import json
+import base64
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional
+
+OUTPUT_QUEUE_NAME = "output"
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+
+class WorkerTool(NamedTuple):
+    """A function tool served through queues."""
+
+    name: str
+    function: Callable[..., str]
+    description: str
+    parameters: Dict[str, Any]
+    input_queue: str
+    # Executes several calls at once: receives a list of argument dicts, returns one result per call
+    batch: Optional[Callable[[List[Dict[str, Any]]], List[str]]] = None
+    # Calls with the same key can be batched together
+    batch_key: Optional[Callable[[Dict[str, Any]], Hashable]] = None
+
+
+def _parameters_schema(function: Callable) -> Dict[str, Any]:
+    """JSON schema of the parameters of a function, from its signature and its ":param" docstring lines."""
+    docstring = inspect.getdoc(function) or ""
+    descriptions = {}
+    for line in docstring.splitlines():
+        line = line.strip()
+        if line.startswith(":param ") and ":" in line[7:]:
+            name, _, description = line[7:].partition(":")
+            descriptions[name.strip().split(" ")[-1]] = description.strip()
+
+    properties, required = {}, []
+    for name, parameter in inspect.signature(function).parameters.items():
+        schema = {"type": _JSON_TYPES.get(parameter.annotation, "string")}
+        if name in descriptions:
+            schema["description"] = descriptions[name]
+        properties[name] = schema
+        if parameter.default is inspect.Parameter.empty:
+            required.append(name)
+    return {"type": "object", "properties": properties, "required": required}
+
+
+class ToolRegistry:
+    """Tools served by the workers, by name."""
+
+    def __init__(self):
+        self._tools: Dict[str, WorkerTool] = {}
+
+    def register(
+        self,
+        name: Optional[str] = None,
+        input_queue: Optional[str] = None,
+        batch: Optional[Callable[[List[Dict[str, Any]]], List[str]]] = None,
+        batch_key: Optional[Callable[[Dict[str, Any]], Hashable]] = None,
+    ) -> Callable[[Callable[..., str]], Callable[..., str]]:
+        """
+        Decorator that registers a function as a tool. The description and parameters come from
+        its docstring and signature; the input queue defaults to "<name>-input" (queue names
+        only allow lowercase letters, digits and dashes).
+        """
+        def decorator(function: Callable[..., str]) -> Callable[..., str]:
+            tool_name = name or function.__name__
+            docstring = inspect.getdoc(function) or ""
+            self._tools[tool_name] = WorkerTool(
+                name=tool_name,
+                function=function,
+                description=docstring.split("\n\n")[0].replace("\n", " "),
+                parameters=_parameters_schema(function),
+                input_queue=input_queue or tool_name.lower().replace("_", "-") + "-input",
+                batch=batch,
+                batch_key=batch_key or (lambda arguments: None),
+            )
+            return function
+
+        return decorator
+
+    def get(self, name: str) -> WorkerTool:
+        return self._tools[name]
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    def definitions(self, storage_service_endpoint: str, output_queue: str = OUTPUT_QUEUE_NAME) -> List[Any]:
+        """AzureFunctionTool definitions of every registered tool, to create an agent that calls them."""
+        from azure.ai.agents.models import AzureFunctionStorageQueue, AzureFunctionTool
+
+        definitions = []
+        for tool in self:
+            definitions.extend(AzureFunctionTool(
+                name=tool.name,
+                description=tool.description,
+                parameters=tool.parameters,
+                input_queue=AzureFunctionStorageQueue(queue_name=tool.input_queue, storage_service_endpoint=storage_service_endpoint),
+                output_queue=AzureFunctionStorageQueue(queue_name=output_queue, storage_service_endpoint=storage_service_endpoint),
+            ).definitions)
+        return definitions
+
+
+class QueueMessage(NamedTuple):
+    id: str
+    pop_receipt: str
+    content: str
+    dequeue_count: int
+
+
+class InMemoryQueue:
+    """Local stand-in for a Storage queue, with visibility timeouts and dequeue counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._messages: deque = deque()
+        self._counter = 0
+
+    def send_message(self, content: str) -> None:
+        with self._lock:
+            self._counter += 1
+            self._messages.append({"id": str(self._counter), "content": content, "visible_at": 0.0, "dequeue_count": 0, "pop_receipt": ""})
+
+    def receive_messages(self, max_messages: int = 32, visibility_timeout: int = 30) -> List[QueueMessage]:
+        now = time.monotonic()
+        received = []
+        with self._lock:
+            for message in self._messages:
+                if len(received) == max_messages:
+                    break
+                if message["visible_at"] <= now:
+                    message["visible_at"] = now + visibility_timeout
+                    message["dequeue_count"] += 1
+                    message["pop_receipt"] = f"{message['id']}-{message['dequeue_count']}"
+                    received.append(QueueMessage(message["id"], message["pop_receipt"], message["content"], message["dequeue_count"]))
+        return received
+
+    def delete_message(self, message: QueueMessage) -> None:
+        with self._lock:
+            self._messages = deque(m for m in self._messages if not (m["id"] == message.id and m["pop_receipt"] == message.pop_receipt))
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+class StorageQueue:
+    """
+    Azure Storage queue (or Azurite, with connection string "UseDevelopmentStorage=true").
+    Messages are base64 encoded, like the Functions host does with "messageEncoding": "base64".
+    """
+
+    def __init__(self, connection_string: str, queue_name: str):
+        from azure.storage.queue import QueueClient, TextBase64DecodePolicy, TextBase64EncodePolicy
+
+        self._client = QueueClient.from_connection_string(
+            connection_string, queue_name,
+            message_encode_policy=TextBase64EncodePolicy(), message_decode_policy=TextBase64DecodePolicy(),
+        )
+        try:
+            self._client.create_queue()
+        except Exception:
+            pass  # Already exists
+
+    def send_message(self, content: str) -> None:
+        self._client.send_message(content)
+
+    def receive_messages(self, max_messages: int = 32, visibility_timeout: int = 30) -> List[QueueMessage]:
+        pages = self._client.receive_messages(messages_per_page=max_messages, visibility_timeout=visibility_timeout, max_messages=max_messages)
+        return [QueueMessage(m.id, m.pop_receipt, m.content, m.dequeue_count) for m in pages]
+
+    def delete_message(self, message: QueueMessage) -> None:
+        self._client.delete_message(message.id, message.pop_receipt)
+
+
+def decode_body(body: Any) -> Dict[str, Any]:
+    """Parses a queue message body, which may be raw or base64 encoded JSON."""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    try:
+        return json.loads(body)
+    except ValueError:
+        return json.loads(base64.b64decode(body).decode("utf-8"))
+
+
+class ToolWorker:
+    """
+    Executes tool calls with in-flight deduplication and micro-batching.
+
+    :param registry: Tools that can be called.
+    :param max_workers: Threads executing tool calls and batches.
+    :param batch_window: Seconds a batchable call waits for other compatible calls.
+    :param max_batch_size: A batch is executed as soon as it has this many calls.
+    """
+
+    def __init__(self, registry: ToolRegistry, max_workers: int = 8, batch_window: float = 0.05, max_batch_size: int = 16):
+        self.registry = registry
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-worker")
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._pending: Dict[Hashable, List[tuple]] = {}
+        self._stats = {"calls": 0, "deduplicated": 0, "executions": 0, "batches": 0, "errors": 0}
+
+    def call(self, tool_name: str, arguments: Dict[str, Any]) -> Future:
+        """
+        Schedules a tool call; a call with the same arguments as one in flight shares its result.
+
+        :return: Future with the result of the tool (a string, a JSON error if the tool failed).
+        """
+        tool = self.registry.get(tool_name)
+        key = (tool_name, json.dumps(arguments, sort_keys=True))
+        with self._lock:
+            self._stats["calls"] += 1
+            if key in self._in_flight:
+                self._stats["deduplicated"] += 1
+                return self._in_flight[key]
+            future: Future = Future()
+            self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+
+        if tool.batch is None:
+            self._executor.submit(self._run, tool, [(arguments, future)])
+            return future
+
+        group = (tool_name, tool.batch_key(arguments))
+        with self._lock:
+            calls = self._pending.setdefault(group, [])
+            calls.append((arguments, future))
+            full = len(calls) >= self.max_batch_size
+            first = len(calls) == 1
+        if full:
+            self._flush(group)
+        elif first:
+            timer = threading.Timer(self.batch_window, self._flush, args=(group,))
+            timer.daemon = True
+            timer.start()
+        return future
+
+    def _forget(self, key: Hashable) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _flush(self, group: Hashable) -> None:
+        with self._lock:
+            calls = self._pending.pop(group, None)
+        if calls:
+            self._executor.submit(self._run, self.registry.get(group[0]), calls)
+
+    def _run(self, tool: WorkerTool, calls: List[tuple]) -> None:
+        with self._lock:
+            self._stats["executions"] += 1
+            if tool.batch is not None:
+                self._stats["batches"] += 1
+        try:
+            if tool.batch is not None:
+                results = tool.batch([arguments for arguments, _ in calls])
+            else:
+                results = [tool.function(**calls[0][0])]
+            if len(results) != len(calls):
+                raise ValueError(f"Batch returned {len(results)} results for {len(calls)} calls")
+        except Exception as e:
+            logging.exception(f"Tool {tool.name} failed")
+            with self._lock:
+                self._stats["errors"] += 1
+            results = [json.dumps({"error": f"{type(e).__name__}: {e}"})] * len(calls)
+        for (_, future), result in zip(calls, results):
+            future.set_result(result)
+
+    def handle(self, tool_name: str, body: Any, timeout: Optional[float] = None) -> str:
+        """
+        Answers one queue message of a tool (queue trigger mode).
+
+        :return: JSON reply for the output queue, with the correlation ID of the call.
+        """
+        arguments = decode_body(body)
+        correlation_id = arguments.pop("CorrelationId", None)
+        value = self.call(tool_name, arguments).result(timeout)
+        return json.dumps({"Value": value, "CorrelationId": correlation_id})
+
+    def poll(self, input_queues: Dict[str, Any], output_queue: Any, max_messages: int = 32, visibility_timeout: int = 60) -> int:
+        """
+        Receives the waiting messages of every tool queue (polling mode), executes them together
+        so duplicates and batches span all of them, replies and deletes them.
+
+        :param input_queues: Queue of every tool, by tool name.
+        :return: Number of messages processed.
+        """
+        received = []
+        for tool_name, queue in input_queues.items():
+            for message in queue.receive_messages(max_messages=max_messages, visibility_timeout=visibility_timeout):
+                try:
+                    arguments = decode_body(message.content)
+                except ValueError:
+                    logging.error(f"Dropping malformed message {message.id} of {tool_name}")
+                    queue.delete_message(message)
+                    continue
+                correlation_id = arguments.pop("CorrelationId", None)
+                received.append((queue, message, correlation_id, self.call(tool_name, arguments)))
+
+        for queue, message, correlation_id, future in received:
+            output_queue.send_message(json.dumps({"Value": future.result(), "CorrelationId": correlation_id}))
+            queue.delete_message(message)
+        return len(received)
+
+    def run_forever(self, input_queues: Dict[str, Any], output_queue: Any, idle_sleep: float = 1.0) -> None:
+        """Polls the queues until interrupted; several processes can poll the same queues to scale out."""
+        while True:
+            if not self.poll(input_queues, output_queue):
+                time.sleep(idle_sleep)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,112 @@
+"""
+Function tools served by the queue workers (see tool_workers.py): the vector search of success
+stories in Postgres, the Azure Retail Prices lookup and the search of the documentation index
+(docs_index.py, copied from the repository root by sync_function_modules.py).
+"""
+import os
+import json
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import requests
+from sqlalchemy import create_engine, text
+
+from tool_workers import ToolRegistry
+from tool_telemetry import traced_tool
+from docs_index import DOCS_SEARCH_INPUT_QUEUE, search_architecture_docs
+
+registry = ToolRegistry()
+
+# Grounds the WAF and reference architecture agents, also when the orchestrator calls them as connected agents
+registry.register(input_queue=DOCS_SEARCH_INPUT_QUEUE)(search_architecture_docs)
+
+RETAIL_PRICES_URL = "https://prices.azure.com/api/retail/prices"
+RETAIL_PRICES_MAX_PAGES = int(os.getenv("RETAIL_PRICES_MAX_PAGES", "10"))
+# Postgres cancels queries running longer than this, so a stuck query does not hold a worker thread
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "20000"))
+_PRICE_FIELDS = ("productName", "skuName", "meterName", "armRegionName", "unitPrice", "unitOfMeasure", "type",
+                 "currencyCode", "productId", "skuId", "meterId", "armSkuName")
+
+# One embedding per query, then the nearest stories of each query. Several queries are answered by a single statement
+_VECTOR_SEARCH_SQL = text("""
+SELECT q.ord - 1 AS call_index, s.story_id, s.story_title, s.business_goal, s.similarity
+FROM unnest(CAST(:queries AS text[])) WITH ORDINALITY AS q(query, ord)
+CROSS JOIN LATERAL (
+    SELECT azure_openai.create_embeddings('text-embedding-ada-002', q.query)::vector AS embedding
+) e
+CROSS JOIN LATERAL (
+    SELECT story_id, story_title, business_goal, embedding_desc <=> e.embedding AS similarity
+    FROM kwbase.success_stories
+    ORDER BY similarity
+    LIMIT :limit
+) s
+ORDER BY call_index, s.similarity
+""")
+
+
+@lru_cache(maxsize=1)
+def _engine():
+    # One connection pool per worker instance
+    return create_engine(
+        os.environ["AZURE_PG_CONNECTION"], pool_size=5, pool_pre_ping=True,
+        connect_args={"options": f"-c statement_timeout={PG_STATEMENT_TIMEOUT_MS}"},
+    )
+
+
+@lru_cache(maxsize=1)
+def _session() -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=16))
+    return session
+
+
+@traced_tool
+def vector_search_batch(calls: List[Dict[str, Any]]) -> List[str]:
+    """Runs the vector searches of several calls with the same limit in a single query."""
+    queries = [call["vector_search_query"] for call in calls]
+    limit = int(calls[0].get("limit", 10))
+    results: List[List[Dict[str, Any]]] = [[] for _ in calls]
+    with _engine().connect() as connection:
+        for row in connection.execute(_VECTOR_SEARCH_SQL, {"queries": queries, "limit": limit}).mappings():
+            story = dict(row)
+            results[story.pop("call_index")].append(story)
+    return [json.dumps(stories, default=str) for stories in results]
+
+
+@registry.register(batch=vector_search_batch, batch_key=lambda arguments: int(arguments.get("limit", 10)))
+def vector_search_success_stories(vector_search_query: str, limit: int = 10) -> str:
+    """
+    Fetches the success stories of implementations of AI projects in Azure that are most similar to a query.
+
+    :param vector_search_query: Description of the use case or industry to look for.
+    :param limit: Number of success stories to return.
+    """
+    return vector_search_batch([{"vector_search_query": vector_search_query, "limit": limit}])[0]
+
+
+@registry.register()
+@traced_tool
+def get_azure_retail_prices(filter: str, currency_code: str = "USD") -> str:
+    """
+    Gets Azure retail prices from the Azure Retail Prices API, following the result pages.
+
+    :param filter: OData filter, e.g. "serviceName eq 'Azure AI Search' and armRegionName eq 'eastus' and skuName eq 'Standard S1'".
+    :param currency_code: Currency of the prices.
+    """
+    params = {"$filter": filter, "currencyCode": currency_code}
+    response = _session().get(RETAIL_PRICES_URL, params=params, timeout=30)
+    query = response.url
+    items, pages = [], 0
+    while True:
+        response.raise_for_status()
+        page = response.json()
+        pages += 1
+        items.extend({field: item.get(field) for field in _PRICE_FIELDS} for item in page.get("Items", []))
+        next_page = page.get("NextPageLink")
+        if not next_page or pages >= RETAIL_PRICES_MAX_PAGES:
+            break
+        response = _session().get(next_page, timeout=30)
+    result = {"query": query, "items": items, "pages": pages}
+    if next_page:
+        result["nextPageLink"] = next_page
+    return json.dumps(result)
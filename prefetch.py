@@ -0,0 +1,260 @@
+import os
+import re
+import time
+import inspect
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Set, Tuple
+from azure_services import find_service_types
+
+# Off by default: it only pays off where the retrieval tools run in-process (agents run with a
+# tool_executor); the connected agents of the orchestrator call them in the Agent Service
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+# Seconds a prefetched result can be read by the tools of the request that started it
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL_SECONDS", "120"))
+PREFETCH_MAX_WORKERS = int(os.getenv("PREFETCH_MAX_WORKERS", "4"))
+# Tools that are prefetched, by name (all the registered ones if empty)
+PREFETCH_TOOLS = [name.strip() for name in os.getenv("PREFETCH_TOOLS", "").split(",") if name.strip()]
+# Share of the terms of a tool query that must appear in the message a prefetch was planned for,
+# for the tool to read the prefetched result
+PREFETCH_MIN_QUERY_OVERLAP = float(os.getenv("PREFETCH_MIN_QUERY_OVERLAP", "0.8"))
+
+
+# Use cases and industries that, with the services, identify what a retrieval is about
+TOPICS = (
+    "rag", "retrieval", "chatbot", "copilot", "agent", "call center", "contact center", "customer service",
+    "document processing", "knowledge mining", "summarization", "translation", "recommendation", "fraud",
+    "forecasting", "computer vision", "healthcare", "retail", "banking", "finance", "insurance",
+    "manufacturing", "education", "government", "energy", "telecom", "legal",
+)
+_TOPIC_PATTERN = re.compile(r"\b(" + "|".join(re.escape(topic) for topic in TOPICS) + r")s?\b")
+
+
+# Words that do not tell two questions apart, including those the agents add to their retrieval queries
+_STOPWORDS = frozenset("""
+a an and are as at be by can do for from how i in is it my of on or our so that the this to use using we what which
+with without azure microsoft solution solutions architecture architectures reference success story stories case cases
+customer customers example examples need needs want project projects implementation implementations
+""".split())
+_TERM = re.compile(r"[a-z0-9]+")
+
+
+def query_terms(text: str) -> Set[str]:
+    """Words of a query that tell what it is about."""
+    return {term for term in _TERM.findall(text.lower()) if term not in _STOPWORDS}
+
+
+def query_overlap(query: str, text: str) -> float:
+    """Share of the terms of a tool query that appear in a text (1.0 for a query without terms)."""
+    terms = query_terms(query)
+    return len(terms & query_terms(text)) / len(terms) if terms else 1.0
+
+
+def same_query(argument: str, min_overlap: Optional[float] = None) -> Callable[[Dict[str, Any], Dict[str, Any]], bool]:
+    """
+    Match check of a prefetch tool: the query of the call must be about the message the
+    prefetch was planned for, not only share its services and topics.
+
+    :param argument: Name of the query argument of the tool.
+    :param min_overlap: Share of the terms of the query that must appear in the planned query, defaults to PREFETCH_MIN_QUERY_OVERLAP.
+    """
+    threshold = PREFETCH_MIN_QUERY_OVERLAP if min_overlap is None else min_overlap
+    return lambda planned, call: query_overlap(call[argument], planned[argument]) >= threshold
+
+
+def topic_key(text: str) -> Tuple[str, ...]:
+    """
+    Services and topics a text is about, as a lookup key: the query the agent sends for a
+    retrieval rarely equals the user message, but it names the same services and use case.
+    """
+    services = set(find_service_types(text))
+    topics = set(_TOPIC_PATTERN.findall(text.lower()))
+    return tuple(sorted(services | topics))
+
+
+class PrefetchTool(NamedTuple):
+    """A tool whose calls can be started before the agent asks for them."""
+
+    name: str
+    function: Callable[..., Any]
+    # Lookup key of the arguments of a call (None if the call cannot be served from a prefetch)
+    key: Callable[[Dict[str, Any]], Optional[Hashable]]
+    # Arguments of the calls to prefetch for a user message
+    plan: Callable[[str], List[Dict[str, Any]]]
+    # Whether a prefetched call (first argument) can answer a call with the same key (second one)
+    match: Optional[Callable[[Dict[str, Any], Dict[str, Any]], bool]] = None
+
+
+class _Entry:
+    def __init__(self, tool: str, call: Dict[str, Any], future: Future):
+        self.tool = tool
+        self.call = call
+        self.future = future
+        self.created = time.monotonic()
+        self.owners: Set[str] = set()
+        self.used = False
+
+
+class Prefetcher:
+    """
+    Speculative prefetch of retrievals while the orchestrator plans.
+
+    As soon as a user message arrives, start() extracts the services it mentions and starts
+    the calls that the registered tools plan for it (success stories, prices, documentation) in
+    the background. Tools decorated with @prefetcher.tool look up a prefetched call with the
+    same key first, waiting for it if it is still running, and otherwise execute as usual. The
+    key groups calls about the same services and topics; a tool with a match check only reads a
+    prefetch whose planned arguments also pass it, so different questions do not share results.
+    finish() ends the request: prefetches that did not start are cancelled and those never
+    read are counted as unused, so the plans can be tuned on the hit rate.
+
+    :param max_workers: Threads running prefetches.
+    :param ttl: Seconds a prefetched result stays readable.
+    :param enabled_tools: Names of the tools to prefetch, all registered tools if empty.
+    :param enabled: If False, start() does nothing and the tools always execute.
+    """
+
+    def __init__(
+        self, max_workers: int = PREFETCH_MAX_WORKERS, ttl: float = PREFETCH_TTL, enabled_tools: Optional[List[str]] = None, enabled: bool = PREFETCH_ENABLED,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.enabled_tools = set(enabled_tools or PREFETCH_TOOLS)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._tools: Dict[str, PrefetchTool] = {}
+        self._entries: Dict[Tuple[str, Hashable], _Entry] = {}
+        self._requests: Dict[str, List[Tuple[str, Hashable]]] = {}
+        self._metrics = {
+            "started": 0, "hits": 0, "misses": 0, "mismatches": 0, "waited_hits": 0, "cancelled": 0, "unused": 0, "expired": 0,
+        }
+
+    def tool(
+        self,
+        key: Callable[[Dict[str, Any]], Optional[Hashable]],
+        plan: Callable[[str], List[Dict[str, Any]]],
+        match: Optional[Callable[[Dict[str, Any], Dict[str, Any]], bool]] = None,
+    ):
+        """
+        Decorator that registers a tool for prefetching and makes it read the prefetched calls first.
+
+        :param key: Lookup key of the arguments of a call; calls with the same key can share the result.
+        :param plan: Arguments of the calls to prefetch for a user message.
+        :param match: Checks that a prefetched call (planned arguments, call arguments) answers the call, e.g. same_query("query").
+        """
+        def decorator(function: Callable[..., Any]) -> Callable[..., Any]:
+            signature = inspect.signature(function)
+            name = function.__name__
+
+            def arguments(args, kwargs) -> Dict[str, Any]:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                return dict(bound.arguments)
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                call = arguments(args, kwargs)
+                entry_key = key(call)
+                future = self._lookup(name, entry_key, call) if entry_key is not None else None
+                if future is not None:
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        print(f"Prefetch of {name} failed, calling it again: {e}")
+                return function(*args, **kwargs)
+
+            self._tools[name] = PrefetchTool(name, function, lambda call: key(arguments((), call)), plan, match)
+            return wrapper
+
+        return decorator
+
+    def _lookup(self, name: str, entry_key: Hashable, call: Dict[str, Any]) -> Optional[Future]:
+        match = self._tools[name].match
+        with self._lock:
+            entry = self._entries.get((name, entry_key))
+            if entry is None or entry.future.cancelled() or time.monotonic() - entry.created > self.ttl:
+                self._metrics["misses"] += 1
+                return None
+            if match is not None and not match(entry.call, call):
+                self._metrics["misses"] += 1
+                self._metrics["mismatches"] += 1
+                return None
+            entry.used = True
+            self._metrics["hits"] += 1
+            if not entry.future.done():
+                self._metrics["waited_hits"] += 1
+            return entry.future
+
+    def start(self, request_id: str, text: str) -> int:
+        """
+        Starts the prefetches planned for a user message.
+
+        :param request_id: ID of the request, passed to finish() once the answer is complete.
+        :return: Number of prefetches started (calls already in flight for another request are shared).
+        """
+        if not self.enabled:
+            return 0
+        self._expire()
+        started = 0
+        for tool in list(self._tools.values()):
+            if self.enabled_tools and tool.name not in self.enabled_tools:
+                continue
+            for call in tool.plan(text):
+                entry_key = tool.key(call)
+                if entry_key is None:
+                    continue
+                with self._lock:
+                    entry = self._entries.get((tool.name, entry_key))
+                    if entry is None:
+                        entry = _Entry(tool.name, call, self._pool.submit(tool.function, **call))
+                        self._entries[(tool.name, entry_key)] = entry
+                        self._metrics["started"] += 1
+                        started += 1
+                    if request_id not in entry.owners:
+                        entry.owners.add(request_id)
+                        self._requests.setdefault(request_id, []).append((tool.name, entry_key))
+        return started
+
+    def _drop(self, entry_key: Tuple[str, Hashable], entry: _Entry, reason: str) -> None:
+        # Called with the lock held
+        self._entries.pop(entry_key, None)
+        if entry.used:
+            return
+        if entry.future.cancel():
+            self._metrics["cancelled"] += 1
+        else:
+            self._metrics[reason] += 1
+
+    def finish(self, request_id: str) -> None:
+        """Ends a request: its prefetches that no other request shares are cancelled or counted as unused."""
+        with self._lock:
+            for entry_key in self._requests.pop(request_id, []):
+                entry = self._entries.get(entry_key)
+                if entry is None:
+                    continue
+                entry.owners.discard(request_id)
+                if not entry.owners:
+                    self._drop(entry_key, entry, "unused")
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for entry_key, entry in list(self._entries.items()):
+                if now - entry.created > self.ttl:
+                    self._drop(entry_key, entry, "expired")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters and hit rate (share of the started prefetches read by a tool)."""
+        with self._lock:
+            metrics = dict(self._metrics, in_flight=len(self._entries))
+        finished = metrics["started"] - metrics["in_flight"]
+        metrics["hit_rate"] = round(1 - (metrics["cancelled"] + metrics["unused"] + metrics["expired"]) / finished, 3) if finished else None
+        return metrics
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared by all the sessions of the process
+prefetcher = Prefetcher()
@@ -0,0 +1,277 @@
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# SQLite database with the conversation state of the Chainlit sessions
+STATE_STORE_PATH = os.getenv("STATE_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "state_store.db"))
+# Seconds between two writes of the pending changes to the database
+FLUSH_INTERVAL = float(os.getenv("STATE_STORE_FLUSH_SECONDS", "1.0"))
+
+# (user identifier, session key) of a conversation
+SessionKey = Tuple[str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT NOT NULL,
+    session_key TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    agent_id TEXT,
+    thread_tokens INTEGER NOT NULL DEFAULT 0,
+    thread_messages INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, session_key)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    user_id TEXT NOT NULL,
+    session_key TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (user_id, session_key, created_at);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT,
+    user_id TEXT NOT NULL,
+    session_key TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    agent_id TEXT,
+    status TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    seconds REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_session ON runs (user_id, session_key, created_at);
+CREATE TABLE IF NOT EXISTS image_uploads (
+    endpoint TEXT NOT NULL,
+    token_budget INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    dhash TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (endpoint, token_budget, sha256)
+);
+"""
+
+
+class SessionState(NamedTuple):
+    """Thread of a conversation and the size of the thread the last time it was saved."""
+
+    thread_id: str
+    agent_id: Optional[str]
+    thread_tokens: int
+    thread_messages: int
+
+
+class StoredMessage(NamedTuple):
+    role: str
+    content: str
+    thread_id: str
+    created_at: float
+
+
+class StateStore:
+    """
+    Local persistent state of the conversations: the thread of every (user, session), the run
+    metadata and the messages of each turn, so a conversation can be resumed or rendered after
+    a restart without reading it back from the Agents service.
+
+    Writes go to an in-memory cache and are written to SQLite by a background thread every
+    flush_interval seconds (write-behind), so a turn never waits for the disk. Reads are served
+    from the cache, falling back to the database for sessions not loaded yet.
+
+    :param path: SQLite database file (":memory:" for a store that is not persisted).
+    :param flush_interval: Seconds between two writes of the pending changes.
+    """
+
+    def __init__(self, path: str = STATE_STORE_PATH, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Serializes the use of the connection (writer thread and reads of the callers)
+        self._db_lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._sessions: Dict[SessionKey, SessionState] = {}
+        self._messages: Dict[SessionKey, List[StoredMessage]] = {}
+        self._pending: List[Tuple[str, tuple]] = []
+        self._metrics = {"cache_hits": 0, "db_reads": 0, "writes": 0, "flushes": 0}
+        self._closed = threading.Event()
+        self._writer = threading.Thread(target=self._write_behind, name="state-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _write_behind(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Could not write the conversation state: {e}")
+
+    def _enqueue(self, sql: str, params: tuple) -> None:
+        with self._lock:
+            self._pending.append((sql, params))
+            self._metrics["writes"] += 1
+
+    def flush(self) -> None:
+        """Writes the pending changes to the database in one transaction."""
+        with self._db_lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        # Called with _db_lock held: the batches are taken and committed in the order they were
+        # enqueued, so an older upsert never overwrites a newer one
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with self._connection:
+            for sql, params in pending:
+                self._connection.execute(sql, params)
+        with self._lock:
+            self._metrics["flushes"] += 1
+
+    def _read(self, sql: str, params: tuple) -> List[tuple]:
+        with self._db_lock:
+            # Pending changes are written first, so the database is up to date
+            self._flush_locked()
+            rows = self._connection.execute(sql, params).fetchall()
+        with self._lock:
+            self._metrics["db_reads"] += 1
+        return rows
+
+    def get_session(self, key: SessionKey) -> Optional[SessionState]:
+        """Thread of a conversation, or None if the conversation is new."""
+        with self._lock:
+            state = self._sessions.get(key)
+            if state is not None:
+                self._metrics["cache_hits"] += 1
+                return state
+        rows = self._read(
+            "SELECT thread_id, agent_id, thread_tokens, thread_messages FROM sessions WHERE user_id = ? AND session_key = ?", key
+        )
+        if not rows:
+            return None
+        state = SessionState(*rows[0])
+        with self._lock:
+            return self._sessions.setdefault(key, state)
+
+    def save_session(self, key: SessionKey, thread_id: str, agent_id: Optional[str] = None, thread_tokens: int = 0, thread_messages: int = 0) -> None:
+        """Saves the thread of a conversation (a new one, or the thread that replaced it after a compaction)."""
+        now = time.time()
+        with self._lock:
+            self._sessions[key] = SessionState(thread_id, agent_id, thread_tokens, thread_messages)
+        self._enqueue(
+            "INSERT INTO sessions (user_id, session_key, thread_id, agent_id, thread_tokens, thread_messages, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, session_key) DO UPDATE SET "
+            "thread_id = excluded.thread_id, agent_id = excluded.agent_id, thread_tokens = excluded.thread_tokens, "
+            "thread_messages = excluded.thread_messages, updated_at = excluded.updated_at",
+            (key[0], key[1], thread_id, agent_id, thread_tokens, thread_messages, now, now),
+        )
+
+    def messages(self, key: SessionKey) -> List[StoredMessage]:
+        """Every message of a conversation, oldest first, across the threads that replaced each other."""
+        with self._lock:
+            messages = self._messages.get(key)
+            if messages is not None:
+                self._metrics["cache_hits"] += 1
+                return list(messages)
+        rows = self._read(
+            "SELECT role, content, thread_id, created_at FROM messages WHERE user_id = ? AND session_key = ? ORDER BY created_at, rowid", key
+        )
+        with self._lock:
+            return list(self._messages.setdefault(key, [StoredMessage(*row) for row in rows]))
+
+    def last_answer(self, key: SessionKey) -> Optional[str]:
+        """Last agent message of a conversation."""
+        for message in reversed(self.messages(key)):
+            if message.role == "assistant":
+                return message.content
+        return None
+
+    def _add_message(self, key: SessionKey, message: StoredMessage) -> None:
+        with self._lock:
+            if key in self._messages:
+                self._messages[key].append(message)
+        self._enqueue(
+            "INSERT INTO messages (user_id, session_key, role, content, thread_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (key[0], key[1], *message),
+        )
+
+    def record_turn(self, key: SessionKey, thread_id: str, agent_id: Optional[str], content: str, answer: str, run: Any = None, seconds: Optional[float] = None) -> None:
+        """
+        Records one turn of a conversation: the user message, the final agent answer and the run metadata.
+
+        :param run: ThreadRun of the turn, if there was one (its ID, status and usage are kept).
+        :param seconds: Duration of the turn.
+        """
+        now = time.time()
+        self._add_message(key, StoredMessage("user", content, thread_id, now))
+        self._add_message(key, StoredMessage("assistant", answer, thread_id, now))
+        usage = getattr(run, "usage", None)
+        status = getattr(run, "status", None)
+        self._enqueue(
+            "INSERT INTO runs (run_id, user_id, session_key, thread_id, agent_id, status, prompt_tokens, completion_tokens, seconds, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                getattr(run, "id", None), key[0], key[1], thread_id, agent_id, getattr(status, "value", status),
+                getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None), seconds, now,
+            ),
+        )
+
+    def runs(self, key: SessionKey) -> List[Dict[str, Any]]:
+        """Metadata of the runs of a conversation, oldest first."""
+        rows = self._read(
+            "SELECT run_id, thread_id, agent_id, status, prompt_tokens, completion_tokens, seconds, created_at "
+            "FROM runs WHERE user_id = ? AND session_key = ? ORDER BY created_at, rowid", key
+        )
+        fields = ("run_id", "thread_id", "agent_id", "status", "prompt_tokens", "completion_tokens", "seconds", "created_at")
+        return [dict(zip(fields, row)) for row in rows]
+
+    def image_files(self, endpoint: str, token_budget: int) -> List[Tuple[str, str, str, int]]:
+        """
+        (sha256, dhash, file ID, vision tokens) of the images uploaded to a project with a token budget, shared by all the sessions.
+
+        :param endpoint: Endpoint of the project the files were uploaded to.
+        :param token_budget: Vision token budget the images were prepared for.
+        """
+        return self._read(
+            "SELECT sha256, dhash, file_id, tokens FROM image_uploads WHERE endpoint = ? AND token_budget = ? ORDER BY created_at",
+            (endpoint, token_budget),
+        )
+
+    def save_image_file(self, endpoint: str, token_budget: int, sha256: str, dhash: str, file_id: str, tokens: int) -> None:
+        self._enqueue(
+            "INSERT OR REPLACE INTO image_uploads (endpoint, token_budget, sha256, dhash, file_id, tokens, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (endpoint, token_budget, sha256, dhash, file_id, tokens, time.time()),
+        )
+
+    def delete_image_file(self, endpoint: str, file_id: str) -> None:
+        """Forgets an uploaded file that the project no longer has."""
+        self._enqueue("DELETE FROM image_uploads WHERE endpoint = ? AND file_id = ?", (endpoint, file_id))
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._metrics, pending=len(self._pending), cached_sessions=len(self._sessions))
+
+    def close(self) -> None:
+        """Writes the pending changes and stops the writer thread."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._writer.join()
+        self.flush()
+        with self._db_lock:
+            self._connection.close()
+
+
+# Shared by all the sessions of the process
+state_store = StateStore()
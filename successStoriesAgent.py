@@ -1,11 +1,14 @@
 # %%
 import os
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
 from azure.ai.agents.models import FunctionTool,ToolSet
 from datetime import datetime
 from pg_agent_tools import user_functions
+from tool_executor import ConcurrentToolExecutor
+from agent_session import run_task
 from dotenv import load_dotenv
+from azure_clients import get_project_client
+from model_router import all_of, confident, router
+from output_contract import response_format, validator
 # Load environment variables
 load_dotenv(".env")
 
@@ -14,30 +17,30 @@ load_dotenv(".env")
 # Customers need to login to Azure subscription via Azure CLI and set the environment variables
 project_endpoint = os.getenv("AZURE_AI_AGENT_ENDPOINT")  # Ensure the PROJECT_ENDPOINT environment variable is set
 
-# Create an AIProjectClient instance
-project_client = AIProjectClient(
-    endpoint=project_endpoint,
-    credential=DefaultAzureCredential(),  # Use Azure Default Credential for authentication
-)
+# Get the shared AIProjectClient instance (credential, tokens and connections are reused)
+project_client = get_project_client(project_endpoint)
 
 # Initialize agent toolset with user functions
 functions = FunctionTool(user_functions)
 toolset = ToolSet()
 toolset.add(functions)
 
-project_client.agents.enable_auto_function_calls(toolset)
+# Tool calls of the same run step are executed concurrently; at most 4 database queries at a time
+tool_executor = ConcurrentToolExecutor(user_functions, concurrency_limits={"vector_search_success_stories": 4})
 
 agent = project_client.agents.create_agent(
-    model= os.getenv("AZURE_AI_AGENT_MODEL_DEPLOYMENT_NAME"), 
+    model=router.deployment_for_agent("success_stories"), 
     name=f"Success stories agent",
     description="Success stories expert Agent", 
     instructions=f"""
     You are an expert Azure architect specialized in artificial intelligence solutions. Your role is to receive a business requirement and determine if there is any success story that can be helpful to provide information,
     for example to provide a related business goal, technology solution and which products ( Azure services ) were key to implement the solution.
     The success stories are stored in a Postgres database, you can use the provided tools to get accurate and up-to-date information.
-    
+    Answer with the successStories JSON object, one item per relevant story.
     """, 
-    toolset=toolset
+    toolset=toolset,
+    # Compact JSON section of the Output Contract, merged by the app without another model pass
+    response_format=response_format("successStories"),
 )
 print(f"Created agent, ID: {agent.id}")
 
@@ -45,22 +48,19 @@ print(f"Created agent, ID: {agent.id}")
 thread = project_client.agents.threads.create()
 print(f"Created thread, ID: {thread.id}")
 
-# Create a message to thread
-message = project_client.agents.messages.create(
-    thread_id=thread.id,
-    role="user",
-    content="I need to build an AI solution for a call center, I need to be able to perform knowledge mining and be able to answer questions about it, can you provide me with any success stories that could be helpful?",
+# Send a message to the thread and run the agent with tools: the summary runs on the small tier
+# and is answered again on the large one if it does not pass the confidence check
+answer = run_task(
+    project_client,
+    thread.id,
+    agent.id,
+    "I need to build an AI solution for a call center, I need to be able to perform knowledge mining and be able to answer questions about it, can you provide me with any success stories that could be helpful?",
+    task="success_story_summary",
+    validate=all_of(validator("successStories"), confident),
+    tool_executor=tool_executor,
 )
-
-print(f"Created message, ID: {message.id}")
-
-
-
-from pprint import pprint
-
-# Create and process an agent run in the thread with tools
-run = project_client.agents.runs.create_and_process(thread_id=thread.id, agent_id=agent.id)
-print(f"Run finished with status: {run.status}")
+print(f"Answer: {answer}")
+print(f"Model tiers: {router.report()}")
 
 # Fetch and log all messages exchanged during the conversation thread
 messages = project_client.agents.messages.list(thread_id=thread.id)
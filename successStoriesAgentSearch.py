@@ -1,6 +1,4 @@
 import os
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
 
 from azure.ai.agents.models import AzureAISearchTool, AzureAISearchQueryType
 from azure.ai.projects.models import ConnectionType
@@ -8,6 +6,7 @@ from azure.ai.projects.models import ConnectionType
 from azure.ai.agents.models import MessageRole, ListSortOrder
 
 from dotenv import load_dotenv
+from azure_clients import get_project_client
 
 load_dotenv()
 
@@ -16,11 +15,8 @@ load_dotenv()
 project_endpoint = os.getenv("AZURE_AI_AGENT_ENDPOINT")
 model_deployment_name = os.getenv("AZURE_AI_AGENT_MODEL_DEPLOYMENT_NAME")
 
-# Initialize the AIProjectClient
-project_client = AIProjectClient(
-    endpoint=project_endpoint,
-    credential=DefaultAzureCredential(exclude_interactive_browser_credential=False)
-)
+# Get the shared AIProjectClient instance
+project_client = get_project_client(project_endpoint, exclude_interactive_browser_credential=False)
 
 # Define the Azure AI Search connection ID and index name
 azure_ai_conn_id = project_client.connections.get_default(ConnectionType.AZURE_AI_SEARCH).id
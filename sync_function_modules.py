@@ -0,0 +1,76 @@
+"""
+Copies the top-level modules that the Azure Function imports into pg_azurefunction/.
+
+The Function folder is published on its own (func azure functionapp publish, zip deploy), so it
+ships real copies of the shared modules rather than links to the repository root. Run this after
+changing one of them; tests/test_function_modules.py fails while a copy is out of date.
+
+    python sync_function_modules.py          # update the copies
+    python sync_function_modules.py --check  # only report the out of date copies (exit code 1)
+"""
+import os
+import sys
+import argparse
+from typing import List
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FUNCTION_DIR = os.path.join(ROOT, "pg_azurefunction")
+
+# Modules of the repository root imported by function_app.py and worker_tools.py
+SHARED_MODULES = ("tool_telemetry.py", "docs_index.py", "prefetch.py", "azure_services.py", "deployment_scheduler.py", "azure_clients.py")
+
+HEADER = "# Copy of ../{name}, kept in sync by sync_function_modules.py: edit the original and run it.\n"
+
+
+def expected_copy(name: str) -> str:
+    """Contents of the Function copy of a shared module."""
+    with open(os.path.join(ROOT, name), "r", encoding="utf-8", newline="") as f:
+        return HEADER.format(name=name) + f.read()
+
+
+def stale_copies() -> List[str]:
+    """Shared modules whose copy in the Function folder is missing or differs from the original."""
+    stale = []
+    for name in SHARED_MODULES:
+        path = os.path.join(FUNCTION_DIR, name)
+        if os.path.islink(path) or not os.path.exists(path):
+            stale.append(name)
+            continue
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            if f.read() != expected_copy(name):
+                stale.append(name)
+    return stale
+
+
+def sync() -> List[str]:
+    """
+    Rewrites the out of date copies.
+
+    :return: Names of the modules that were copied.
+    """
+    copied = stale_copies()
+    for name in copied:
+        path = os.path.join(FUNCTION_DIR, name)
+        if os.path.islink(path):
+            os.remove(path)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(expected_copy(name))
+    return copied
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Copy the shared modules into the Azure Function folder")
+    parser.add_argument("--check", action="store_true", help="Only report the out of date copies")
+    args = parser.parse_args()
+
+    if args.check:
+        stale = stale_copies()
+        for name in stale:
+            print(f"pg_azurefunction/{name} is out of date, run: python sync_function_modules.py")
+        sys.exit(1 if stale else 0)
+    for name in sync():
+        print(f"Copied {name} to pg_azurefunction/")
+
+
+if __name__ == "__main__":
+    main()
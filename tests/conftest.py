@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The modules are flat at the top of the repository; the Function's modules live in pg_azurefunction/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, "pg_azurefunction"))
+
+# Modules with a process-wide StateStore must not write the repository's state_store.db
+os.environ.setdefault("STATE_STORE_PATH", ":memory:")
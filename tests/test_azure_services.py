@@ -0,0 +1,46 @@
+import pytest
+
+from azure_services import find_region, find_service_types, match_service_type
+
+
+@pytest.mark.parametrize("text, types", [
+    ("Give me a WAF review of my architecture", []),
+    ("Review it against the Well-Architected Framework (WAF) pillars", []),
+    ("The user opens the client in a browser, and the functions of the app store documents", []),
+    ("We monitor the storage of chat history with GPT", []),
+    ("Azure OpenAI behind API Management, with AI Search and Blob storage", ["azure_openai", "api_management", "ai_search", "storage"]),
+    ("A function app writes to a storage account and logs to Log Analytics", ["functions", "storage", "monitor"]),
+    ("How much does gpt-4o cost with gpt-4.1-mini as a fallback?", ["azure_openai"]),
+    ("Put a web application firewall in front of the web app", ["application_gateway", "app_service"]),
+    ("Postgres with pgvector on AKS", ["postgresql", "aks"]),
+])
+def test_find_service_types(text, types):
+    assert find_service_types(text) == types
+
+
+def test_longest_keyword_and_whole_words():
+    # "azure openai" and "openai" are one mention; "aks" does not match "breaks"
+    assert find_service_types("Azure OpenAI breaks when OpenAI is throttled") == ["azure_openai"]
+
+
+@pytest.mark.parametrize("label, service_type", [
+    ("Browser", "user"),
+    ("Users", "user"),
+    ("Storage", "storage"),
+    ("Functions", "functions"),
+    ("Monitor", "monitor"),
+    ("GPT-4o", "azure_openai"),
+    ("shape=mxgraph.azure2;image=img/lib/azure2/storage/Storage_Accounts.svg", "storage"),
+    ("Firewall rules", None),
+])
+def test_diagram_labels(label, service_type):
+    assert match_service_type(label) == service_type
+
+
+@pytest.mark.parametrize("text, region", [
+    ("Deploy it in East US 2", "eastus2"),
+    ("westeurope, then eastus", "westeurope"),
+    ("No region", "eastus"),
+])
+def test_find_region(text, region):
+    assert find_region(text) == region
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from bicep_assembler import assemble, assemble_bicep
+
+COMPONENTS = [
+    {"type": "azure_openai", "name": "aoai"},
+    {"type": "app_service", "name": "web", "parameters": {"sku": "P1v3", "appSettings": {"AZURE_OPENAI_ENDPOINT": "ref:aoai.endpoint"}}},
+]
+
+
+def test_parameters_and_references():
+    result = assemble({"prefix": "contoso", "location": "swedencentral", "components": COMPONENTS})
+    main, bicepparam = result["files"]["main.bicep"], result["files"]["main.bicepparam"]
+
+    assert bicepparam.splitlines()[:4] == ["using 'main.bicep'", "", "param namePrefix = 'contoso'", "param location = 'swedencentral'"]
+    assert "param webSku = 'P1v3'" in bicepparam
+    assert "AZURE_OPENAI_ENDPOINT: aoai.outputs.endpoint" in main
+
+
+def test_location_is_escaped():
+    bicepparam = assemble({"prefix": "contoso", "location": "east'us ${evil}\n", "components": COMPONENTS})["files"]["main.bicepparam"]
+
+    assert "param location = 'east\\'us \\${evil}\\n'" in bicepparam
+
+
+@pytest.mark.parametrize("spec", [
+    {"prefix": "ref:aoai.endpoint"},
+    {"prefix": ["contoso"]},
+    {"prefix": "it's ${evil}"},
+    {"prefix": "Contoso"},
+    {"prefix": "co"},
+    {"prefix": "contoso-"},
+    {"prefix": "a" * 21},
+    {"location": 3},
+])
+def test_prefix_and_location_are_validated(spec):
+    with pytest.raises(ValueError):
+        assemble(dict(spec, components=COMPONENTS))
+
+
+def test_resource_names_follow_the_naming_rules():
+    components = [
+        {"type": "ai_search", "name": "ai_search"},
+        {"type": "azure_openai", "name": "Azure_OpenAI__West"},
+        {"type": "key_vault", "name": "key_vault"},
+        {"type": "storage", "name": "storage_for_the_grounding_documents"},
+        {"type": "app_service", "name": "web_" + "x" * 60},
+    ]
+    main = assemble({"prefix": "contoso", "components": components})["files"]["main.bicep"]
+
+    assert "name: toLower('${namePrefix}-ai-search')" in main
+    assert "name: toLower('${namePrefix}-azure-openai-west')" in main
+    # Storage accounts and vaults: letters and digits only, 24 characters at most
+    assert "name: take(toLower(replace('${namePrefix}key-vault', '-', '')), 24)" in main
+    assert "name: take(toLower(replace('${namePrefix}storage-for-the-grounding-documents', '-', '')), 24)" in main
+    # With the longest prefix, the web app name and its "-plan" suffix stay within 60 characters
+    assert "name: toLower('${namePrefix}-web-" + "x" * 30 + "')" in main
+    assert "@minLength(3)\n@maxLength(20)\nparam namePrefix string" in main
+
+    with pytest.raises(ValueError, match="letters or digits"):
+        assemble({"prefix": "contoso", "components": [{"type": "storage", "name": "__"}]})
+
+
+def test_secure_parameters_are_read_from_the_environment():
+    spec = {"prefix": "contoso", "components": [{"type": "postgresql", "name": "db"}]}
+    result = assemble(spec)
+    main, bicepparam = result["files"]["main.bicep"], result["files"]["main.bicepparam"]
+
+    assert "@secure()\nparam dbAdministratorLoginPassword string" in main
+    assert "param dbAdministratorLoginPassword = readEnvironmentVariable('DB_ADMINISTRATOR_LOGIN_PASSWORD')" in bicepparam
+
+    for value in ("Passw0rd!", "ref:vault.uri"):
+        spec["components"][0]["parameters"] = {"administratorLoginPassword": value}
+        with pytest.raises(ValueError, match="DB_ADMINISTRATOR_LOGIN_PASSWORD"):
+            assemble(spec)
+
+
+def test_errors_are_returned_to_the_agent():
+    result = json.loads(assemble_bicep(json.dumps({"prefix": "contoso", "components": [{"type": "mainframe"}]})))
+
+    assert "Unknown component type mainframe" in result["error"]
+    assert "list_bicep_modules" in result["hint"]
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from contract_stream import ContractEvent, ContractStreamParser
+
+CONTRACT = {"persona": "A", "summary": "Chatbot over \"call center\" data \\ transcripts.", "assumptions": ["Region: eastus", "Currency: USD"]}
+ANSWER = "- Use a RAG chatbot\n- Index the call transcripts\n\n```json\n" + json.dumps(CONTRACT, indent=2) + "\n```\n"
+EVENTS = [
+    ContractEvent("bullet", None, "Use a RAG chatbot"),
+    ContractEvent("bullet", None, "Index the call transcripts"),
+    *(ContractEvent("section", key, value) for key, value in CONTRACT.items()),
+]
+
+
+def parse(chunks):
+    parser = ContractStreamParser()
+    events = [event for chunk in chunks for event in parser.feed(chunk)]
+    return events + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(ANSWER)])
+def test_chunk_boundaries_anywhere(size):
+    # Deltas split tokens, keys, escapes and the fence at every position
+    assert parse([ANSWER[start:start + size] for start in range(0, len(ANSWER), size)]) == EVENTS
+
+
+def test_fenced_sections_are_emitted_as_soon_as_they_close():
+    parser = ContractStreamParser()
+    assert parser.feed("- Use a RAG chatbot\n```json\n{\"persona\": \"A\", \"summary\": \"Chat") == [
+        ContractEvent("bullet", None, "Use a RAG chatbot"), ContractEvent("section", "persona", "A"),
+    ]
+    assert parser.feed("bot\",") == [ContractEvent("section", "summary", "Chatbot")]
+    assert parser.feed(' "openQuestions": []}\n```\nAsk me for the Bicep files.') == [ContractEvent("section", "openQuestions", [])]
+    assert parser.close() == [ContractEvent("text", None, "Ask me for the Bicep files.")]
+
+
+def test_prose_starting_with_a_brace_stays_prose():
+    answer = "- Templates use placeholders\n{placeholder} is replaced by the prefix\n- Deploy with what-if first\n- Then deploy\n"
+
+    assert parse([answer]) == [
+        ContractEvent("bullet", None, "Templates use placeholders"),
+        ContractEvent("text", None, "{placeholder} is replaced by the prefix"),
+        ContractEvent("bullet", None, "Deploy with what-if first"),
+        ContractEvent("bullet", None, "Then deploy"),
+    ]
+
+
+def test_unfenced_object_is_emitted_once_it_closes():
+    parser = ContractStreamParser()
+    assert parser.feed('- Summary\n{"persona": "B", "summary": "x",') == [ContractEvent("bullet", None, "Summary")]
+    assert parser.feed(' "openQuestions": []}') == [
+        ContractEvent("section", "persona", "B"), ContractEvent("section", "summary", "x"), ContractEvent("section", "openQuestions", []),
+    ]
+
+
+def test_invalid_json_goes_back_to_prose():
+    # Looks like an object until a value that is not JSON: nothing of it is taken for the contract
+    answer = '{"persona": A or B}\n- Next step\n'
+
+    assert parse([answer]) == [ContractEvent("text", None, '{"persona": A or B}'), ContractEvent("bullet", None, "Next step")]
+
+
+def test_truncated_answer_emits_the_open_member():
+    assert parse(['```json\n{"persona": "A", "summary": "cut sho']) == [
+        ContractEvent("section", "persona", "A"), ContractEvent("section", "summary", '"cut sho'),
+    ]
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from deployment_scheduler import BATCH, INTERACTIVE, DeploymentScheduler, RateLimited
+
+
+@pytest.mark.parametrize("budgets, defaults", [
+    ({"gpt-4o": {"tpm": 0}}, {}),
+    ({"gpt-4o": {"rpm": -5}}, {}),
+    ({"gpt-4o": {"tpm": "many"}}, {}),
+    ({}, {"default_tpm": 0}),
+    ({}, {"default_rpm": -1}),
+])
+def test_budgets_must_be_positive(budgets, defaults):
+    with pytest.raises(ValueError):
+        DeploymentScheduler(budgets, **defaults)
+
+
+def test_budgets_from_the_environment(monkeypatch):
+    monkeypatch.setenv("DEPLOYMENT_BUDGETS", '{"gpt-4o": {"tpm": 0, "rpm": 900}}')
+    with pytest.raises(ValueError, match="tpm of gpt-4o"):
+        DeploymentScheduler.from_env()
+
+    monkeypatch.setenv("DEPLOYMENT_BUDGETS", '{"gpt-4o": {"tpm": 1000}}')
+    monkeypatch.setenv("DEPLOYMENT_DEFAULT_RPM", "60")
+    scheduler = DeploymentScheduler.from_env()
+    assert scheduler.acquire("gpt-4o", 100) == pytest.approx(0, abs=0.05)
+
+
+def test_throttled_calls_are_retried_and_counted():
+    scheduler = DeploymentScheduler(default_tpm=10**9, default_rpm=10**6)
+    calls = []
+
+    def call():
+        calls.append(None)
+        if len(calls) == 1:
+            raise RateLimited(0.01)
+        return "done"
+
+    assert scheduler.submit("gpt-4o", call, tokens=100, priority=BATCH) == "done"
+    metrics = scheduler.metrics()["gpt-4o"]
+    assert (metrics["granted"], metrics["throttled"], metrics["queue_depth"]) == (2, 1, 0)
+
+
+def wait_for_queue(scheduler, deployment, interactive, batch):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        metrics = scheduler.metrics()[deployment]
+        if (metrics["queue_depth_interactive"], metrics["queue_depth_batch"]) == (interactive, batch):
+            return
+        time.sleep(0.005)
+    raise AssertionError("the requests were not queued")
+
+
+def test_interactive_before_batch_and_fifo_within_a_priority():
+    # 1000 tokens per second: every request below waits 0.15 s for its tokens
+    scheduler = DeploymentScheduler({"gpt-4o": {"tpm": 60000, "rpm": 10**6}})
+    scheduler.acquire("gpt-4o", 60000)
+    granted = []
+
+    def request(name, priority):
+        scheduler.acquire("gpt-4o", 150, priority)
+        granted.append(name)
+
+    threads = []
+    for name, priority, queued in [("b1", BATCH, (0, 1)), ("b2", BATCH, (0, 2)), ("i1", INTERACTIVE, (1, 2)), ("i2", INTERACTIVE, (2, 2))]:
+        threads.append(threading.Thread(target=request, args=(name, priority)))
+        threads[-1].start()
+        wait_for_queue(scheduler, "gpt-4o", *queued)
+    for thread in threads:
+        thread.join(5)
+
+    assert granted == ["i1", "i2", "b1", "b2"]
+
+
+def test_requests_block_until_the_bucket_refills():
+    scheduler = DeploymentScheduler({"gpt-4o": {"tpm": 60000, "rpm": 10**6}})
+    assert scheduler.acquire("gpt-4o", 60000) == pytest.approx(0, abs=0.05)
+
+    # The bucket is empty: 200 tokens take 0.2 s to refill
+    assert scheduler.acquire("gpt-4o", 200) >= 0.15
+
+
+def test_report_usage_refunds_the_unused_reservation():
+    scheduler = DeploymentScheduler({"gpt-4o": {"tpm": 60000, "rpm": 10**6}})
+    scheduler.acquire("gpt-4o", 60000)
+    scheduler.report_usage("gpt-4o", reserved_tokens=60000, used_tokens=1000)
+
+    # Most of the reservation was given back, so a large request is admitted at once
+    assert scheduler.acquire("gpt-4o", 50000) == pytest.approx(0, abs=0.05)
+
+    # A request that used more than it reserved takes the difference from the bucket
+    scheduler.report_usage("gpt-4o", reserved_tokens=1000, used_tokens=10000)
+    assert scheduler.acquire("gpt-4o", 1000) >= 0.5
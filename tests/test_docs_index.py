@@ -0,0 +1,208 @@
+import json
+import os
+
+import pytest
+import requests
+
+import docs_index
+from docs_index import DocsIndex, chunk_page, extract_page, ingest, refresh_index, search_architecture_docs
+
+WAF = "https://learn.example.com/waf/"
+REFERENCE = "https://learn.example.com/reference/"
+
+PAGES = {
+    f"{WAF}networking": """<html><head><title>ignored</title><script>var x = "private endpoint";</script></head><body>
+      <nav><a href="/waf/nav-only">Navigation about firewalls</a></nav>
+      <main>
+        <h1>Networking for AI workloads</h1>
+        <p>Design the network of AI workloads.</p>
+        <h2 id="private-endpoints">Private endpoints</h2>
+        <p>Use private endpoints for Azure OpenAI and AI Search so model traffic never leaves the virtual network.</p>
+        <p>See <a href="security#keys">security</a> and <a href="https://other.example.com/x">elsewhere</a>.</p>
+        <h2 id="egress">Egress control</h2>
+        <p>Route outbound traffic through a firewall and allow only the model endpoints.</p>
+      </main></body></html>""",
+    f"{WAF}security": """<html><body><main>
+        <h1>Security for AI workloads</h1>
+        <h2 id="keys">Managed identities</h2>
+        <p>Disable local authentication keys and use managed identities with role assignments.</p>
+        <h2 id="encryption">Encryption</h2>
+        <p>Encrypt grounding data at rest with customer-managed keys in Key Vault.</p>
+      </main></body></html>""",
+    f"{REFERENCE}baseline-chat": """<html><body><main>
+        <h1>Baseline chat architecture</h1>
+        <h2 id="components">Components</h2>
+        <p>App Service hosts the chat UI; the orchestrator calls Azure OpenAI and AI Search through private endpoints.</p>
+      </main></body></html>""",
+}
+
+
+class FakeResponse:
+    def __init__(self, html: str, etag: str):
+        self.text = html
+        self.content = html.encode("utf-8")
+        self.headers = {"ETag": etag}
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """Serves the fixture pages from files in a temporary directory instead of the network."""
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    for url, html in PAGES.items():
+        (pages / url.rsplit("/", 1)[-1]).write_text(html, encoding="utf-8")
+    fetched = []
+
+    def fetch(session, url, etag):
+        path = pages / url.rsplit("/", 1)[-1]
+        if not path.exists():
+            raise requests.HTTPError(f"404 {url}")
+        html = path.read_text(encoding="utf-8")
+        fetched.append((url, etag))
+        current = f'"{len(html)}"'
+        return None if etag == current else FakeResponse(html, current)
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("the tests must not use the network")
+
+    monkeypatch.setattr(docs_index, "_fetch", fetch)
+    monkeypatch.setattr(requests.Session, "get", no_network)
+    monkeypatch.setattr(docs_index, "SOURCES", {
+        "waf": {"prefix": WAF, "seeds": [f"{WAF}networking"]},
+        "reference": {"prefix": REFERENCE, "seeds": [f"{REFERENCE}baseline-chat"]},
+    })
+    return fetched
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    directory = str(tmp_path / "index")
+    monkeypatch.setattr(docs_index, "DOCS_INDEX_DIR", directory)
+    monkeypatch.setattr(docs_index, "_loaded", {"version": None, "index": None})
+    return directory
+
+
+def test_extract_page_and_citations():
+    url = f"{WAF}networking"
+    title, sections, links = extract_page(PAGES[url])
+
+    assert title == "Networking for AI workloads"
+    assert [(section["heading"], section["anchor"]) for section in sections] == [
+        ("", ""), ("Private endpoints", "private-endpoints"), ("Egress control", "egress"),
+    ]
+    # Scripts and navigation are not indexed
+    assert "var x" not in " ".join(section["text"] for section in sections)
+    assert "security#keys" in links
+
+    chunks = chunk_page(url, title, sections, "waf")
+    assert [chunk["citation"] for chunk in chunks] == [url, f"{url}#private-endpoints", f"{url}#egress"]
+
+
+def test_long_sections_are_chunked_with_overlap():
+    words = [f"w{n}" for n in range(docs_index.CHUNK_WORDS * 2)]
+    chunks = chunk_page("https://x/page", "Page", [{"heading": "H", "anchor": "h", "text": " ".join(words)}], "waf")
+
+    assert len(chunks) == 3
+    assert all(len(chunk["text"].split()) <= docs_index.CHUNK_WORDS for chunk in chunks)
+    step = docs_index.CHUNK_WORDS - docs_index.CHUNK_OVERLAP
+    assert chunks[1]["text"].split()[0] == words[step]
+
+
+def test_ingest_follows_links_within_the_prefix(site):
+    index = ingest()
+
+    assert sorted(index.pages) == sorted(PAGES)
+    assert {url for url, _ in site} == set(PAGES)
+    assert {chunk["collection"] for chunk in index.chunks if chunk["url"].startswith(REFERENCE)} == {"reference"}
+
+
+def test_unchanged_pages_reuse_their_chunks_and_vectors(site):
+    first = ingest()
+    site.clear()
+    second = ingest(first)
+
+    # Every page was revalidated with its ETag and none changed
+    assert all(etag is not None for _, etag in site)
+    assert second.chunks == first.chunks
+    assert (second.vectors == first.vectors).all()
+
+
+def test_hybrid_ranking(site):
+    index = ingest()
+
+    results = index.search("managed identities instead of keys", top=3)
+    assert results[0]["citation"] == f"{WAF}security#keys"
+    # Best in both the BM25 and the vector ranking: 1 / (RRF_K + 1) from each
+    assert results[0]["score"] == round(2 / (docs_index.RRF_K + 1), 5)
+    assert [result["score"] for result in results] == sorted((result["score"] for result in results), reverse=True)
+
+    # Trigram embeddings match "encryption" for "encrypting", where BM25 has no common term
+    assert index.search("encrypting", top=1)[0]["citation"] == f"{WAF}security#encryption"
+
+
+def test_collection_filter(site):
+    index = ingest()
+
+    results = index.search("private endpoints for Azure OpenAI", collection="reference")
+    assert results and {result["collection"] for result in results} == {"reference"}
+    assert index.search("private endpoints for Azure OpenAI", collection="waf")[0]["citation"] == f"{WAF}networking#private-endpoints"
+
+
+def test_snapshot_reload_is_atomic(site, index_dir, monkeypatch):
+    assert refresh_index(index_dir)
+    assert docs_index.get_docs_index().search("firewall", top=1)[0]["citation"] == f"{WAF}networking#egress"
+    # Nothing left behind but the snapshot
+    assert sorted(os.listdir(os.path.dirname(index_dir))) == ["index", "pages"]
+
+    page = os.path.join(os.path.dirname(index_dir), "pages", "baseline-chat")
+    with open(page, "a", encoding="utf-8") as f:
+        f.write('<main><h2 id="gateway">Gateway</h2><p>Application Gateway with a web application firewall fronts the UI.</p></main>')
+    assert refresh_index(index_dir)
+
+    # The refreshed snapshot replaced the previous one and the process reloads it
+    assert sorted(os.listdir(os.path.dirname(index_dir))) == ["index", "pages"]
+    assert docs_index.get_docs_index().search("application gateway", top=1)[0]["citation"] == f"{REFERENCE}baseline-chat#gateway"
+
+    # A recent snapshot is not rebuilt, and a crawl with no page keeps the current one
+    assert not refresh_index(index_dir, max_age_hours=1)
+    monkeypatch.setattr(docs_index, "ingest", lambda previous: DocsIndex({}, []))
+    assert not refresh_index(index_dir)
+    assert len(DocsIndex.load(index_dir).pages) == len(PAGES)
+
+
+def test_search_architecture_docs_json(site, index_dir):
+    assert "error" in json.loads(search_architecture_docs("private endpoints"))
+
+    ingest().save(index_dir)
+    passages = json.loads(search_architecture_docs("private endpoints for Azure OpenAI", collection="waf", top=2))
+
+    assert len(passages) == 2
+    assert set(passages[0]) == {"citation", "title", "heading", "text"}
+    assert passages[0]["citation"] == f"{WAF}networking#private-endpoints"
+    assert passages[0]["title"] == "Networking for AI workloads"
+    assert all(passage["citation"].startswith(WAF) for passage in passages)
+    # top is clamped to at least one passage
+    assert len(json.loads(search_architecture_docs("private endpoints", top=0))) == 1
+
+
+def test_snapshot_saved_by_another_process_is_reloaded(site, index_dir):
+    ingest().save(index_dir)
+    first = docs_index.get_docs_index()
+    assert docs_index.get_docs_index() is first
+
+    # A refresh job in another process replaces the files; this process has not called refresh_index
+    DocsIndex(first.pages, first.chunks[:1], first.vectors[:1], first.embedder).save(index_dir)
+    assert len(docs_index.get_docs_index().chunks) == 1
+
+
+def test_docs_search_tool_matches_the_worker_tool():
+    from worker_tools import registry
+
+    worker = registry.get("search_architecture_docs")
+    definition = docs_index.docs_search_tool("https://account.queue.core.windows.net").definitions[0].azure_function
+
+    assert definition.function.name == worker.name
+    assert definition.function.parameters == worker.parameters
+    assert definition.input_binding.storage_queue.queue_name == worker.input_queue
+    with pytest.raises(ValueError, match="AZURE_STORAGE_QUEUE_ENDPOINT"):
+        docs_index.docs_search_tool("")
@@ -0,0 +1,142 @@
+import base64
+import zlib
+from urllib.parse import quote
+
+import pytest
+
+from drawio_parser import extract_sku, parse_diagram
+
+
+def compress(xml: str) -> str:
+    """Page content as Draw.io saves it compressed: raw deflate of the URL-encoded XML, in base64."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    data = compressor.compress(quote(xml, safe="").encode("utf-8")) + compressor.flush()
+    return base64.b64encode(data).decode("ascii")
+
+
+MODEL = """<mxGraphModel><root>
+  <mxCell id="0"/><mxCell id="1" parent="0"/>
+  <mxCell id="vnet" value="Hub VNet" style="swimlane;" vertex="1" parent="1"/>
+  <mxCell id="app" value="Web App&lt;br&gt;P1v3" style="rounded=1;" vertex="1" parent="vnet"/>
+  <mxCell id="aoai" value="Azure OpenAI" style="image;image=img/lib/azure2/ai_machine_learning/Azure_OpenAI.svg;" vertex="1" parent="vnet"/>
+  <mxCell id="e1" value="completions" edge="1" source="app" target="aoai" parent="1"/>
+</root></mxGraphModel>"""
+
+
+def test_plain_and_compressed_pages_give_the_same_graph():
+    plain = parse_diagram(f'<mxfile><diagram name="Page-1">{MODEL}</diagram></mxfile>')
+    compressed = parse_diagram(f'<mxfile><diagram name="Page-1">{compress(MODEL)}</diagram></mxfile>')
+
+    assert compressed == plain
+    assert [(service["id"], service["type"], service["sku"], service["group"]) for service in plain["services"]] == [
+        ("app", "app_service", "P1v3", "vnet"),
+        ("aoai", "azure_openai", None, "vnet"),
+    ]
+    assert plain["groups"] == [{"id": "vnet", "label": "Hub VNet", "parent": None}]
+    assert plain["edges"] == [{"from": "app", "to": "aoai", "label": "completions"}]
+
+
+def test_pages_are_prefixed():
+    graph = parse_diagram(f'<mxfile><diagram name="a">{MODEL}</diagram><diagram name="b">{compress(MODEL)}</diagram></mxfile>')
+
+    assert [service["id"] for service in graph["services"]] == ["p0:app", "p0:aoai", "p1:app", "p1:aoai"]
+    assert {edge["from"] for edge in graph["edges"]} == {"p0:app", "p1:app"}
+
+
+def test_object_and_user_object_cells():
+    graph = parse_diagram("""<mxGraphModel><root>
+      <mxCell id="0"/><mxCell id="1" parent="0"/>
+      <object id="search" label="Search index" sku="S1"><mxCell style="image;image=img/lib/azure2/app_services/Search_Services.svg;" vertex="1" parent="1"/></object>
+      <UserObject id="kv" label="Key Vault" tier="Premium"><mxCell style="rounded=1;" vertex="1" parent="1"/></UserObject>
+      <object id="broken" label="No cell"/>
+      <mxCell id="e" edge="1" source="search" target="kv" parent="1"/>
+    </root></mxGraphModel>""")
+
+    assert [(service["id"], service["type"], service["label"], service["sku"]) for service in graph["services"]] == [
+        ("search", "ai_search", "Search index", "S1"),
+        ("kv", "key_vault", "Key Vault", "Premium"),
+    ]
+    assert graph["edges"] == [{"from": "search", "to": "kv", "label": ""}]
+
+
+def test_edge_label_cells_are_not_services():
+    graph = parse_diagram("""<mxGraphModel><root>
+      <mxCell id="0"/><mxCell id="1" parent="0"/>
+      <mxCell id="a" value="Function App" vertex="1" parent="1"/>
+      <mxCell id="b" value="Service Bus" vertex="1" parent="1"/>
+      <mxCell id="e" edge="1" source="a" target="b" parent="1"/>
+      <mxCell id="l" value="sends orders" vertex="1" connectable="0" parent="e"/>
+    </root></mxGraphModel>""")
+
+    assert [service["id"] for service in graph["services"]] == ["a", "b"]
+    assert graph["edges"] == [{"from": "a", "to": "b", "label": "sends orders"}]
+
+
+def test_visio_xml():
+    graph = parse_diagram("""<VisioDocument xmlns="http://schemas.microsoft.com/visio/2003/core"><Pages><Page ID="0">
+      <Shapes>
+        <Shape ID="1" NameU="Group"><Text>Spoke</Text><Shapes>
+          <Shape ID="2" NameU="App Service"><Text>Frontend S1</Text></Shape>
+          <Shape ID="3" NameU="SQL Database"><Text>Orders DB</Text></Shape>
+        </Shapes></Shape>
+        <Shape ID="4" NameU="Dynamic connector"><Text>queries</Text></Shape>
+      </Shapes>
+      <Connects>
+        <Connect FromSheet="4" FromCell="BeginX" ToSheet="2"/>
+        <Connect FromSheet="4" FromCell="EndX" ToSheet="3"/>
+      </Connects>
+    </Page></Pages></VisioDocument>""")
+
+    assert graph["groups"] == [{"id": "1", "label": "Spoke", "parent": None}]
+    assert [(service["id"], service["type"], service["sku"], service["group"]) for service in graph["services"]] == [
+        ("2", "app_service", "S1", "1"),
+        ("3", "sql_database", None, "1"),
+    ]
+    assert graph["edges"] == [{"from": "2", "to": "3", "label": "queries"}]
+
+
+@pytest.mark.parametrize("label, sku", [
+    ("AI Search (S1)", "S1"),
+    ("App Service P1v3", "P1v3"),
+    ("Storage Standard_LRS", "Standard_LRS"),
+    ("PostgreSQL GP_Standard_D2s_v3", "GP_Standard_D2s_v3"),
+    ("Functions Consumption", "Consumption"),
+    ("Azure OpenAI", None),
+])
+def test_extract_sku(label, sku):
+    assert extract_sku(label) == sku
+
+
+@pytest.mark.parametrize("xml", [
+    "<mxfile><diagram>",  # truncated XML
+    "<svg/>",  # not a diagram
+    f"<mxfile><diagram>{compress(MODEL)[:40]}</diagram></mxfile>",  # truncated compressed page
+    f"<mxfile><diagram>{base64.b64encode(b'not deflate data').decode()}</diagram></mxfile>",
+    f"<mxfile><diagram>{compress('<mxGraphModel><root>')}</diagram></mxfile>",  # compressed page with invalid XML
+    "<mxfile><diagram>%%%not base64%%%</diagram></mxfile>",
+])
+def test_malformed_input_raises_value_error(xml):
+    with pytest.raises(ValueError):
+        parse_diagram(xml)
+
+
+def test_graph_of_thousands_of_nodes():
+    services, groups, edges = 5000, 100, 12000
+    cells = ['<mxCell id="0"/>', '<mxCell id="1" parent="0"/>']
+    cells += [f'<mxCell id="g{i}" value="Subnet {i}" style="swimlane;" vertex="1" parent="1"/>' for i in range(groups)]
+    cells += [f'<mxCell id="s{i}" value="Function App {i} P1v3" vertex="1" parent="g{i % groups}"/>' for i in range(services)]
+    cells += [
+        f'<mxCell id="e{i}" value="calls" edge="1" source="s{i % services}" target="s{(i * 7 + 1) % services}" parent="1"/>'
+        for i in range(edges)
+    ]
+    # Edges to cells that are not services are dropped
+    cells.append('<mxCell id="dangling" edge="1" source="s0" target="g0" parent="1"/>')
+    xml = f'<mxfile><diagram name="big">{compress("<mxGraphModel><root>" + "".join(cells) + "</root></mxGraphModel>")}</diagram></mxfile>'
+
+    graph = parse_diagram(xml)
+
+    assert len(graph["services"]) == services
+    assert len(graph["groups"]) == groups
+    assert len(graph["edges"]) == edges
+    assert all(service["type"] == "functions" and service["sku"] == "P1v3" for service in graph["services"])
+    assert graph["services"][123]["group"] == "g23"
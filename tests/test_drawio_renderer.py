@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from drawio_parser import parse_diagram
+from drawio_renderer import render_architecture_diagram, render_drawio
+
+GRAPH = {
+    "groups": [{"id": "vnet", "label": "Spoke <VNet> & subnets"}],
+    "services": [
+        {"id": "app", "type": "app_service", "label": "Web & API", "sku": "P1v3", "group": "vnet"},
+        {"id": "aoai", "type": "azure_openai", "group": "vnet"},
+        {"id": "search", "type": "ai_search", "label": "Search"},
+    ],
+    "edges": [
+        {"from": "app", "to": "aoai", "label": "<b>prompts</b> & \"completions\""},
+        {"from": "app", "to": "search"},
+    ],
+}
+
+
+def test_round_trip_through_the_parser():
+    graph = parse_diagram(render_drawio(json.loads(json.dumps(GRAPH))))
+
+    assert graph["groups"] == [{"id": "group-vnet", "label": "Spoke <VNet> & subnets", "parent": None}]
+    assert [(service["id"], service["type"], service["label"], service["sku"], service["group"]) for service in graph["services"]] == [
+        ("svc-app", "app_service", "Web & API P1v3", "P1v3", "group-vnet"),
+        ("svc-aoai", "azure_openai", "Azure OpenAI", None, "group-vnet"),
+        ("svc-search", "ai_search", "Search", None, None),
+    ]
+    # Labels are escaped as HTML text: markup in a label is shown, not interpreted
+    assert graph["edges"] == [
+        {"from": "svc-app", "to": "svc-aoai", "label": "<b>prompts</b> & \"completions\""},
+        {"from": "svc-app", "to": "svc-search", "label": ""},
+    ]
+
+
+def test_labels_are_escaped():
+    xml = render_drawio({"services": [{"id": "a", "type": "storage"}, {"id": "b", "type": "functions"}], "edges": [
+        {"from": "a", "to": "b", "label": "<img src=x onerror=alert(1)> ' \""},
+    ]})
+
+    # Escaped for HTML, then for the XML attribute
+    assert "value=\"&amp;lt;img src=x onerror=alert(1)&amp;gt; ' &quot;\"" in xml
+
+
+@pytest.mark.parametrize("components", [
+    "[1, 2]",
+    "\"services\"",
+    "{\"services\": {\"id\": \"a\"}}",
+    "{\"services\": [\"a\"]}",
+    "{\"services\": [{\"id\": \"a\"}], \"edges\": [{\"from\": \"a\", \"to\": \"b\"}]}",
+    "{not json",
+])
+def test_invalid_graph_leaves_the_existing_diagram_untouched(tmp_path, components):
+    output = tmp_path / "architecture.drawio"
+    output.write_text("<mxfile>previous</mxfile>", encoding="utf-8")
+
+    result = json.loads(render_architecture_diagram(components, str(output)))
+
+    assert result["error"].startswith("Invalid component graph")
+    assert output.read_text(encoding="utf-8") == "<mxfile>previous</mxfile>"
+    assert [path.name for path in tmp_path.iterdir()] == ["architecture.drawio"]
+
+
+def test_diagram_replaces_the_previous_one(tmp_path):
+    output = tmp_path / "architecture.drawio"
+    output.write_text("<mxfile>previous</mxfile>", encoding="utf-8")
+
+    result = json.loads(render_architecture_diagram(json.dumps(GRAPH), str(output)))
+
+    assert result == {"path": str(output), "services": 3, "edges": 2}
+    assert len(parse_diagram(output.read_text(encoding="utf-8"))["services"]) == 3
+    assert [path.name for path in tmp_path.iterdir()] == ["architecture.drawio"]
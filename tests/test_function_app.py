@@ -0,0 +1,28 @@
+import azure_clients
+import function_app
+from benchmarks.fake_agents import FakeAgentsService, FakeProjectClient
+from deployment_scheduler import DeploymentScheduler
+
+
+def test_prompt_runs_are_admitted_by_the_scheduler(monkeypatch):
+    scheduler = DeploymentScheduler(default_tpm=10**6, default_rpm=10**4)
+    monkeypatch.setattr(function_app, "scheduler", scheduler)
+    project_client = FakeProjectClient(FakeAgentsService(run_latency="const:0.01"))
+    agent = project_client.agents.create_agent(model=function_app.AGENT_MODEL, name="tools")
+    thread = project_client.agents.threads.create()
+
+    answer = function_app.run_prompt(project_client, thread, agent, "Price of Azure AI Search S1 in eastus?")
+
+    assert answer and answer != "No response from agent"
+    metrics = scheduler.metrics()[function_app.AGENT_MODEL]
+    assert (metrics["granted"], metrics["queue_depth"]) == (1, 0)
+
+
+def test_project_client_comes_from_the_shared_factory(monkeypatch):
+    endpoint = "https://example.services.ai.azure.com/api/projects/architect"
+    monkeypatch.setenv("PROJECT_ENDPOINT", endpoint)
+    monkeypatch.setenv("PROJECT_ENDPOINT__clientId", "11111111-2222-3333-4444-555555555555")
+
+    client = function_app.get_project_client()
+    assert function_app.get_project_client() is client
+    assert azure_clients.get_project_client(endpoint, managed_identity_client_id="11111111-2222-3333-4444-555555555555") is client
@@ -0,0 +1,22 @@
+import os
+
+import sync_function_modules
+
+
+def test_function_copies_are_up_to_date():
+    # The Function folder is deployed on its own: it must hold real, current copies of the shared modules
+    assert sync_function_modules.stale_copies() == [], "run: python sync_function_modules.py"
+
+
+def test_sync_replaces_links_and_stale_copies(tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_function_modules, "FUNCTION_DIR", str(tmp_path))
+    monkeypatch.setattr(sync_function_modules, "SHARED_MODULES", ("tool_telemetry.py",))
+    copy = tmp_path / "tool_telemetry.py"
+    copy.symlink_to(os.path.join(sync_function_modules.ROOT, "tool_telemetry.py"))
+
+    assert sync_function_modules.sync() == ["tool_telemetry.py"]
+    assert not copy.is_symlink()
+    assert sync_function_modules.stale_copies() == []
+
+    copy.write_text("# edited in place\n", encoding="utf-8")
+    assert sync_function_modules.stale_copies() == ["tool_telemetry.py"]
@@ -0,0 +1,132 @@
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from benchmarks.fake_agents import FakeAgentsService, FakeProjectClient
+from image_pipeline import ImageUploadCache, dhash, hamming, target_size, vision_tokens
+from state_store import StateStore
+
+ENDPOINT = "https://contoso.services.ai.azure.com/api/projects/architect"
+BOXES = [(100, 100, "App Service"), (700, 100, "Azure OpenAI"), (100, 600, "AI Search"), (700, 600, "Storage")]
+
+
+def draw(boxes=BOXES, size=(1920, 1080)) -> Image.Image:
+    image = Image.new("RGB", size, "white")
+    canvas = ImageDraw.Draw(image)
+    for x, y, label in boxes:
+        canvas.rectangle((x, y, x + 400, y + 200), outline="#0078d4", width=6, fill="#f3f2f1")
+        canvas.text((x + 20, y + 20), label, fill="black")
+    return image
+
+
+def save(tmp_path, name: str, image: Image.Image, **params) -> str:
+    path = tmp_path / name
+    image.save(path, **params)
+    return str(path)
+
+
+@pytest.fixture
+def cache():
+    return ImageUploadCache(StateStore(":memory:"), ENDPOINT)
+
+
+@pytest.fixture
+def project_client():
+    return FakeProjectClient(FakeAgentsService(seed=0))
+
+
+def test_target_size_fits_the_token_budget():
+    width, height = target_size(3840, 2160, 765)
+    assert vision_tokens(width, height) <= 765
+    assert abs(width / height - 3840 / 2160) < 0.01
+
+
+def test_same_file_and_same_prepared_image_are_uploaded_once(tmp_path, cache, project_client):
+    image = draw()
+    first = cache.upload(project_client, save(tmp_path, "v1.png", image))
+    again = cache.upload(project_client, save(tmp_path, "copy.png", image))
+    # Same pixels in another file (other compression level): the prepared image is the same
+    resaved = cache.upload(project_client, save(tmp_path, "resaved.png", image, compress_level=1))
+
+    assert again.file_id == first.file_id
+    assert resaved.file_id == first.file_id
+    metrics = cache.metrics()
+    assert (metrics["uploads"], metrics["exact_hits"], metrics["prepared_hits"]) == (1, 1, 1)
+
+
+def test_edited_diagrams_are_not_merged(tmp_path, cache, project_client):
+    v1 = draw()
+    # A new box, and every box relabelled (perceptually the same image)
+    v2 = draw(BOXES + [(1300, 350, "Firewall")])
+    v3 = draw([(x, y, "Key Vault") for x, y, _ in BOXES])
+    assert hamming(dhash(v1), dhash(v3)) <= cache.max_distance
+
+    file_ids = [cache.upload(project_client, save(tmp_path, f"{name}.png", image)).file_id for name, image in (("v1", v1), ("v2", v2), ("v3", v3))]
+
+    assert len(set(file_ids)) == 3
+    metrics = cache.metrics()
+    assert metrics["uploads"] == 3
+    assert metrics["near_duplicates"] >= 1
+
+
+def test_file_ids_are_reused_across_processes(tmp_path, project_client):
+    store = StateStore(":memory:")
+    path = save(tmp_path, "v1.png", draw())
+    first = ImageUploadCache(store, ENDPOINT).upload(project_client, path)
+    # A new cache on the same store (e.g. after a restart) reads the file IDs back
+    again = ImageUploadCache(store, ENDPOINT).upload(project_client, path)
+
+    assert again.file_id == first.file_id
+
+
+def test_file_ids_are_kept_per_endpoint_and_token_budget(tmp_path, project_client):
+    store = StateStore(":memory:")
+    path = save(tmp_path, "v1.png", draw())
+    first = ImageUploadCache(store, ENDPOINT).upload(project_client, path)
+
+    other_project = ImageUploadCache(store, "https://fabrikam.services.ai.azure.com/api/projects/architect").upload(project_client, path)
+    other_budget = ImageUploadCache(store, ENDPOINT, token_budget=1105).upload(project_client, path)
+
+    assert len({first.file_id, other_project.file_id, other_budget.file_id}) == 3
+    assert other_budget.tokens > first.tokens
+
+
+def test_deleted_file_is_uploaded_again(tmp_path, project_client):
+    store = StateStore(":memory:")
+    path = save(tmp_path, "v1.png", draw())
+    first = ImageUploadCache(store, ENDPOINT).upload(project_client, path)
+    project_client.agents.files.delete(first.file_id)
+
+    # After a restart, the file IDs of the store are checked before they are reused
+    cache = ImageUploadCache(store, ENDPOINT)
+    again = cache.upload(project_client, path)
+    # A copy with other compression (same prepared image) reuses the new upload
+    resaved = cache.upload(project_client, save(tmp_path, "resaved.png", draw(), compress_level=1))
+
+    assert again.file_id != first.file_id
+    assert project_client.agents.files.get(again.file_id).id == again.file_id
+    assert resaved.file_id == again.file_id
+    metrics = cache.metrics()
+    assert (metrics["uploads"], metrics["missing_files"], metrics["prepared_hits"]) == (1, 1, 1)
+    assert [row[2] for row in store.image_files(ENDPOINT, cache.token_budget)] == [again.file_id] * 3
+
+
+def test_prepared_image_is_smaller(tmp_path, cache, project_client):
+    path = save(tmp_path, "big.png", draw(size=(3840, 2160)))
+    reference = cache.upload(project_client, path)
+
+    assert reference.tokens <= cache.token_budget
+    assert cache.metrics()["uploaded_bytes"] < cache.metrics()["original_bytes"]
+    with Image.open(io.BytesIO(open(path, "rb").read())) as image:
+        assert vision_tokens(*image.size) > reference.tokens
+
+
+def test_decompression_bombs_are_rejected_before_upload(tmp_path, cache, project_client, monkeypatch):
+    # app.upload_images leaves out the images that raise DecompressionBombError
+    path = save(tmp_path, "bomb.png", draw(size=(400, 300)))
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 50_000)
+
+    with pytest.raises(Image.DecompressionBombError):
+        cache.upload(project_client, path)
+    assert cache.metrics()["uploads"] == 0
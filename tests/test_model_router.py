@@ -0,0 +1,67 @@
+import logging
+
+from model_router import AGENT_TIERS, ModelRouter, confident, default_tiers, json_with_keys
+
+TIERS = [
+    {"name": "small", "deployment": "gpt-4.1-mini", "input_price": 0.40, "output_price": 1.60},
+    {"name": "large", "deployment": "gpt-4o", "input_price": 2.50, "output_price": 10.00},
+]
+
+
+def test_without_a_small_deployment_there_is_one_tier(monkeypatch):
+    monkeypatch.delenv("AZURE_AI_AGENT_SMALL_MODEL_DEPLOYMENT_NAME", raising=False)
+    monkeypatch.setenv("AZURE_AI_AGENT_MODEL_DEPLOYMENT_NAME", "my-gpt-4o")
+    router = ModelRouter(default_tiers())
+
+    assert [tier.name for tier in router.tiers] == ["large"]
+    # Agents and tasks of the small tier run on the agents' deployment
+    assert router.deployment_for_agent("costs") == "my-gpt-4o"
+    assert router.tier_for_task("price_table").name == "large"
+
+
+def test_small_deployment_from_the_environment(monkeypatch):
+    monkeypatch.setenv("AZURE_AI_AGENT_SMALL_MODEL_DEPLOYMENT_NAME", "my-mini")
+    router = ModelRouter(default_tiers())
+
+    assert router.tier_for_task("price_table").deployment == "my-mini"
+    assert router.deployment_for_agent("orchestrator") == router.tiers[-1].deployment
+
+
+def test_connected_agents_run_on_the_large_tier(monkeypatch):
+    # The orchestrator calls them as connected agents: their answers cannot be validated nor escalated
+    monkeypatch.setenv("AZURE_AI_AGENT_SMALL_MODEL_DEPLOYMENT_NAME", "my-mini")
+    router = ModelRouter(default_tiers())
+
+    assert {router.tier_for_agent(agent).name for agent in AGENT_TIERS} == {"large"}
+
+
+def test_runs_are_recorded_by_tier_name_with_equal_deployments():
+    router = ModelRouter([dict(tier, deployment="gpt-4o") for tier in TIERS])
+    router.record(router.tier("large"), 1.0, 1000, 100)
+
+    report = router.report()
+    assert report["tiers"]["large"]["runs"] == 1
+    assert report["tiers"]["small"]["runs"] == 0
+
+
+def test_cascade_escalates_failed_answers(caplog):
+    caplog.set_level(logging.INFO, logger="model_router")
+    router = ModelRouter(TIERS)
+    answers = {"small": "I'm not sure.", "large": "Use App Service."}
+
+    def attempt(tier, failure):
+        router.record(tier, 0.1, 100, 10)
+        return tier.name, answers[tier.name]
+
+    outcome = router.cascade("price_table", attempt, confident)
+
+    assert outcome.answer == "Use App Service."
+    assert [name for name, _ in outcome.attempts] == ["small", "large"]
+    assert router.report()["tiers"]["small"]["escalated"] == 1
+    assert caplog.messages == ["Answer of price_table on the small tier failed validation (hedging answer (\"I'm not sure\")), escalating"]
+
+
+def test_json_with_keys():
+    validate = json_with_keys("persona", "summary")
+    assert validate('Summary\n```json\n{"persona": "A", "summary": "x"}\n```') is None
+    assert validate('{"persona": "A"}') == "missing keys ['summary']"
@@ -0,0 +1,122 @@
+import json
+from types import SimpleNamespace
+
+from output_contract import _combine, assemble_contract, merge_contract, parse_result, specialist_schema, validate
+
+STORY = {
+    "customer": "Contoso", "businessGoal": "Faster support", "keyProducts": ["Azure OpenAI"],
+    "technologySolution": "RAG chatbot", "impact": "-30% handling time", "url": "https://example.com/contoso",
+}
+LINE_ITEM = {
+    "service": "Azure AI Search", "sku": "S1", "meter": "Unit", "unitPrice": 0.336, "unit": "1 Hour",
+    "quantity": 730, "monthly": 245.28, "sourceId": "DZH318Z0BQ4L", "apiQuery": "https://prices.azure.com/api/retail/prices?x",
+}
+COSTS = {"market": "en-us", "currency": "USD", "region": "eastus", "lineItems": [LINE_ITEM], "totalMonthly": 245.28, "missingDetails": []}
+PLAN = {"persona": "A", "summary": "Chatbot over call center data.", "assumptions": ["eastus"], "openQuestions": []}
+
+
+def output(section, value):
+    return json.dumps({section: value})
+
+
+def test_validate():
+    schema = specialist_schema("successStories")
+    assert validate({"successStories": [STORY]}, schema) == []
+
+    errors = validate({"successStories": [dict(STORY, impact=3, url=None, extra="x")], "more": 1}, schema)
+    assert errors == [
+        "$.successStories[0].impact: expected string, got int",
+        "$.successStories[0].extra: not allowed",
+        "$.more: not allowed",
+    ]
+    errors = validate({"architectureReview": [{"pillar": "Speed"}]}, specialist_schema("architectureReview"))
+    assert errors[0] == "$.architectureReview[0].question: missing"
+    assert errors[-1].startswith("$.architectureReview[0].pillar: 'Speed' is not one of ['Reliability'")
+
+
+def test_parse_result():
+    assert parse_result("successStories", f"```json\n{output('successStories', [STORY])}\n```") == ([STORY], [])
+    assert parse_result("successStories", "I could not find stories") == (None, ["not a JSON object"])
+
+    value, errors = parse_result("successStories", output("successStories", [{}]))
+    assert value is None
+    # Six fields are missing: the first five are reported, the rest counted
+    assert len(errors) == 6 and errors[-1] == "and 1 more"
+
+
+def test_combine_deduplicates_and_recomputes_the_total():
+    notes = []
+    other = dict(STORY, customer="Fabrikam", url="https://example.com/fabrikam")
+    assert _combine("successStories", [[STORY], [STORY, other]], notes) == [STORY, other]
+
+    costs = _combine("costs", [dict(COSTS, totalMonthly=999.0)], notes)
+    assert costs["totalMonthly"] == 245.28
+    assert notes == ["Costs: totalMonthly recomputed from the line items (245.28), the agent reported 999.0."]
+
+    extra = dict(LINE_ITEM, sourceId="OTHER", monthly=10.0)
+    assert _combine("costs", [COSTS, dict(COSTS, lineItems=[LINE_ITEM, extra], missingDetails=["egress"])], notes) == dict(
+        COSTS, lineItems=[LINE_ITEM, extra], totalMonthly=255.28, missingDetails=["egress"],
+    )
+
+    module = {"name": "search", "purpose": "AI Search", "code": "resource x"}
+    bicep = _combine("bicep", [
+        {"modules": [module], "parameters": [], "notes": ["lint"]},
+        {"modules": [dict(module, code="resource y")], "parameters": [{"name": "sku", "type": "string", "value": "S1"}], "notes": ["lint"]},
+    ], notes)
+    assert bicep == {"modules": [dict(module, code="resource y")], "parameters": [{"name": "sku", "type": "string", "value": "S1"}], "notes": ["lint"]}
+
+
+def test_merge_contract():
+    contract = merge_contract(PLAN, {"successStories": [output("successStories", [STORY])], "costs": [output("costs", COSTS)]})
+
+    # Sections in contract order, the plan fields the contract does not define at the end
+    assert list(contract) == ["summary", "assumptions", "openQuestions", "costs", "successStories", "persona"]
+    assert contract["costs"] == COSTS and "notes" not in contract
+
+
+def test_merge_contract_leaves_out_invalid_outputs():
+    contract = merge_contract(dict(PLAN, costs={"totalMonthly": 1}), {
+        "successStories": ["not json", output("successStories", [STORY])],
+        "costs": [output("costs", dict(COSTS, currency=None))],
+    })
+
+    assert contract["successStories"] == [STORY]
+    # No valid costs output: the section the orchestrator wrote is kept
+    assert contract["costs"] == {"totalMonthly": 1}
+    assert [note.split(":")[0] for note in contract["notes"]] == ["Success stories", "Costs"]
+    assert "$.costs.currency: expected string, got NoneType" in contract["notes"][1]
+
+
+def test_merge_contract_with_some_specialists():
+    contract = merge_contract(PLAN, {"bicep": [output("bicep", {"modules": [], "parameters": [], "notes": []})]})
+
+    assert set(contract) == {"summary", "assumptions", "openQuestions", "bicep", "persona"}
+
+
+class FakeRunSteps:
+    def __init__(self, steps):
+        self.steps = steps
+
+    def list(self, thread_id, run_id, order):
+        assert (thread_id, run_id, order) == ("thread-1", "run-1", "asc")
+        return self.steps
+
+
+def connected_call(name, value):
+    return {"type": "connected_agent", "connected_agent": {"name": name, "output": value}}
+
+
+def test_assemble_contract():
+    steps = [
+        {"step_details": {"tool_calls": [connected_call("get_success_stories", output("successStories", [STORY]))]}},
+        {"step_details": {"tool_calls": [{"type": "function"}, connected_call("get_cost_estimates", output("costs", COSTS))]}},
+        {"step_details": {}},
+    ]
+    project_client = SimpleNamespace(agents=SimpleNamespace(run_steps=FakeRunSteps(steps)))
+    answer = f"- Use a RAG chatbot\n\n```json\n{json.dumps(PLAN)}\n```"
+
+    prose, contract = assemble_contract(project_client, "thread-1", SimpleNamespace(id="run-1"), answer)
+
+    assert prose == "- Use a RAG chatbot"
+    assert contract["persona"] == "A"
+    assert contract["successStories"] == [STORY] and contract["costs"] == COSTS
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from prefetch import Prefetcher, query_overlap, same_query, topic_key
+
+
+@pytest.mark.parametrize("text, key", [
+    ("Success stories of call center copilots with Azure OpenAI", ("azure_openai", "call center", "copilot")),
+    ("A chatbot over Azure OpenAI for a call center", ("azure_openai", "bot_service", "call center", "chatbot")),
+    ("RAG over PDFs with AI Search for banking", ("ai_search", "banking", "rag")),
+    ("What can you do?", ()),
+])
+def test_topic_key(text, key):
+    assert topic_key(text) == key
+
+
+def test_query_overlap_ignores_the_words_agents_add():
+    message = "We want a chatbot over Azure OpenAI for the call center of an insurer"
+
+    assert query_overlap("Success stories of call center chatbot solutions with Azure OpenAI", message) == 1.0
+    assert query_overlap("call center chatbot for the claims of a retail bank", message) == 0.5
+    assert query_overlap("Azure solutions", message) == 1.0
+
+
+class Tools:
+    def __init__(self, prefetcher):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+        @prefetcher.tool(
+            key=lambda call: topic_key(call["query"]) or None,
+            plan=lambda text: [{"query": text}],
+            match=same_query("query"),
+        )
+        def search(query: str) -> str:
+            self.release.wait(5)
+            self.calls.append(query)
+            return f"results for {query}"
+
+        self.search = search
+
+
+@pytest.fixture
+def prefetcher():
+    prefetcher = Prefetcher(max_workers=2, enabled_tools=[], enabled=True)
+    yield prefetcher
+    prefetcher.shutdown()
+
+
+def test_query_about_the_message_reads_the_prefetch(prefetcher):
+    tools = Tools(prefetcher)
+    message = "We need a chatbot with Azure OpenAI for our call center"
+    assert prefetcher.start("r1", message) == 1
+
+    assert tools.search("Success stories of call center chatbot solutions with Azure OpenAI") == f"results for {message}"
+    assert tools.calls == [message]
+    prefetcher.finish("r1")
+    assert prefetcher.metrics()["hits"] == 1 and prefetcher.metrics()["hit_rate"] == 1.0
+
+
+def test_other_question_with_the_same_topics_does_not_read_the_prefetch(prefetcher):
+    tools = Tools(prefetcher)
+    message = "Chatbot with Azure OpenAI for the call center of a card issuer, to answer disputes"
+    prefetcher.start("r1", message)
+
+    query = "Chatbot with Azure OpenAI for an insurer call center that files travel claims"
+    assert topic_key(query) == topic_key(message)
+    assert tools.search(query) == f"results for {query}"
+    metrics = prefetcher.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["mismatches"]) == (0, 1, 1)
+
+
+def test_finish_cancels_or_counts_the_unread_prefetches():
+    prefetcher = Prefetcher(max_workers=1, enabled_tools=[], enabled=True)
+    tools = Tools(prefetcher)
+    tools.release.clear()
+    prefetcher.start("r1", "RAG over AI Search for banking")
+    # The only worker is busy with the first prefetch: the second one has not started
+    prefetcher.start("r2", "Document processing with Document Intelligence for insurance")
+
+    prefetcher.finish("r2")
+    tools.release.set()
+    prefetcher.finish("r1")
+    metrics = prefetcher.metrics()
+    prefetcher.shutdown()
+
+    assert (metrics["cancelled"], metrics["unused"], metrics["in_flight"]) == (1, 1, 0)
+    assert metrics["hit_rate"] == 0.0
+
+
+def test_disabled_prefetcher_only_executes():
+    prefetcher = Prefetcher(enabled_tools=[], enabled=False)
+    tools = Tools(prefetcher)
+
+    assert prefetcher.start("r1", "RAG over AI Search for banking") == 0
+    assert tools.search("RAG over AI Search for banking") == "results for RAG over AI Search for banking"
+    assert prefetcher.metrics()["started"] == 0
+    prefetcher.shutdown()
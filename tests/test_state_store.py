@@ -0,0 +1,72 @@
+import sqlite3
+import threading
+
+import pytest
+
+from state_store import StateStore
+
+KEY = ("user@example.com", "session-1")
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "state.db")
+
+
+def stored_thread(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT thread_id FROM sessions WHERE user_id = ? AND session_key = ?", KEY).fetchone()[0]
+
+
+class GatedLock:
+    """Lock that makes one thread wait at the gate before acquiring it."""
+
+    def __init__(self, lock, thread_name):
+        self._lock = lock
+        self._thread_name = thread_name
+        self.arrived = threading.Event()
+        self.gate = threading.Event()
+
+    def __enter__(self):
+        if threading.current_thread().name == self._thread_name:
+            self.arrived.set()
+            self.gate.wait(5)
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc):
+        return self._lock.__exit__(*exc)
+
+
+def test_writes_are_persisted_and_read_back(path):
+    store = StateStore(path, flush_interval=3600)
+    store.save_session(KEY, "thread-1", "asst-1", thread_tokens=120, thread_messages=2)
+    store.record_turn(KEY, "thread-1", "asst-1", "Hello", "Hi")
+    # Reads write the pending changes first
+    assert [run["thread_id"] for run in store.runs(KEY)] == ["thread-1"]
+    store.close()
+
+    reopened = StateStore(path, flush_interval=3600)
+    assert reopened.get_session(KEY).thread_tokens == 120
+    assert [(message.role, message.content) for message in reopened.messages(KEY)] == [("user", "Hello"), ("assistant", "Hi")]
+    assert reopened.last_answer(KEY) == "Hi"
+    reopened.close()
+
+
+def test_concurrent_flushes_commit_in_enqueue_order(path):
+    store = StateStore(path, flush_interval=3600)
+    gated = GatedLock(store._db_lock, "first-flush")
+    store._db_lock = gated
+
+    store.save_session(KEY, "thread-1")
+    first = threading.Thread(target=store.flush, name="first-flush")
+    first.start()
+    assert gated.arrived.wait(5)
+
+    # A compaction replaces the thread while the first flush waits for the connection
+    store.save_session(KEY, "thread-2")
+    store.flush()
+    gated.gate.set()
+    first.join(5)
+
+    assert stored_thread(path) == "thread-2"
+    store.close()
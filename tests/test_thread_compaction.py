@@ -0,0 +1,98 @@
+import pytest
+
+from benchmarks.fake_agents import FakeAgentsService, FakeProjectClient
+from thread_compaction import IMAGES_HEADER, SUMMARY_HEADER, STRUCTURED_OMITTED, ThreadCompactor, _content
+
+CONTRACT = "```json\n{\"persona\": \"A\", \"costs\": {\"totalMonthly\": 1200}}\n```"
+
+
+@pytest.fixture
+def project_client():
+    return FakeProjectClient(FakeAgentsService(run_latency="const:0.01", seed=0))
+
+
+def conversation(project_client, turns, images=None):
+    """Thread with a user message and an answer with the Output Contract per turn; images maps a turn to its file IDs."""
+    thread_id = project_client.agents.threads.create().id
+    for turn in range(turns):
+        project_client.agents.messages.create(thread_id, "user", _content(f"Question {turn} about the call center chatbot", (images or {}).get(turn, [])))
+        project_client.agents.messages.create(thread_id, "assistant", f"- Answer {turn}: use Azure OpenAI\n\n{CONTRACT}")
+    return thread_id
+
+
+def texts(project_client, thread_id):
+    return [
+        (message.role, "\n".join(part.text.value for part in message.content if part.type == "text"),
+         [part.image_file.file_id for part in message.content if part.type == "image_file"])
+        for message in project_client.agents.messages.list(thread_id=thread_id, order="asc")
+    ]
+
+
+def test_compaction_thresholds():
+    compactor = ThreadCompactor(threshold_tokens=1000, threshold_messages=40, last_messages=48)
+    # A thread as long as a short truncation window is not compacted on every turn
+    compactor.track("short", 500, 12)
+    assert not compactor.needs_compaction(None, "short", "next question")
+    compactor.track("tokens", 990, 4)
+    assert compactor.needs_compaction(None, "tokens", "x" * 100)
+    assert not compactor.needs_compaction(None, "tokens")
+    compactor.track("messages", 100, 38)
+    assert not compactor.needs_compaction(None, "messages")
+    compactor.track("messages", 100, 39)
+    assert compactor.needs_compaction(None, "messages")
+    assert compactor.truncation_strategy()["last_messages"] == 48
+
+
+def test_truncation_window_must_hold_the_compaction_threshold():
+    with pytest.raises(ValueError, match="truncation window"):
+        ThreadCompactor(threshold_messages=40, last_messages=12)
+
+
+def test_compaction_keeps_the_summary_and_the_last_turns(project_client):
+    compactor = ThreadCompactor(threshold_tokens=10**6, keep_turns=2)
+    thread_id = conversation(project_client, 5)
+
+    new_thread_id = compactor.compact(project_client, thread_id)
+
+    messages = texts(project_client, new_thread_id)
+    assert messages[0][1].startswith(SUMMARY_HEADER)
+    assert "- User: Question 0 about the call center chatbot" in messages[0][1]
+    assert "  Agent: - Answer 2: use Azure OpenAI" in messages[0][1]
+    assert CONTRACT not in messages[0][1]
+    assert [text for _, text, _ in messages[1:]] == [
+        "Question 3 about the call center chatbot",
+        f"- Answer 3: use Azure OpenAI\n\n{STRUCTURED_OMITTED}",
+        "Question 4 about the call center chatbot",
+        f"- Answer 4: use Azure OpenAI\n\n{CONTRACT}",
+    ]
+    assert compactor.thread_size(new_thread_id)[1] == 5 and compactor.thread_size(thread_id) is None
+
+    # A second compaction carries the first summary over
+    for turn in range(5, 8):
+        project_client.agents.messages.create(new_thread_id, "user", f"Question {turn}")
+        project_client.agents.messages.create(new_thread_id, "assistant", f"- Answer {turn}")
+    summary = texts(project_client, compactor.compact(project_client, new_thread_id))[0][1]
+    assert "- User: Question 0 about the call center chatbot" in summary
+    assert "- User: Question 5" in summary and "- User: Question 6" not in summary
+
+
+def test_compaction_keeps_the_last_images(project_client):
+    compactor = ThreadCompactor(threshold_tokens=10**6, keep_turns=2, keep_images=2)
+    thread_id = conversation(project_client, 5, images={0: ["file-a"], 1: ["file-b", "file-c"], 4: ["file-d"]})
+
+    messages = texts(project_client, compactor.compact(project_client, thread_id))
+
+    assert "(Images of older turns no longer attached: 1)" in messages[0][1]
+    # The last images of the compacted turns move to the first recent user message
+    assert messages[1] == ("user", "Question 3 about the call center chatbot", ["file-b", "file-c"])
+    assert messages[3] == ("user", "Question 4 about the call center chatbot", ["file-d"])
+    assert compactor.metrics()["images_dropped"] == 1
+
+
+def test_images_without_a_recent_user_message(project_client):
+    compactor = ThreadCompactor(threshold_tokens=10**6, keep_turns=0, keep_images=1)
+    thread_id = conversation(project_client, 2, images={1: ["file-a"]})
+
+    messages = texts(project_client, compactor.compact(project_client, thread_id))
+
+    assert messages[1:] == [("user", IMAGES_HEADER, ["file-a"])]
@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+
+import pytest
+from azure.ai.agents.models import RequiredFunctionToolCall, RequiredFunctionToolCallDetails
+
+from tool_executor import ConcurrentToolExecutor
+
+hang = threading.Event()
+
+
+def tool_call(call_id: str, name: str, **arguments) -> RequiredFunctionToolCall:
+    return RequiredFunctionToolCall(id=call_id, function=RequiredFunctionToolCallDetails(name=name, arguments=json.dumps(arguments)))
+
+
+def lookup(value: str) -> str:
+    time.sleep(0.05)
+    return json.dumps({"value": value})
+
+
+def hung_lookup(value: str) -> str:
+    # Never returns while the test runs, like a call stuck on a connection
+    hang.wait(30)
+    return json.dumps({"value": value})
+
+
+def failing_lookup(value: str) -> str:
+    raise RuntimeError(f"no {value}")
+
+
+@pytest.fixture
+def executor():
+    hang.clear()
+    executor = ConcurrentToolExecutor(
+        [lookup, hung_lookup, failing_lookup], max_workers=2,
+        timeouts={"hung_lookup": 0.2}, concurrency_limits={"hung_lookup": 1, "lookup": 2},
+    )
+    yield executor
+    hang.set()
+    executor.shutdown()
+
+
+def outputs(executor, *calls):
+    return {output.tool_call_id: json.loads(output.output) for output in executor.execute(list(calls))}
+
+
+def test_calls_run_concurrently_in_call_order(executor):
+    start = time.monotonic()
+    results = executor.execute([tool_call(f"c{n}", "lookup", value=str(n)) for n in range(2)])
+
+    assert [output.tool_call_id for output in results] == ["c0", "c1"]
+    assert time.monotonic() - start < 0.09
+
+
+def test_errors_are_returned_to_the_model(executor):
+    results = outputs(executor, tool_call("c1", "failing_lookup", value="x"), tool_call("c2", "missing"))
+
+    assert results == {"c1": {"error": "Function failing_lookup failed: no x"}, "c2": {"error": "Unknown function: missing"}}
+
+
+def test_hung_tool_does_not_block_later_calls(executor):
+    # Every worker thread and the only slot of the tool are taken by calls that never return
+    first = outputs(executor, tool_call("h1", "hung_lookup", value="a"), tool_call("h2", "hung_lookup", value="b"))
+    assert first == {"h1": {"error": "Function hung_lookup timed out"}, "h2": {"error": "Function hung_lookup timed out"}}
+    assert executor.metrics()["abandoned"] >= 1
+
+    # Later steps still get a worker, for other tools and for the same tool
+    start = time.monotonic()
+    assert outputs(executor, *(tool_call(f"l{n}", "lookup", value=str(n)) for n in range(4))) == {
+        f"l{n}": {"value": str(n)} for n in range(4)
+    }
+    assert time.monotonic() - start < 1
+
+    hang.set()
+    assert outputs(executor, tool_call("h3", "hung_lookup", value="c")) == {"h3": {"value": "c"}}
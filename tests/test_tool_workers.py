@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from tool_workers import InMemoryQueue, ToolRegistry, ToolWorker
+
+
+@pytest.fixture
+def executed():
+    return {"search": [], "prices": Counter()}
+
+
+@pytest.fixture
+def registry(executed):
+    registry = ToolRegistry()
+
+    def search_batch(calls):
+        executed["search"].append(len(calls))
+        return [json.dumps({"query": call["vector_search_query"], "limit": call.get("limit", 10)}) for call in calls]
+
+    @registry.register(name="vector_search_success_stories", batch=search_batch, batch_key=lambda arguments: arguments.get("limit", 10))
+    def search(vector_search_query: str, limit: int = 10) -> str:
+        """Vector search."""
+        return search_batch([{"vector_search_query": vector_search_query, "limit": limit}])[0]
+
+    @registry.register(name="get_azure_retail_prices")
+    def prices(filter: str, currency_code: str = "USD") -> str:
+        """Price lookup."""
+        executed["prices"][filter] += 1
+        time.sleep(0.1)
+        return json.dumps({"filter": filter})
+
+    @registry.register(name="broken")
+    def broken(value: str) -> str:
+        """Always fails."""
+        raise RuntimeError(f"cannot handle {value}")
+
+    return registry
+
+
+@pytest.fixture
+def worker(registry):
+    worker = ToolWorker(registry, max_workers=4, batch_window=0.1)
+    yield worker
+    worker.shutdown()
+
+
+def send(queues, tool, correlation_id, **arguments):
+    queues[tool].send_message(json.dumps(dict(arguments, CorrelationId=correlation_id)))
+
+
+def replies(output):
+    return [json.loads(message.content) for message in output.receive_messages(max_messages=100)]
+
+
+def test_every_call_gets_exactly_one_reply(registry, worker, executed):
+    queues = {tool.name: InMemoryQueue() for tool in registry}
+    output = InMemoryQueue()
+    sent = {}
+    for n in range(30):
+        correlation_id = f"call-{n}"
+        if n % 2:
+            send(queues, "vector_search_success_stories", correlation_id, vector_search_query=f"use case {n % 5}", limit=5)
+            sent[correlation_id] = f"use case {n % 5}"
+        else:
+            send(queues, "get_azure_retail_prices", correlation_id, filter=f"serviceName eq 'S{n % 4}'")
+            sent[correlation_id] = f"serviceName eq 'S{n % 4}'"
+
+    assert worker.poll(queues, output) == 30
+
+    answers = replies(output)
+    assert sorted(reply["CorrelationId"] for reply in answers) == sorted(sent)
+    for reply in answers:
+        assert sent[reply["CorrelationId"]] in reply["Value"]
+    assert all(len(queue) == 0 for queue in queues.values())
+    # Messages received together share the executions of their duplicates
+    assert executed["prices"] == Counter({"serviceName eq 'S0'": 1, "serviceName eq 'S2'": 1})
+
+
+def test_duplicate_in_flight_calls_execute_once(worker, executed):
+    futures = [worker.call("get_azure_retail_prices", {"filter": "serviceName eq 'Storage'"}) for _ in range(5)]
+
+    assert len({id(future) for future in futures}) == 1
+    assert [future.result(timeout=5) for future in futures] == [json.dumps({"filter": "serviceName eq 'Storage'"})] * 5
+    assert executed["prices"]["serviceName eq 'Storage'"] == 1
+    assert worker.stats()["deduplicated"] == 4
+
+    # Once finished, the same arguments are executed again
+    worker.call("get_azure_retail_prices", {"filter": "serviceName eq 'Storage'"}).result(timeout=5)
+    assert executed["prices"]["serviceName eq 'Storage'"] == 2
+
+
+def test_compatible_calls_are_batched(registry, worker, executed):
+    queues = {tool.name: InMemoryQueue() for tool in registry}
+    output = InMemoryQueue()
+    for n in range(6):
+        send(queues, "vector_search_success_stories", f"five-{n}", vector_search_query=f"query {n}", limit=5)
+    for n in range(2):
+        send(queues, "vector_search_success_stories", f"ten-{n}", vector_search_query=f"query {n}", limit=10)
+
+    worker.poll(queues, output)
+
+    # One execution per batch key
+    assert sorted(executed["search"]) == [2, 6]
+    assert worker.stats()["batches"] == 2
+    assert {json.loads(reply["Value"])["limit"] for reply in replies(output) if reply["CorrelationId"].startswith("ten-")} == {10}
+
+
+def test_batches_are_capped(registry):
+    worker = ToolWorker(registry, batch_window=5, max_batch_size=3)
+    futures = [worker.call("vector_search_success_stories", {"vector_search_query": f"q{n}", "limit": 5}) for n in range(3)]
+
+    # A full batch does not wait for the window
+    assert [json.loads(future.result(timeout=1))["query"] for future in futures] == ["q0", "q1", "q2"]
+    worker.shutdown()
+
+
+def test_failing_tool_returns_an_error_reply(worker):
+    reply = json.loads(worker.handle("broken", json.dumps({"value": "x", "CorrelationId": "c1"}), timeout=5))
+
+    assert reply["CorrelationId"] == "c1"
+    assert json.loads(reply["Value"]) == {"error": "RuntimeError: cannot handle x"}
+    assert worker.stats()["errors"] == 1
+
+
+def test_failing_batch_answers_every_call():
+    registry = ToolRegistry()
+    release = threading.Event()
+
+    def short_batch(calls):
+        release.wait(5)
+        return ["only one"]
+
+    @registry.register(name="search", batch=short_batch)
+    def search(query: str) -> str:
+        """Search."""
+        return short_batch([{"query": query}])[0]
+
+    worker = ToolWorker(registry, batch_window=0.05)
+    futures = [worker.call("search", {"query": f"q{n}"}) for n in range(3)]
+    release.set()
+
+    for future in futures:
+        assert "Batch returned 1 results for 3 calls" in json.loads(future.result(timeout=5))["error"]
+    worker.shutdown()
@@ -0,0 +1,293 @@
+import os
+import re
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from azure.ai.agents.models import (
+    MessageImageFileParam, MessageInputImageFileBlock, MessageInputTextBlock, MessageRole, ThreadMessageOptions, TruncationObject,
+)
+
+# Compact a thread once its messages add up to this many tokens
+COMPACTION_THRESHOLD_TOKENS = int(os.getenv("THREAD_COMPACTION_THRESHOLD_TOKENS", "24000"))
+# ... or this many messages, for long conversations of short messages
+COMPACTION_THRESHOLD_MESSAGES = int(os.getenv("THREAD_COMPACTION_THRESHOLD_MESSAGES", "40"))
+# Most recent turns (user message and agent answers) copied verbatim to the compacted thread
+KEEP_TURNS = int(os.getenv("THREAD_COMPACTION_KEEP_TURNS", "2"))
+# Most recent images of the compacted turns (e.g. the diagram under review) attached to the compacted thread
+KEEP_IMAGES = int(os.getenv("THREAD_COMPACTION_KEEP_IMAGES", "2"))
+SUMMARY_MAX_TOKENS = int(os.getenv("THREAD_COMPACTION_SUMMARY_MAX_TOKENS", "1500"))
+# Truncation strategy of every run: a backstop above the compaction threshold, so the summary
+# at the start of a compacted thread stays in the messages the service considers
+TRUNCATION_LAST_MESSAGES = int(os.getenv("THREAD_TRUNCATION_LAST_MESSAGES", "48"))
+
+SUMMARY_HEADER = "Summary of the earlier conversation (older turns were compacted):"
+STRUCTURED_OMITTED = "[Structured output omitted, a newer one follows]"
+IMAGES_HEADER = "Images attached earlier in the conversation:"
+
+# Start of a structured output: a ```json fence or a line that opens a JSON object
+_STRUCTURED_START = re.compile(r"^[ \t]*(?:```(?:json)?[ \t]*\n[ \t]*)?\{", re.MULTILINE)
+
+Turn = Tuple[str, List[str]]
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (4 characters per token), enough to decide when to compact."""
+    return len(text) // 4 + 1
+
+
+def split_structured(text: str) -> Tuple[str, str]:
+    """Splits an answer into its prose (e.g. the Executive Summary) and the JSON Output Contract that follows it."""
+    match = _STRUCTURED_START.search(text)
+    if not match:
+        return text.strip(), ""
+    return text[:match.start()].strip(), text[match.start():].strip()
+
+
+def parse_structured(text: str) -> Optional[Any]:
+    """JSON of an answer (a whole JSON answer, or the structured output after the prose), None if there is none or it is not valid."""
+    _, structured = split_structured(text)
+    structured = re.sub(r"^```(?:json)?\s*|\s*```$", "", structured or text.strip())
+    if not structured.startswith(("{", "[")):
+        return None
+    try:
+        return json.loads(structured)
+    except ValueError:
+        return None
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+
+def _message_text(message) -> str:
+    return "\n".join(part.text.value for part in message.content if part.type == "text")
+
+
+def _message_images(message) -> List[str]:
+    """File IDs of the images of a message."""
+    return [part.image_file.file_id for part in message.content if part.type == "image_file"]
+
+
+def _content(text: str, file_ids: List[str]) -> Any:
+    """Content of a seed message with its images (the text alone if there are none)."""
+    if not file_ids:
+        return text
+    return [MessageInputTextBlock(text=text)] + [
+        MessageInputImageFileBlock(image_file=MessageImageFileParam(file_id=file_id, detail="high")) for file_id in file_ids
+    ]
+
+
+def _content_text(content: Any) -> str:
+    return content if isinstance(content, str) else "\n".join(block["text"] for block in content if block["type"] == "text")
+
+
+def _group(messages) -> List[Tuple[Optional[Any], List[Any]]]:
+    """Groups the messages of a thread (oldest first) into (user message, agent messages) turns."""
+    turns: List[Tuple[Optional[Any], List[Any]]] = []
+    for message in messages:
+        role = getattr(message.role, "value", message.role)
+        if role == MessageRole.USER.value or not turns:
+            turns.append((message if role == MessageRole.USER.value else None, []))
+        if role != MessageRole.USER.value:
+            turns[-1][1].append(message)
+    return turns
+
+
+def _turns(messages) -> List[Turn]:
+    """Groups the messages of a thread (oldest first) into (user message, agent answers) turns."""
+    return [(_message_text(user) if user else "", [_message_text(answer) for answer in answers]) for user, answers in _group(messages)]
+
+
+def summarize_turns(turns: List[Turn], max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    """
+    Extractive summary of older turns: each user request and the prose part of the agent answer,
+    without structured outputs. The most recent lines are kept when the summary exceeds max_tokens.
+    """
+    lines: List[str] = []
+    for user, answers in turns:
+        if not user and answers and answers[0].startswith(SUMMARY_HEADER):
+            # Summary of a previous compaction
+            lines.extend(line for line in answers[0][len(SUMMARY_HEADER):].splitlines() if line.strip())
+            continue
+        if user == IMAGES_HEADER:
+            continue
+        if user:
+            lines.append(f"- User: {_clip(user, 300)}")
+        prose = split_structured(answers[-1])[0] if answers else ""
+        if prose:
+            lines.append(f"  Agent: {_clip(prose, 600)}")
+
+    kept: List[str] = []
+    budget = max_tokens
+    for line in reversed(lines):
+        budget -= count_tokens(line)
+        if budget < 0:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+
+class ThreadCompactor:
+    """
+    Tracks the size of every conversation thread and compacts it when it grows past a threshold.
+
+    The Agents service cannot remove messages from a thread, so compaction creates a new thread
+    seeded with a summary of the older turns and the last turns verbatim, where only the most
+    recent structured output is kept, and deletes the old one. The images of the recent turns stay
+    on their messages and the last ones of the older turns move to the first recent user message;
+    the summary says how many were left out. Callers continue with the returned thread ID.
+
+    :param threshold_tokens: Estimated thread size that triggers a compaction.
+    :param threshold_messages: Number of messages that triggers a compaction.
+    :param keep_turns: Number of recent turns copied to the compacted thread.
+    :param keep_images: Number of images of the older turns attached to the compacted thread.
+    :param last_messages: Messages the service considers on each run (truncation strategy).
+    :param summarizer: Builds the summary of the older turns, defaults to summarize_turns.
+    :raises ValueError: If the truncation strategy would drop messages before a compaction, and with them the summary.
+    """
+
+    def __init__(
+        self,
+        threshold_tokens: int = COMPACTION_THRESHOLD_TOKENS,
+        threshold_messages: int = COMPACTION_THRESHOLD_MESSAGES,
+        keep_turns: int = KEEP_TURNS,
+        keep_images: int = KEEP_IMAGES,
+        last_messages: int = TRUNCATION_LAST_MESSAGES,
+        summarizer: Optional[Callable[[List[Turn]], str]] = None,
+    ):
+        # One message is reserved for the incoming user message and one for the answer
+        if threshold_messages + 2 > last_messages:
+            raise ValueError(
+                f"The truncation window ({last_messages} messages) must hold the messages of a thread about to be compacted ({threshold_messages} + 2)"
+            )
+        self.threshold_tokens = threshold_tokens
+        self.threshold_messages = threshold_messages
+        self.keep_turns = keep_turns
+        self.keep_images = keep_images
+        self.last_messages = last_messages
+        self.summarizer = summarizer or summarize_turns
+        self._lock = threading.Lock()
+        # Estimated tokens and number of messages of every known thread
+        self._threads: Dict[str, List[int]] = {}
+        self._metrics = {
+            "compactions": 0, "tokens_before": 0, "tokens_after": 0, "images_dropped": 0, "last_prompt_tokens": 0, "max_prompt_tokens": 0,
+        }
+
+    def truncation_strategy(self) -> TruncationObject:
+        """Truncation strategy to pass to every run on a tracked thread."""
+        return TruncationObject(type="last_messages", last_messages=self.last_messages)
+
+    def record_message(self, thread_id: str, text: str) -> None:
+        """Accounts for a message added to a thread (user message or agent answer)."""
+        with self._lock:
+            size = self._threads.setdefault(thread_id, [0, 0])
+            size[0] += count_tokens(text)
+            size[1] += 1
+
+    def track(self, thread_id: str, tokens: int, messages: int) -> None:
+        """Sets the size of a thread known from elsewhere (e.g. the state store after a restart), so it is not measured."""
+        with self._lock:
+            self._threads[thread_id] = [tokens, messages]
+
+    def thread_size(self, thread_id: str) -> Optional[Tuple[int, int]]:
+        """Estimated tokens and number of messages of a tracked thread."""
+        with self._lock:
+            size = self._threads.get(thread_id)
+            return (size[0], size[1]) if size else None
+
+    def record_usage(self, prompt_tokens: int) -> None:
+        """Keeps the prompt tokens reported by the runs, to check that they stay bounded."""
+        with self._lock:
+            self._metrics["last_prompt_tokens"] = prompt_tokens
+            self._metrics["max_prompt_tokens"] = max(self._metrics["max_prompt_tokens"], prompt_tokens)
+
+    def _measure(self, project_client, thread_id: str) -> List[int]:
+        """Size of a thread that was not tracked yet, e.g. one resumed after a restart."""
+        messages = list(project_client.agents.messages.list(thread_id=thread_id))
+        size = [sum(count_tokens(_message_text(message)) for message in messages), len(messages)]
+        with self._lock:
+            return self._threads.setdefault(thread_id, size)
+
+    def needs_compaction(self, project_client, thread_id: str, incoming: str = "") -> bool:
+        with self._lock:
+            size = self._threads.get(thread_id)
+        if size is None:
+            size = self._measure(project_client, thread_id)
+        return size[0] + count_tokens(incoming) > self.threshold_tokens or size[1] + 2 > self.threshold_messages
+
+    def compact(self, project_client, thread_id: str) -> str:
+        """
+        Replaces a thread by its compacted version.
+
+        :return: ID of the thread to continue the conversation on (unchanged if there was nothing to compact).
+        """
+        messages = list(project_client.agents.messages.list(thread_id=thread_id, order="asc"))
+        groups = _group(messages)
+        turns = _turns(messages)
+        images = [_message_images(user) if user else [] for user, _ in groups]
+        split = max(len(turns) - self.keep_turns, 0)
+        older, recent = turns[:split], turns[split:]
+        if not older:
+            return thread_id
+
+        # Images of the older turns, of a previous compaction included: the last ones are kept
+        older_images = list(dict.fromkeys(file_id for turn_images in images[:split] for file_id in turn_images))
+        kept_images = older_images[-self.keep_images:] if self.keep_images > 0 else []
+        dropped_images = len(older_images) - len(kept_images)
+        summary = f"{SUMMARY_HEADER}\n{self.summarizer(older)}"
+        if dropped_images:
+            summary += f"\n(Images of older turns no longer attached: {dropped_images})"
+        seed = [ThreadMessageOptions(role=MessageRole.AGENT, content=summary)]
+        recent_images = images[split:]
+        first_user = next((index for index, (user, _) in enumerate(recent) if user), None)
+        if first_user is not None:
+            # Attached to the first recent user message, so they stay with the turns that are kept
+            recent_images[first_user] = list(dict.fromkeys(kept_images + recent_images[first_user]))
+        elif kept_images:
+            seed.append(ThreadMessageOptions(role=MessageRole.USER, content=_content(IMAGES_HEADER, kept_images)))
+        for turn_index, (user, answers) in enumerate(recent):
+            if user:
+                seed.append(ThreadMessageOptions(role=MessageRole.USER, content=_content(user, recent_images[turn_index])))
+            for answer_index, answer in enumerate(answers):
+                latest = turn_index == len(recent) - 1 and answer_index == len(answers) - 1
+                prose, structured = split_structured(answer)
+                if structured and not latest:
+                    answer = f"{prose}\n\n{STRUCTURED_OMITTED}".strip()
+                seed.append(ThreadMessageOptions(role=MessageRole.AGENT, content=answer))
+
+        new_thread = project_client.agents.threads.create(messages=seed)
+        try:
+            project_client.agents.threads.delete(thread_id)
+        except Exception as e:
+            print(f"Could not delete compacted thread {thread_id}: {e}")
+
+        before = sum(count_tokens(_message_text(message)) for message in messages)
+        after = sum(count_tokens(_content_text(message.content)) for message in seed)
+        with self._lock:
+            self._threads.pop(thread_id, None)
+            self._threads[new_thread.id] = [after, len(seed)]
+            self._metrics["compactions"] += 1
+            self._metrics["tokens_before"] += before
+            self._metrics["tokens_after"] += after
+            self._metrics["images_dropped"] += dropped_images
+        print(f"Compacted thread {thread_id} into {new_thread.id}: {len(messages)} messages, ~{before} tokens -> {len(seed)} messages, ~{after} tokens")
+        return new_thread.id
+
+    def compact_if_needed(self, project_client, thread_id: str, incoming: str = "") -> str:
+        """
+        Compacts the thread if adding the incoming message would take it past the thresholds.
+
+        :return: ID of the thread to send the incoming message to.
+        """
+        if self.needs_compaction(project_client, thread_id, incoming):
+            return self.compact(project_client, thread_id)
+        return thread_id
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._metrics, tracked_threads=len(self._threads))
+
+
+# Shared by all the sessions of the process
+compactor = ThreadCompactor()
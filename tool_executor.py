@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from azure.ai.agents.models import RequiredFunctionToolCall, SubmitToolOutputsAction, ToolOutput
+
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+MAX_TOOL_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+
+
+class _Slot:
+    """Concurrency slot of one tool call, released once: when the call returns or when it is abandoned."""
+
+    def __init__(self, semaphore: Optional[threading.BoundedSemaphore]):
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+        self._held = False
+        self.abandoned = False
+
+    def acquire(self) -> bool:
+        """Waits for a free slot of the tool; False if the call was abandoned in the meantime."""
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+        with self._lock:
+            if self.abandoned:
+                if self._semaphore is not None:
+                    self._semaphore.release()
+                return False
+            self._held = True
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            if self._held and self._semaphore is not None:
+                self._semaphore.release()
+            self._held = False
+
+    def abandon(self) -> None:
+        with self._lock:
+            self.abandoned = True
+        self.release()
+
+
+class ConcurrentToolExecutor:
+    """
+    Executes the function tool calls of a run step concurrently on a thread pool.
+
+    All calls of a step start at once, so the step costs the time of the slowest call
+    instead of the sum of all of them. Each tool can have its own timeout and a limit on
+    how many of its calls run at the same time (e.g. to protect a database).
+
+    A thread cannot be stopped: a call that times out keeps running until its function returns.
+    Its concurrency slot is released on timeout, and the pool is replaced so the abandoned
+    thread does not take a worker from the later calls. Tools should still bound their own
+    calls (request timeouts, SQL statement timeouts) so abandoned threads end.
+
+    :param functions: Functions the agent can call, looked up by their __name__.
+    :param max_workers: Size of the thread pool shared by all tools.
+    :param timeouts: Timeout in seconds per tool name, defaults to DEFAULT_TOOL_TIMEOUT.
+    :param concurrency_limits: Maximum concurrent calls per tool name, unlimited by default.
+    """
+
+    def __init__(
+        self,
+        functions: Iterable[Callable[..., Any]],
+        max_workers: int = MAX_TOOL_WORKERS,
+        timeouts: Optional[Dict[str, float]] = None,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+    ):
+        self._functions = {function.__name__: function for function in functions}
+        self._timeouts = timeouts or {}
+        self._semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in (concurrency_limits or {}).items()}
+        self._max_workers = max_workers
+        self._pool_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._abandoned = 0
+
+    def _call(self, name: str, arguments: str, slot: _Slot) -> Any:
+        function = self._functions[name]
+        kwargs = json.loads(arguments) if arguments else {}
+        if not slot.acquire():
+            return None
+        try:
+            return function(**kwargs)
+        finally:
+            slot.release()
+
+    def _abandon(self, future, slot: _Slot) -> None:
+        """Gives up on a timed out call: frees its slot and, if it is running, moves the later calls to a new pool."""
+        slot.abandon()
+        if future.cancel() or future.done():
+            return
+        with self._pool_lock:
+            self._abandoned += 1
+            pool, self._pool = self._pool, ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="tool")
+        # The calls already submitted finish on the old pool, whose threads exit once they return
+        pool.shutdown(wait=False)
+
+    def metrics(self) -> Dict[str, int]:
+        """Number of timed out calls that were still running when they were abandoned."""
+        with self._pool_lock:
+            return {"abandoned": self._abandoned}
+
+    def execute(self, tool_calls: List[Any]) -> List[ToolOutput]:
+        """
+        Runs every function tool call of a step and returns their outputs in call order.
+        Failed or timed out calls return a JSON error so the model can react to it.
+        Calls that are not function calls are skipped.
+        """
+        started = time.monotonic()
+        futures = []
+        for tool_call in tool_calls:
+            if not isinstance(tool_call, RequiredFunctionToolCall):
+                continue
+            name = tool_call.function.name
+            if name not in self._functions:
+                futures.append((tool_call, None, f"Unknown function: {name}"))
+                continue
+            slot = _Slot(self._semaphores.get(name))
+            with self._pool_lock:
+                future = self._pool.submit(self._call, name, tool_call.function.arguments, slot)
+            futures.append((tool_call, (future, slot), None))
+
+        tool_outputs = []
+        for tool_call, call, error in futures:
+            name = tool_call.function.name
+            if call is not None:
+                future, slot = call
+                # Timeouts count from the moment the step started, as all calls run together
+                remaining = self._timeouts.get(name, DEFAULT_TOOL_TIMEOUT) - (time.monotonic() - started)
+                try:
+                    output = future.result(timeout=max(remaining, 0))
+                except FutureTimeoutError:
+                    self._abandon(future, slot)
+                    error = f"Function {name} timed out"
+                except Exception as e:
+                    error = f"Function {name} failed: {e}"
+            if error is not None:
+                print(error)
+                output = json.dumps({"error": error})
+            tool_outputs.append(ToolOutput(tool_call_id=tool_call.id, output=output if isinstance(output, str) else json.dumps(output)))
+        return tool_outputs
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_and_process_run(project_client, thread_id: str, agent_id: str, executor: ConcurrentToolExecutor, poll_interval: float = 0.5, **run_kwargs):
+    """
+    Replacement for runs.create_and_process that executes the tool calls of each step with a
+    ConcurrentToolExecutor and submits all of their outputs in a single submit_tool_outputs.
+
+    :return: The run in its final status.
+    """
+    run = project_client.agents.runs.create(thread_id=thread_id, agent_id=agent_id, **run_kwargs)
+    while run.status in ["queued", "in_progress", "requires_action"]:
+        if run.status == "requires_action" and isinstance(run.required_action, SubmitToolOutputsAction):
+            tool_outputs = executor.execute(run.required_action.submit_tool_outputs.tool_calls)
+            if not tool_outputs:
+                print("No tool outputs to submit, cancelling run")
+                run = project_client.agents.runs.cancel(thread_id=thread_id, run_id=run.id)
+                break
+            run = project_client.agents.runs.submit_tool_outputs(thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs)
+            continue
+
+        time.sleep(poll_interval)
+        run = project_client.agents.runs.get(thread_id=thread_id, run_id=run.id)
+    return run
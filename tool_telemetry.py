@@ -0,0 +1,181 @@
+import os
+import time
+import random
+import hashlib
+import functools
+import threading
+import contextvars
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from opentelemetry import trace
+
+# Payload capture policy shared by every tool module.
+# Large payloads (SQL text, result JSON) are never attached in full: they are capped,
+# hashed and only captured for a head-sampled fraction of calls, or for calls that were
+# slow or failed (tail sampling). Everything else records just the payload length.
+MAX_ATTRIBUTE_CHARS = int(os.getenv("TELEMETRY_MAX_ATTRIBUTE_CHARS", "1024"))
+HEAD_SAMPLE_RATE = float(os.getenv("TELEMETRY_PAYLOAD_SAMPLE_RATE", "0.01"))
+SLOW_CALL_MS = float(os.getenv("TELEMETRY_SLOW_CALL_MS", "2000"))
+
+tracer = trace.get_tracer(__name__)
+
+
+class _CallCapture:
+    """Payloads recorded during the current tool call, flushed once the call finishes."""
+
+    __slots__ = ("payloads", "failed")
+
+    def __init__(self):
+        self.payloads: List[Tuple[str, Any]] = []
+        self.failed = False
+
+
+_current_call: contextvars.ContextVar[Optional[_CallCapture]] = contextvars.ContextVar("current_call", default=None)
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "captured": 0, "overhead_ns": 0}
+
+
+def _truncate(text: str, limit: int) -> str:
+    """
+    Keeps the head and the tail of a payload so both the start of a query and the end of a
+    result remain visible.
+    """
+    if len(text) <= limit:
+        return text
+    half = max(limit // 2, 1)
+    return f"{text[:half]}...[{len(text) - 2 * half} chars]...{text[-half:]}"
+
+
+def payload_attributes(key: str, value: Any, capture: bool, limit: int = MAX_ATTRIBUTE_CHARS) -> Dict[str, Any]:
+    """
+    Builds the span attributes for a single payload.
+
+    :param key: Attribute name of the payload.
+    :param value: Payload value, converted to a string if needed.
+    :param capture: Whether the (truncated) payload and its hash are attached.
+    :param limit: Maximum number of characters attached for the payload.
+
+    :return: Attributes to set on the span.
+    :rtype: dict
+    """
+    text = value if isinstance(value, str) else str(value)
+    attributes: Dict[str, Any] = {f"{key}.length": len(text)}
+    if capture:
+        attributes[key] = _truncate(text, limit)
+        attributes[f"{key}.sha256"] = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    return attributes
+
+
+def record_payload(key: str, value: Any) -> None:
+    """
+    Records a payload for the current tool call. The value is only stored by reference here;
+    the capture decision and any serialization happen once the call has finished.
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.payloads.append((key, value))
+        return
+
+    # Called outside of a traced tool: apply head sampling right away
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.set_attributes(payload_attributes(key, value, random.random() < HEAD_SAMPLE_RATE))
+
+
+def mark_failed(error: Any) -> None:
+    """
+    Flags the current tool call as failed when the tool reports an error instead of raising,
+    so its payloads are always captured.
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.failed = True
+    record_payload("error", error)
+
+
+def traced_tool(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Traces a tool call in its own span and applies the payload capture policy to the payloads
+    recorded with `record_payload`. Arguments and return values are not attached to the span.
+    """
+    span_name = f"tool.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracer.start_as_current_span(span_name) as span:
+            call = _CallCapture()
+            token = _current_call.set(call)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                call.failed = True
+                raise
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                _current_call.reset(token)
+                _flush(span, call, elapsed_ms)
+
+    return wrapper
+
+
+def _flush(span, call: _CallCapture, elapsed_ms: float) -> None:
+    overhead_start = time.perf_counter_ns()
+    capture = call.failed or elapsed_ms >= SLOW_CALL_MS or random.random() < HEAD_SAMPLE_RATE
+    if span.is_recording():
+        attributes: Dict[str, Any] = {"tool.duration_ms": elapsed_ms, "tool.payload_captured": capture}
+        for key, value in call.payloads:
+            attributes.update(payload_attributes(key, value, capture))
+        span.set_attributes(attributes)
+    overhead_ns = time.perf_counter_ns() - overhead_start
+
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["captured"] += int(capture)
+        _stats["overhead_ns"] += overhead_ns
+
+
+def overhead_stats() -> Dict[str, float]:
+    """
+    Returns the number of traced tool calls, how many had their payloads captured and the
+    mean time spent applying the capture policy per call.
+    """
+    with _stats_lock:
+        calls = _stats["calls"]
+        return {
+            "calls": calls,
+            "captured": _stats["captured"],
+            "mean_overhead_us": _stats["overhead_ns"] / calls / 1000 if calls else 0.0,
+        }
+
+
+def configure_tracing(connection_string: Optional[str] = None) -> bool:
+    """
+    Installs a tracer provider that exports spans to Azure Monitor in batches from a background
+    thread, so exporting never blocks a tool call.
+
+    :param connection_string: Application Insights connection string, defaults to the
+        APPLICATIONINSIGHTS_CONNECTION_STRING environment variable.
+
+    :return: True if tracing was configured, False if no connection string is available.
+    :rtype: bool
+    """
+    connection_string = connection_string or os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
+    if not connection_string:
+        return False
+
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+
+    provider = TracerProvider()
+    provider.add_span_processor(
+        BatchSpanProcessor(
+            AzureMonitorTraceExporter(connection_string=connection_string),
+            max_queue_size=int(os.getenv("TELEMETRY_MAX_QUEUE_SIZE", "2048")),
+            max_export_batch_size=int(os.getenv("TELEMETRY_EXPORT_BATCH_SIZE", "512")),
+            schedule_delay_millis=int(os.getenv("TELEMETRY_EXPORT_DELAY_MS", "5000")),
+        )
+    )
+    trace.set_tracer_provider(provider)
+    return True